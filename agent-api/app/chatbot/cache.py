@@ -0,0 +1,269 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different spellings share a cache entry."""
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU + TTL cache for query embeddings with an optional on-disk tier."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600,
+        cache_dir: Optional[str] = None,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        """Get a cached embedding, or None on a miss."""
+        key = (model_name, normalize_query(query))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, embedding = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        embedding = self._load_from_disk(key)
+        with self._lock:
+            if embedding is not None:
+                self.disk_hits += 1
+                self._store(key, embedding, now)
+            else:
+                self.misses += 1
+        return embedding
+
+    def put(self, model_name: str, query: str, embedding: List[float]) -> None:
+        """Store an embedding in memory and, if enabled, on disk."""
+        key = (model_name, normalize_query(query))
+        with self._lock:
+            self._store(key, embedding, time.monotonic())
+        self._save_to_disk(key, embedding)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "disk_tier": str(self.cache_dir) if self.cache_dir else None,
+        }
+
+    def _store(self, key: Tuple[str, str], embedding: List[float], created_at: float) -> None:
+        """Insert an entry and evict the least recently used ones. Caller holds the lock."""
+        self._entries[key] = (created_at, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_path(self, key: Tuple[str, str]) -> Path:
+        digest = hashlib.sha256("\x00".join(key).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def _load_from_disk(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        """Load an embedding from the disk tier if it exists and has not expired."""
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if not path.exists():
+                return None
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["embedding"]
+        except Exception as e:
+            logger.warning(f"Error reading cached embedding {path.name}: {str(e)}")
+            return None
+
+    def _save_to_disk(self, key: Tuple[str, str], embedding: List[float]) -> None:
+        """Write an embedding to the disk tier atomically."""
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"model": key[0], "query": key[1], "embedding": embedding}, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing cached embedding {path.name}: {str(e)}")
+
+
+class SemanticResponseCache:
+    """Cache of generated answers, looked up by embedding similarity to earlier questions.
+
+    Each answer is stored with the embedder that embedded its question, and
+    lookups only compare vectors from the same embedder.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        similarity_threshold: float = 0.95,
+        max_size: int = 256,
+        ttl_seconds: float = 86400,
+    ):
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._matrix_embedder: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, query_embedding: List[float], embedder: str = "") -> Optional[Dict[str, Any]]:
+        """Find a cached answer for a near-duplicate question embedded by ``embedder``."""
+        if not self.enabled:
+            return None
+
+        vector = self._normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            if vector is None or not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None or self._matrix_embedder != embedder:
+                self._rebuild_matrix(embedder)
+            if not self._matrix_keys:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ vector
+            for index in np.argsort(-similarities):
+                similarity = float(similarities[index])
+                if similarity < self.similarity_threshold:
+                    break
+                key = self._matrix_keys[index]
+                entry = self._entries.get(key)
+                if entry is None or now - entry["created_at"] > self.ttl_seconds:
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {**entry, "similarity": similarity}
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, query_embedding: List[float], response: str, embedder: str = "") -> None:
+        """Cache an answer generated for a question embedded by ``embedder``."""
+        if not self.enabled:
+            return
+
+        vector = self._normalize(query_embedding)
+        if vector is None:
+            return
+
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = {
+                "query": query,
+                "response": response,
+                "embedding": vector,
+                "embedder": embedder,
+                "created_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        """Invalidate all cached answers, e.g. after the knowledge base changes."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def _rebuild_matrix(self, embedder: str) -> None:
+        """Stack one embedder's cached embeddings into a matrix for vectorized lookups. Caller holds the lock."""
+        self._matrix_keys = [key for key, entry in self._entries.items() if entry["embedder"] == embedder]
+        self._matrix_embedder = embedder
+        self._matrix = (
+            np.vstack([self._entries[key]["embedding"] for key in self._matrix_keys])
+            if self._matrix_keys else None
+        )
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
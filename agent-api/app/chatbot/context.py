@@ -0,0 +1,288 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .prompts import FinancialPromptTemplates
+from .rag import RetrievalResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+# Words split into pieces of up to four characters, plus each punctuation mark:
+# close to (and rarely under) BPE counts for English and Spanish text
+_TOKEN_ESTIMATE_RE = re.compile(r"\w{1,4}|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """Counts prompt tokens for the configured model.
+
+    Uses a Hugging Face ``tokenizers`` tokenizer when one is configured (a
+    ``tokenizer.json`` path or a hub repo ID), otherwise a fixed,
+    conservative estimate. The estimate is not tuned against Ollama's
+    ``prompt_eval_count``: with the prompt prefix reused from the KV cache
+    that only counts the newly evaluated tokens. Counts of repeated texts
+    (template parts, popular chunks) are cached.
+    """
+
+    def __init__(self, model_name: str = "llama3.2", tokenizer: Optional[str] = None, cache_size: int = 4096):
+        self.model_name = model_name
+        self.tokenizer_name = tokenizer
+        self.cache_size = cache_size
+
+        self._tokenizer = self._load_tokenizer(tokenizer) if tokenizer else None
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def method(self) -> str:
+        return "tokenizer" if self._tokenizer is not None else "estimate"
+
+    def count(self, text: str, cache: bool = True) -> int:
+        """Number of tokens in ``text``; one-off texts can skip the cache."""
+        if not text:
+            return 0
+        if not cache:
+            return self._count(text)
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+
+        tokens = self._count(text)
+        with self._lock:
+            self._cache[text] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get token counter statistics."""
+        return {
+            "model": self.model_name,
+            "method": self.method,
+            "tokenizer": self.tokenizer_name,
+            "cached_counts": len(self._cache),
+        }
+
+    def _count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return len(_TOKEN_ESTIMATE_RE.findall(text))
+
+    @staticmethod
+    def _load_tokenizer(name: str) -> Optional["Tokenizer"]:
+        if not TOKENIZERS_AVAILABLE:
+            logger.warning("tokenizers not available, estimating prompt tokens")
+            return None
+        try:
+            if Path(name).is_file():
+                return Tokenizer.from_file(name)
+            return Tokenizer.from_pretrained(name)
+        except Exception as e:
+            logger.warning(f"Failed to load tokenizer {name}, estimating prompt tokens: {str(e)}")
+            return None
+
+
+def _shingles(text: str, size: int = 5) -> Set[tuple]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class PromptAssembler:
+    """Packs the system prompt, user context, retrieved chunks and history into one token budget.
+
+    The layout keeps the prompt prefix stable so the model server can reuse
+    its KV cache: the static system instructions, then the conversation
+    history as chat turns, then a final user turn carrying retrieved content,
+    user context and the question. Chunks that repeat content already packed
+    (overlapping splits, the same passage from two files) are skipped.
+    Retrieved chunks are packed first, up to ``rag_share`` of what is left
+    after the fixed parts, then history from the newest message back, then
+    any chunks that still fit. When old messages have to go, the history
+    window starts at a multiple of ``history_step`` messages, so it stays put
+    for a few turns instead of shifting (and invalidating the cache) on every
+    turn. A stored summary of the older conversation goes first in the
+    history and is always kept.
+    """
+
+    def __init__(
+        self,
+        counter: TokenCounter,
+        max_prompt_tokens: int = 1280,
+        rag_share: float = 0.6,
+        duplicate_threshold: float = 0.8,
+        history_step: int = 4,
+    ):
+        self.counter = counter
+        self.max_prompt_tokens = max_prompt_tokens
+        self.rag_share = rag_share
+        self.duplicate_threshold = duplicate_threshold
+        self.history_step = history_step
+
+        self.prompts = 0
+        self.total_tokens = 0
+        self.dropped_chunks = 0
+        self.duplicate_chunks = 0
+        self.dropped_messages = 0
+
+    def assemble(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        chunks: Optional[List[Dict[str, Any]]] = None,
+        user_context: str = "",
+        summary: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Build the system prompt, history turns and final user prompt within the token budget.
+
+        ``history`` is the session's messages (oldest first), ``chunks`` the
+        retrieval results in rank order and ``summary`` a summary of the
+        messages before ``history``.
+        """
+        count = self.counter.count
+        system_prompt = FinancialPromptTemplates.SYSTEM_INSTRUCTIONS
+        # The template with every variable section empty: the fixed cost of a turn
+        fixed_tokens = count(system_prompt) + count(
+            FinancialPromptTemplates.format_chat_prompt(user_message, " ", user_context), cache=False
+        )
+        summary_turns = []
+        summary_tokens = 0
+        if summary:
+            summary_turns.append({"role": "system", "content": FinancialPromptTemplates.format_summary_turn(summary)})
+            summary_tokens = count(summary_turns[0]["content"]) + 4
+        remaining = max(self.max_prompt_tokens - fixed_tokens - summary_tokens, 0)
+        seen: Set[tuple] = set(_shingles(user_context)) | _shingles(summary or "")
+
+        candidates: List[Optional[Dict[str, Any]]] = list(chunks or [])
+        packed_chunks: Dict[int, str] = {}
+        duplicates = 0
+
+        def pack_chunks(limit: int) -> int:
+            nonlocal duplicates
+            used = 0
+            for i, chunk in enumerate(candidates):
+                if i in packed_chunks or chunk is None:
+                    continue
+                shingles = _shingles(chunk["content"])
+                if shingles and len(shingles & seen) >= self.duplicate_threshold * len(shingles):
+                    candidates[i] = None
+                    duplicates += 1
+                    continue
+                text = RetrievalResult.format_chunk(chunk)
+                tokens = count(text) + 2  # separator
+                if used + tokens > limit:
+                    continue
+                packed_chunks[i] = text
+                seen.update(shingles)
+                used += tokens
+            return used
+
+        rag_tokens = pack_chunks(int(remaining * self.rag_share))
+
+        # History, newest first, skipping system notes such as feedback records
+        messages = [m for m in history or [] if m.get("role") in ("user", "assistant")]
+        message_tokens: List[int] = []  # newest first while packing
+        history_tokens = 0
+        start = len(messages)
+        while start > 0:
+            tokens = count(messages[start - 1]["content"]) + 4  # role header and separators
+            if rag_tokens + history_tokens + tokens > remaining:
+                break
+            message_tokens.append(tokens)
+            history_tokens += tokens
+            start -= 1
+        message_tokens.reverse()
+        if start and self.history_step > 1:
+            # Align the window start, always keeping the latest exchange
+            aligned = min(-(-start // self.history_step) * self.history_step, max(len(messages) - 2, start))
+            history_tokens -= sum(message_tokens[:aligned - start])
+            message_tokens = message_tokens[aligned - start:]
+            start = aligned
+        turns = [{"role": m["role"], "content": m["content"]} for m in messages[start:]]
+        for turn in turns:
+            seen.update(_shingles(turn["content"]))
+
+        rag_tokens += pack_chunks(remaining - rag_tokens - history_tokens)
+
+        rag_context = "\n---\n".join(packed_chunks[i] for i in sorted(packed_chunks))
+        prompt = FinancialPromptTemplates.format_chat_prompt(
+            user_message=user_message,
+            rag_context=rag_context,
+            user_context=user_context,
+        )
+
+        total = count(system_prompt) + summary_tokens + history_tokens + count(prompt, cache=False)
+        dropped_chunks = sum(1 for chunk in candidates if chunk is not None) - len(packed_chunks)
+        dropped_messages = len(messages) - len(turns)
+        self.prompts += 1
+        self.total_tokens += total
+        self.dropped_chunks += dropped_chunks
+        self.duplicate_chunks += duplicates
+        self.dropped_messages += dropped_messages
+
+        return {
+            "system_prompt": system_prompt,
+            "history": summary_turns + turns,
+            "prompt": prompt,
+            "tokens": {
+                "fixed": fixed_tokens,
+                "summary": summary_tokens,
+                "rag": rag_tokens,
+                "history": history_tokens,
+                "total": total,
+                "budget": self.max_prompt_tokens,
+            },
+            "chunks_used": len(packed_chunks),
+            "chunks_dropped": dropped_chunks,
+            "duplicate_chunks": duplicates,
+            "messages_used": len(turns),
+            "messages_dropped": dropped_messages,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prompt assembly statistics."""
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "prompts": self.prompts,
+            "avg_prompt_tokens": round(self.total_tokens / self.prompts, 1) if self.prompts else 0.0,
+            "dropped_chunks": self.dropped_chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+            "dropped_messages": self.dropped_messages,
+            "token_counter": self.counter.get_stats(),
+        }
+
+
+# Global prompt assembler instance
+_prompt_assembler: Optional[PromptAssembler] = None
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    """Get the global prompt assembler."""
+    global _prompt_assembler
+
+    if _prompt_assembler is None:
+        counter = TokenCounter(
+            model_name=os.getenv("OLLAMA_MODEL", "llama3.2"),
+            tokenizer=os.getenv("PROMPT_TOKENIZER") or None,
+        )
+        _prompt_assembler = PromptAssembler(
+            counter,
+            max_prompt_tokens=int(os.getenv("PROMPT_TOKEN_BUDGET", "1280")),
+            rag_share=float(os.getenv("PROMPT_RAG_SHARE", "0.6")),
+            history_step=int(os.getenv("PROMPT_HISTORY_STEP", "4")),
+        )
+
+    return _prompt_assembler
@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """Dedicated thread pool for blocking work, with a bounded number of queued tasks.
+
+    Callers await ``run``; once ``max_workers + max_queue_size`` tasks are in
+    flight, further callers wait for a slot instead of piling more work onto
+    the pool.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 64, name: str = "rag"):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._waiting_for_slot = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_queue_depth = 0
+        self._total_queue_wait = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking function in the pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+
+        self._waiting_for_slot += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting_for_slot -= 1
+
+        try:
+            with self._lock:
+                self._queued += 1
+                self._max_queue_depth = max(self._max_queue_depth, self._queued)
+            submitted_at = time.perf_counter()
+            call = functools.partial(self._call, func, args, kwargs, submitted_at)
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get executor statistics, including the current queue depth."""
+        finished = self._completed + self._failed
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self._queued,
+            "active": self._active,
+            "waiting_for_slot": self._waiting_for_slot,
+            "max_queue_depth": self._max_queue_depth,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_queue_wait_ms": round(self._total_queue_wait / finished * 1000, 3) if finished else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+    def _call(self, func: Callable[..., Any], args: tuple, kwargs: dict, submitted_at: float) -> Any:
+        """Run in a worker thread, keeping the queue depth counters up to date."""
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._total_queue_wait += time.perf_counter() - submitted_at
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        """Get the slot semaphore, recreating it if the event loop changed."""
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_workers + self.max_queue_size)
+            self._semaphore_loop = loop
+        return self._semaphore
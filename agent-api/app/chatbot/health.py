@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .llm import get_llm
+from .rag import get_rag
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Background prober that keeps LLM and RAG status fresh for cheap probes.
+
+    ``/live`` and ``/ready`` are answered from the cached state; only the
+    prober talks to Ollama and Chroma, once per ``interval_seconds``, using
+    lightweight checks (no generation, no document scans).
+    """
+
+    def __init__(self, interval_seconds: float = 30.0, timeout_seconds: float = 5.0):
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.started_at = time.monotonic()
+
+        self._llm_status: Dict[str, Any] = {"status": "unknown"}
+        self._rag_status: Dict[str, Any] = {"status": "unknown"}
+        self._last_checked: Optional[float] = None
+        self._last_checked_at: Optional[str] = None
+        self._last_duration_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+        self.probes = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        """Start the background prober."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        """Stop the background prober."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Probe the LLM and RAG pipeline now and update the cached state."""
+        start = time.perf_counter()
+        llm_status, rag_status = await asyncio.gather(self._probe_llm(), self._probe_rag())
+
+        self._llm_status = llm_status
+        self._rag_status = rag_status
+        self._last_checked = time.monotonic()
+        self._last_checked_at = datetime.now().isoformat()
+        self._last_duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.probes += 1
+        if not self._is_healthy():
+            self.failures += 1
+
+        return self.readiness()
+
+    def liveness(self) -> Dict[str, Any]:
+        """The process is up and serving requests."""
+        return {
+            "status": "alive",
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+        }
+
+    def readiness(self) -> Dict[str, Any]:
+        """Cached readiness: the last probe succeeded and is not stale."""
+        stale = self._last_checked is None or (
+            time.monotonic() - self._last_checked > self.interval_seconds * 3
+        )
+        ready = not stale and self._is_healthy()
+        return {
+            "ready": ready,
+            "stale": stale,
+            "llm": self._llm_status,
+            "rag": self._rag_status,
+            "last_checked": self._last_checked_at,
+            "last_probe_ms": self._last_duration_ms,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prober statistics."""
+        return {
+            "interval_seconds": self.interval_seconds,
+            "running": self._task is not None and not self._task.done(),
+            "probes": self.probes,
+            "failures": self.failures,
+            "last_checked": self._last_checked_at,
+            "last_probe_ms": self._last_duration_ms,
+        }
+
+    def _is_healthy(self) -> bool:
+        return self._llm_status.get("status") == "healthy" and self._rag_status.get("status") == "healthy"
+
+    async def _probe_loop(self) -> None:
+        """Refresh the cached state every ``interval_seconds``."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health probe failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _probe_llm(self) -> Dict[str, Any]:
+        try:
+            llm = await get_llm()
+            return await asyncio.wait_for(llm.ping(timeout=self.timeout_seconds), self.timeout_seconds)
+        except Exception as e:
+            return {"status": "error", "message": f"LLM probe failed: {str(e) or type(e).__name__}"}
+
+    async def _probe_rag(self) -> Dict[str, Any]:
+        try:
+            rag = await get_rag()
+            return await asyncio.wait_for(rag.health_check(), self.timeout_seconds)
+        except Exception as e:
+            return {"status": "error", "error": f"RAG probe failed: {str(e) or type(e).__name__}"}
+
+
+# Global health monitor instance
+_health_monitor: Optional[HealthMonitor] = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get the global health monitor instance."""
+    global _health_monitor
+
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(
+            interval_seconds=float(os.getenv("HEALTH_CHECK_INTERVAL", "30")),
+            timeout_seconds=float(os.getenv("HEALTH_CHECK_TIMEOUT", "5")),
+        )
+
+    return _health_monitor
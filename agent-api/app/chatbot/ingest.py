@@ -0,0 +1,378 @@
+"""
+Bulk ingestion of the docs directory.
+
+Files are hashed, parsed and split in a process pool, their new chunks are
+embedded in large cross-file batches and written to Chroma in batched
+upserts. Unchanged files are skipped using the ingest manifest.
+
+Usage (from the agent-api directory):
+    python -m app.chatbot.ingest
+    python -m app.chatbot.ingest --workers 8 --force data/docs/guides
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .loaders import parse_file
+from .manifest import normalize_source
+from .rag import RAGPipeline
+
+logger = logging.getLogger(__name__)
+
+# Leave a core for the event loop and embedding; a single core gets no process pool
+DEFAULT_WORKERS = min(4, max((os.cpu_count() or 1) - 1, 0))
+
+
+class BulkIngestor:
+    """Indexes many files at once with parallel parsing and batched embedding.
+
+    Files are parsed in a process pool of ``workers`` processes. With
+    ``workers=0``, or when fewer than ``min_files_for_pool`` files changed,
+    they are parsed in the RAG pipeline's ingestion thread pool instead,
+    which avoids the process start-up cost for small syncs.
+
+    Chunks are buffered until ``embed_batch_size`` are pending and then
+    encoded ``embed_sub_batch_size`` at a time, yielding to queued query
+    work between sub-batches so ingestion does not starve chat requests.
+    A file's source lock is held from planning until its chunks are
+    stored, so concurrent uploads of the same file are serialized.
+    """
+
+    def __init__(
+        self,
+        rag: RAGPipeline,
+        workers: int = 4,
+        embed_batch_size: int = 256,
+        embed_sub_batch_size: int = 64,
+        upsert_batch_size: int = 1000,
+        min_files_for_pool: int = 8,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.rag = rag
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.embed_sub_batch_size = embed_sub_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.min_files_for_pool = min_files_for_pool
+        self.on_progress = on_progress
+
+        self._pool: Optional[Executor] = None
+        self._use_pool = False
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffered_chunks = 0
+        # Source locks held for the buffered plans
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._started = 0.0
+        self.progress: Dict[str, Any] = self._new_progress()
+
+    async def run(
+        self,
+        paths: Optional[List[str]] = None,
+        metadata: Optional[Dict] = None,
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        """Ingest the given files, or sync the whole docs directory when none are given.
+
+        A docs directory sync also removes files that no longer exist.
+        """
+        files = [Path(path) for path in paths] if paths else self.rag.document_files()
+        self.progress = self._new_progress()
+        self.progress.update(status="running", files_total=len(files), started_at=datetime.now().isoformat())
+        self._started = time.perf_counter()
+
+        try:
+            await self._ingest_files(files, metadata, force)
+            if not paths:
+                removed = await self.rag.remove_missing_documents()
+                self.progress["files_removed"] = len(removed)
+            await self.rag.ingest_executor.run(self.rag.manifest.save)
+            self.progress["status"] = self._final_status()
+        except asyncio.CancelledError:
+            self.progress["status"] = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Bulk ingestion failed: {str(e)}")
+            self.progress["status"] = "failed"
+            self._record_error(None, str(e))
+        finally:
+            self._shutdown_pool()
+            self._buffer, self._buffered_chunks = [], 0
+            self._release(list(self._locks))
+            if self.progress["chunks_embedded"] or self.progress["chunks_deleted"]:
+                self.rag.response_cache.clear()
+            self._report()
+
+        logger.info(
+            f"Bulk ingestion {self.progress['status']}: {self.progress['files_indexed']} files indexed, "
+            f"{self.progress['files_unchanged']} unchanged, {self.progress['files_failed']} failed, "
+            f"{self.progress['chunks_embedded']} chunks embedded in {self.progress['elapsed_seconds']}s"
+        )
+        return self.get_progress()
+
+    def _final_status(self) -> str:
+        """``failed`` when no file could be ingested, ``partial`` when some could not."""
+        failed = self.progress["files_failed"]
+        if not failed:
+            return "completed"
+        return "failed" if failed >= self.progress["files_total"] else "partial"
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Get a snapshot of the current progress."""
+        progress = dict(self.progress)
+        progress["errors"] = list(self.progress["errors"])
+        if progress["status"] == "running":
+            progress["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+        return progress
+
+    async def _ingest_files(self, files: List[Path], metadata: Optional[Dict], force: bool) -> None:
+        """Parse files in parallel and feed their chunks to the embedding batches."""
+        loop = asyncio.get_running_loop()
+        candidates = []
+
+        for file_path in files:
+            source = await self.rag.ingest_executor.run(normalize_source, file_path)
+            try:
+                stat = await self.rag.ingest_executor.run(file_path.stat)
+            except OSError as e:
+                self._record_error(source, str(e))
+                continue
+
+            previous, file_metadata, reusable = self.rag.manifest_entry(source, metadata, force)
+            if reusable and self.rag.stat_unchanged(previous, stat):
+                self.progress["files_unchanged"] += 1
+                continue
+
+            candidates.append({
+                "source": source,
+                "stat": stat,
+                "previous": previous,
+                "metadata": file_metadata,
+                "reusable": reusable,
+            })
+
+        self._use_pool = self.workers > 0 and len(candidates) >= self.min_files_for_pool
+        window = (self.workers if self._use_pool else self.rag.ingest_executor.max_workers) * 4
+        pending: Set[asyncio.Future] = set()
+        contexts: Dict[asyncio.Future, Dict[str, Any]] = {}
+
+        for context in candidates:
+            previous = context["previous"] if context["reusable"] else None
+            future = asyncio.ensure_future(self._parse(loop, context["source"], previous))
+            contexts[future] = context
+            pending.add(future)
+
+            # Bound the number of parsed files held in memory
+            if len(pending) >= window:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    await self._handle_parsed(future, contexts.pop(future), force)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                await self._handle_parsed(future, contexts.pop(future), force)
+
+        await self._flush()
+
+    async def _parse(self, loop: asyncio.AbstractEventLoop, source: str, previous: Optional[Dict]) -> Dict:
+        known_sha256 = previous["sha256"] if previous else None
+        args = (source, self.rag.chunk_size, self.rag.chunk_overlap, known_sha256)
+        if not self._use_pool:
+            return await self.rag.ingest_executor.run(parse_file, *args)
+        return await loop.run_in_executor(self._get_pool(), parse_file, *args)
+
+    async def _handle_parsed(self, future: asyncio.Future, context: Dict[str, Any], force: bool) -> None:
+        """Plan a parsed file's chunk changes and buffer it for embedding."""
+        source = context["source"]
+        try:
+            parsed = future.result()
+        except Exception as e:
+            self._record_error(source, f"parse failed: {str(e)}")
+            return
+
+        lock = self.rag.source_lock(source)
+        # Never wait for a lock while holding others: a file listed twice, or one being
+        # indexed by another run, gets the buffered plans stored and their locks released first
+        if source in self._locks or lock.locked():
+            await self._flush()
+        await lock.acquire()
+        self._locks[source] = lock
+        # Another upload of the file may have been indexed while it was parsed
+        previous = self.rag.manifest.get(source)
+
+        if parsed["chunks"] is None:
+            # Touched but not modified
+            if previous is not None and previous["sha256"] == parsed["sha256"]:
+                self.rag.mark_unchanged(source, previous, context["stat"])
+            self._release([source])
+            self.progress["files_unchanged"] += 1
+            return
+
+        try:
+            plan = await self.rag.plan_chunks(
+                source,
+                previous,
+                context["metadata"],
+                force,
+                parsed["chunks"],
+                parsed["sha256"],
+                context["stat"],
+            )
+        except Exception as e:
+            self._release([source])
+            self._record_error(source, str(e))
+            return
+
+        self._buffer.append(plan)
+        self._buffered_chunks += len(plan["new"])
+        if self._buffered_chunks >= self.embed_batch_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """Embed and store the buffered files' new chunks."""
+        if not self._buffer:
+            return
+
+        plans, self._buffer, self._buffered_chunks = self._buffer, [], 0
+        texts = [plan["texts"][i] for plan in plans for i in plan["new"]]
+
+        try:
+            embeddings: List[List[float]] = []
+            for start in range(0, len(texts), self.embed_sub_batch_size):
+                await self.rag.yield_to_queries()
+                embeddings.extend(await self.rag.embed_texts(texts[start:start + self.embed_sub_batch_size]))
+                self.progress["chunks_embedded"] += len(texts[start:start + self.embed_sub_batch_size])
+                self._report()
+
+            results = await self.rag.store_plans(plans, embeddings, self.upsert_batch_size)
+            await self.rag.ingest_executor.run(self.rag.manifest.save)
+        except Exception as e:
+            for plan in plans:
+                self._record_error(plan["source"], f"indexing failed: {str(e)}")
+            return
+        finally:
+            self._release([plan["source"] for plan in plans])
+
+        for result in results:
+            self.progress["files_indexed"] += 1
+            self.progress["chunks_deleted"] += result["deleted"]
+        self._report()
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            # Spawned workers do not inherit the parent's threads (Chroma, executors)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def _shutdown_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _release(self, sources: List[str]) -> None:
+        for source in sources:
+            lock = self._locks.pop(source, None)
+            if lock is not None:
+                lock.release()
+
+    def _record_error(self, source: Optional[str], message: str) -> None:
+        if source is not None:
+            self.progress["files_failed"] += 1
+            logger.error(f"Error ingesting {source}: {message}")
+        # Keep the progress payload small
+        if len(self.progress["errors"]) < 50:
+            self.progress["errors"].append({"source": source, "error": message})
+
+    def _report(self) -> None:
+        self.progress["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+        if self.on_progress is not None:
+            self.on_progress(self.get_progress())
+
+    @staticmethod
+    def _new_progress() -> Dict[str, Any]:
+        return {
+            "status": "pending",
+            "files_total": 0,
+            "files_indexed": 0,
+            "files_unchanged": 0,
+            "files_failed": 0,
+            "files_removed": 0,
+            "chunks_embedded": 0,
+            "chunks_deleted": 0,
+            "started_at": None,
+            "elapsed_seconds": 0.0,
+            "errors": [],
+        }
+
+
+def create_ingestor(rag: RAGPipeline, workers: Optional[int] = None, **kwargs: Any) -> BulkIngestor:
+    """Create a bulk ingestor configured from the environment."""
+    if workers is None:
+        workers = int(os.getenv("INGEST_WORKERS", str(DEFAULT_WORKERS)))
+    return BulkIngestor(
+        rag,
+        workers=workers,
+        embed_batch_size=int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256")),
+        embed_sub_batch_size=int(os.getenv("INGEST_EMBED_SUB_BATCH_SIZE", "64")),
+        upsert_batch_size=int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "1000")),
+        **kwargs,
+    )
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="files or directories to ingest (default: the whole docs directory)")
+    parser.add_argument("--docs-dir", default=os.getenv("DOCS_DIR", "data/docs"))
+    parser.add_argument("--embeddings-dir", default=os.getenv("EMBEDDINGS_DIR", "data/embeddings"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-embed every chunk")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    rag = RAGPipeline(args.docs_dir, args.embeddings_dir)
+    if not await rag.initialize(sync=False):
+        raise SystemExit("Failed to initialize the RAG pipeline")
+
+    files: List[str] = []
+    for path in map(Path, args.paths):
+        if path.is_dir():
+            files.extend(
+                str(file_path) for file_path in sorted(path.rglob("*"))
+                if file_path.is_file() and file_path.suffix.lower() in RAGPipeline.SUPPORTED_EXTENSIONS
+            )
+        else:
+            files.append(str(path))
+
+    def report(progress: Dict[str, Any]) -> None:
+        done = progress["files_indexed"] + progress["files_unchanged"] + progress["files_failed"]
+        print(
+            f"[{done}/{progress['files_total']}] {progress['chunks_embedded']} chunks embedded, "
+            f"{progress['elapsed_seconds']:.1f}s",
+            flush=True,
+        )
+
+    ingestor = create_ingestor(rag, workers=args.workers, on_progress=report)
+    progress = await ingestor.run(files or None, force=args.force)
+    rag.executor.shutdown()
+    rag.ingest_executor.shutdown()
+
+    for error in progress["errors"]:
+        print(f"error: {error['source']}: {error['error']}")
+    if progress["status"] != "completed":
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A job function receives a callback for reporting progress and returns its final progress
+JobFunc = Callable[[Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued."""
+
+
+class IngestJobQueue:
+    """In-process queue for document ingestion jobs with bounded concurrency.
+
+    Jobs are identified by ID and keep their status, progress and errors
+    after they finish, up to ``max_retained`` finished jobs. A job that
+    reports per-item failures ends ``partial`` (some items failed) or
+    ``failed`` (all of them did).
+    """
+
+    def __init__(self, max_workers: int = 1, max_queued: int = 100, max_retained: int = 200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._funcs: Dict[str, JobFunc] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.partial = 0
+        self.failed = 0
+
+    def submit(self, kind: str, func: JobFunc, description: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job and return its initial state."""
+        queue = self._get_queue()
+        if queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Ingestion queue is full ({self.max_queued} jobs waiting)")
+
+        job_id = str(uuid.uuid4())
+        self._jobs[job_id] = {
+            "job_id": job_id,
+            "kind": kind,
+            "description": description,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "elapsed_seconds": 0.0,
+            "progress": {},
+            "errors": [],
+        }
+        self._funcs[job_id] = func
+        queue.put_nowait(job_id)
+        self.submitted += 1
+        self._prune()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's current state, or None if it is unknown."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        if job["status"] == "running":
+            job["elapsed_seconds"] = round(time.perf_counter() - job.pop("_started"), 3)
+        job.pop("_started", None)
+        return job
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """List the most recent jobs, newest first."""
+        return [self.get(job_id) for job_id in list(reversed(self._jobs))[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics."""
+        statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "max_workers": self.max_workers,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "partial": self.partial,
+            "failed": self.failed,
+        }
+
+    async def stop(self) -> None:
+        """Cancel the workers; running and queued jobs are marked cancelled."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._loop = None
+
+        # Jobs that never started will not run
+        finished_at = datetime.now().isoformat()
+        for job_id in list(self._funcs):
+            job = self._jobs.get(job_id)
+            if job is not None and job["status"] == "queued":
+                job.update(status="cancelled", finished_at=finished_at)
+        self._funcs.clear()
+
+    def _get_queue(self) -> asyncio.Queue:
+        """Get the job queue, starting the workers on first use or if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._workers = [
+                loop.create_task(self._worker(self._queue)) for _ in range(self.max_workers)
+            ]
+        return self._queue
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run_job(job_id)
+            finally:
+                queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        func = self._funcs.pop(job_id, None)
+        if job is None or func is None:
+            return
+
+        job.update(status="running", started_at=datetime.now().isoformat(), _started=time.perf_counter())
+
+        def report(progress: Dict[str, Any]) -> None:
+            job["progress"] = {key: value for key, value in progress.items() if key != "errors"}
+            job["errors"] = progress.get("errors", [])
+
+        try:
+            result = await func(report)
+            report(result)
+            status = result.get("status", "completed")
+            job["status"] = status if status in ("completed", "partial") else "failed"
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            job["status"] = "failed"
+            job["errors"] = job["errors"] + [{"source": None, "error": str(e)}]
+        finally:
+            job["finished_at"] = datetime.now().isoformat()
+            job["elapsed_seconds"] = round(time.perf_counter() - job.pop("_started"), 3)
+            if job["status"] == "completed":
+                self.completed += 1
+            elif job["status"] == "partial":
+                self.partial += 1
+            elif job["status"] == "failed":
+                self.failed += 1
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond ``max_retained``."""
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in ("completed", "partial", "failed", "cancelled")
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_retained)]:
+            del self._jobs[job_id]
+
+
+# Global job queue instance
+_job_queue: Optional[IngestJobQueue] = None
+
+
+def get_job_queue() -> IngestJobQueue:
+    """Get the global ingestion job queue."""
+    global _job_queue
+
+    if _job_queue is None:
+        _job_queue = IngestJobQueue(
+            max_workers=int(os.getenv("INGEST_JOB_WORKERS", "1")),
+            max_queued=int(os.getenv("INGEST_JOB_MAX_QUEUED", "100")),
+        )
+
+    return _job_queue
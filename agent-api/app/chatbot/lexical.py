@@ -0,0 +1,223 @@
+import math
+import re
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Keeps exact financial terms whole: "401k", "50/30/20", "3.5", "s&p"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[/.&][a-z0-9]+)*")
+# "401(k)" and "403(b)" are written both with and without parentheses
+_PAREN_SUFFIX_RE = re.compile(r"(\w)\((\w)\)")
+
+STOPWORDS = frozenset(
+    # English
+    "a an and are as at be but by for from has have how i if in is it its of on or so that the "
+    "their them this to was what when where which who why will with you your "
+    # Spanish
+    "al como con de del el en es la las lo los mas o para pero por que se su sus un una y"
+    .split()
+)
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip accents, so "inversión" and "inversion" match."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into accent-folded index terms, dropping common English and Spanish stopwords."""
+    text = _PAREN_SUFFIX_RE.sub(r"\1\2", fold_accents(text))
+    return [token for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: each list adds 1 / (k + rank) to an ID's score, best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over document chunks.
+
+    Each term's postings are two parallel ``array`` buffers (document
+    numbers and term frequencies), scored as NumPy views without copying.
+    Replaced or removed chunks are tombstoned and their postings are
+    dropped once tombstones exceed ``compact_ratio`` of the documents.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, compact_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        self.queries = 0
+        self.compactions = 0
+
+    def _reset(self) -> None:
+        self._term_ids: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._df = array("I")
+
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._doc_terms: List[Optional[array]] = []
+        self._alive = bytearray()
+        self._total_length = 0
+        self._tombstones = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add_many(self, doc_ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index chunks, replacing any already indexed under the same IDs."""
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            for doc_id, term_counts in zip(doc_ids, tokenized):
+                self._remove(doc_id)
+                self._add(doc_id, term_counts)
+            self._maybe_compact()
+
+    def remove_many(self, doc_ids: Iterable[str]) -> int:
+        """Tombstone chunks; returns how many were indexed."""
+        with self._lock:
+            removed = sum(self._remove(doc_id) for doc_id in doc_ids)
+            self._maybe_compact()
+            return removed
+
+    def clear(self) -> None:
+        """Drop every indexed chunk."""
+        with self._lock:
+            self._reset()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top ``k`` chunk IDs by BM25 score, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self.queries += 1
+            n_docs = len(self._doc_numbers)
+            term_ids = [self._term_ids[term] for term in terms if term in self._term_ids]
+            term_ids = [term_id for term_id in term_ids if self._df[term_id]]
+            if not n_docs or not term_ids:
+                return []
+
+            avg_length = self._total_length / n_docs
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            for term_id in term_ids:
+                df = self._df[term_id]
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                docs = np.frombuffer(self._postings_docs[term_id], dtype=np.uint32)
+                tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint32).astype(np.float32)
+                norms = self.k1 * (1.0 - self.b + self.b * lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + norms)
+            del lengths, docs, tfs  # release the buffer views so the arrays can grow again
+
+            scores *= np.frombuffer(self._alive, dtype=np.uint8)
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [(self._doc_ids[i], float(scores[i])) for i in candidates]
+
+    def compact(self) -> None:
+        """Drop tombstoned chunks from the postings and renumber the live ones."""
+        with self._lock:
+            self._compact()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        with self._lock:
+            n_docs = len(self._doc_numbers)
+            postings = sum(len(docs) for docs in self._postings_docs)
+            return {
+                "documents": n_docs,
+                "terms": sum(1 for df in self._df if df),
+                "postings": postings,
+                "tombstones": self._tombstones,
+                "avg_document_length": round(self._total_length / n_docs, 1) if n_docs else 0.0,
+                "postings_bytes": postings * 8,
+                "queries": self.queries,
+                "compactions": self.compactions,
+            }
+
+    def _add(self, doc_id: str, term_counts: Counter) -> None:
+        doc_number = len(self._doc_ids)
+        term_ids = array("I")
+        for term, tf in term_counts.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings_docs)
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("I"))
+                self._df.append(0)
+            self._postings_docs[term_id].append(doc_number)
+            self._postings_tfs[term_id].append(tf)
+            self._df[term_id] += 1
+            term_ids.append(term_id)
+
+        length = sum(term_counts.values())
+        self._doc_ids.append(doc_id)
+        self._doc_numbers[doc_id] = doc_number
+        self._doc_lengths.append(length)
+        self._doc_terms.append(term_ids)
+        self._alive.append(1)
+        self._total_length += length
+
+    def _remove(self, doc_id: str) -> bool:
+        doc_number = self._doc_numbers.pop(doc_id, None)
+        if doc_number is None:
+            return False
+        for term_id in self._doc_terms[doc_number]:
+            self._df[term_id] -= 1
+        self._total_length -= self._doc_lengths[doc_number]
+        self._doc_ids[doc_number] = None
+        self._doc_terms[doc_number] = None
+        self._alive[doc_number] = 0
+        self._tombstones += 1
+        return True
+
+    def _maybe_compact(self) -> None:
+        if self._tombstones > 64 and self._tombstones > self.compact_ratio * len(self._doc_ids):
+            self._compact()
+
+    def _compact(self) -> None:
+        if not self._tombstones:
+            return
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        new_numbers = (np.cumsum(alive) - 1).astype(np.uint32)
+
+        for term_id, (docs, tfs) in enumerate(zip(self._postings_docs, self._postings_tfs)):
+            doc_view = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[doc_view]
+            if keep.all():
+                new_docs = array("I", new_numbers[doc_view].tobytes())
+            else:
+                new_docs = array("I", new_numbers[doc_view[keep]].tobytes())
+                tfs = array("I", np.frombuffer(tfs, dtype=np.uint32)[keep].tobytes())
+            del doc_view
+            self._postings_docs[term_id] = new_docs
+            self._postings_tfs[term_id] = tfs
+
+        live = np.flatnonzero(alive)
+        self._doc_ids = [self._doc_ids[i] for i in live]
+        self._doc_terms = [self._doc_terms[i] for i in live]
+        self._doc_lengths = array("I", np.frombuffer(self._doc_lengths, dtype=np.uint32)[live].tobytes())
+        self._doc_numbers = {doc_id: i for i, doc_id in enumerate(self._doc_ids)}
+        self._alive = bytearray(b"\x01" * len(self._doc_ids))
+        self._tombstones = 0
+        self.compactions += 1
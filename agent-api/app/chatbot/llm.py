@@ -1,5 +1,10 @@
 import logging
 import asyncio
+import math
+import time
+import httpx
+from collections import deque
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, List
 from langchain_ollama import OllamaLLM
 from langchain.schema import HumanMessage, AIMessage, SystemMessage
@@ -7,11 +12,154 @@ import os
 import random
 from dotenv import load_dotenv
 
+from .ollama_client import OllamaClient
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+class LLMOverloaded(Exception):
+    """Raised when a generation request cannot be admitted."""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admission control for generation requests.
+    
+    At most ``max_in_flight`` generations run at once; up to ``max_queue``
+    more wait for a slot, each for at most ``queue_timeout`` seconds.
+    Requests beyond that are rejected immediately with a Retry-After hint
+    instead of piling onto the model server.
+    """
+    
+    def __init__(
+        self,
+        max_in_flight: int = 2,
+        max_queue: int = 16,
+        queue_timeout: float = 15.0,
+        window_size: int = 1000,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waits: deque = deque(maxlen=window_size)
+        self._avg_service_seconds: Optional[float] = None
+    
+    def check(self) -> None:
+        """Fail fast if a new request would be rejected because the queue is full."""
+        if self.waiting >= self.max_queue and self.in_flight >= self.max_in_flight:
+            self.rejected_queue_full += 1
+            raise LLMOverloaded("Generation queue is full", self.retry_after())
+    
+    @property
+    def idle(self) -> bool:
+        """Whether no generation is running or waiting for a slot."""
+        return self.in_flight == 0 and self.waiting == 0
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a generation slot, waiting in the bounded queue if necessary."""
+        start = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(start)
+    
+    async def acquire(self) -> float:
+        """Wait for a slot; returns when service started, for ``release``."""
+        self.check()
+        semaphore = self._get_semaphore(asyncio.get_running_loop())
+        queued_at = time.perf_counter()
+        
+        if not semaphore.locked():
+            await semaphore.acquire()
+        else:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise LLMOverloaded(
+                    f"No generation slot within {self.queue_timeout:g} seconds", self.retry_after()
+                )
+            finally:
+                self.waiting -= 1
+        
+        started_at = time.perf_counter()
+        self._waits.append(started_at - queued_at)
+        self.in_flight += 1
+        self.admitted += 1
+        return started_at
+    
+    def release(self, started_at: float) -> None:
+        """Free a slot and record how long it was held."""
+        service_seconds = time.perf_counter() - started_at
+        if self._avg_service_seconds is None:
+            self._avg_service_seconds = service_seconds
+        else:
+            self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+        self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+    
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from recent service times."""
+        service_seconds = self._avg_service_seconds or 1.0
+        rounds = self.waiting / max(self.max_in_flight, 1) + 1
+        return min(max(math.ceil(service_seconds * rounds), 1), 60)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission statistics, including queue wait percentiles in milliseconds."""
+        waits = sorted(self._waits)
+        
+        def percentile(p: float) -> float:
+            return round(waits[min(int(len(waits) * p), len(waits) - 1)] * 1000, 3) if waits else 0.0
+        
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "queue_wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 3) if waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(waits[-1] * 1000, 3) if waits else 0.0,
+            },
+            "avg_service_seconds": round(self._avg_service_seconds or 0.0, 3),
+        }
+    
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        """Get the slot semaphore, recreating it if the event loop changed."""
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._semaphore_loop = loop
+            self.in_flight = 0
+            self.waiting = 0
+        return self._semaphore
+
+
 class MockLLM:
     """Mock LLM for development and fallback purposes."""
     
@@ -29,13 +177,24 @@ class MockLLM:
         await asyncio.sleep(0.1)  # Simulate processing time
         return random.choice(self.responses)
     
+    async def astream(self, prompt: str):
+        """Mock streaming generation, one word at a time."""
+        response = random.choice(self.responses)
+        for word in response.split(" "):
+            await asyncio.sleep(0.01)  # Simulate token latency
+            yield word + " "
+    
     @property
     def is_available(self) -> bool:
         return self._is_available
 
 
 class LocalLLM:
-    """Wrapper for local LLM integration using Ollama with fallback support."""
+    """Wrapper for local LLM integration using Ollama with fallback support.
+    
+    ``backend`` selects how Ollama is called: ``"langchain"`` (OllamaLLM),
+    ``"ollama"`` (the native pooled OllamaClient) or ``"mock"`` (MockLLM only).
+    """
     
     def __init__(
         self,
@@ -44,30 +203,50 @@ class LocalLLM:
         temperature: float = 0.7,
         max_tokens: int = 1024,
         use_mock_fallback: bool = True,
+        admission: Optional[AdmissionController] = None,
+        backend: str = "langchain",
+        ollama_client: Optional[OllamaClient] = None,
     ):
         self.model_name = model_name
         self.ollama_base_url = ollama_base_url
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.use_mock_fallback = use_mock_fallback
+        self.backend = backend
+        self._ollama_client = ollama_client
         self._llm = None
         self._mock_llm = None
         self._is_available = False
         self._using_mock = False
+        # Bounds concurrent generations so bursts queue here instead of thrashing Ollama
+        self.admission = admission if admission is not None else AdmissionController()
         
     async def initialize(self) -> bool:
         """Initialize the LLM connection and check availability."""
+        if self.backend == "mock":
+            return await self._initialize_mock()
+        
         # First try to initialize Ollama
         try:
-            self._llm = OllamaLLM(
-                model=self.model_name,
-                base_url=self.ollama_base_url,
-                temperature=self.temperature,
-                num_predict=self.max_tokens,
-            )
-            
-            # Test connection with a simple query
-            test_response = await self._llm.ainvoke("Hello")
+            if self.backend == "ollama":
+                self._llm = self._ollama_client or OllamaClient(
+                    model=self.model_name,
+                    base_url=self.ollama_base_url,
+                    temperature=self.temperature,
+                    num_predict=self.max_tokens,
+                )
+                # Loading the model doubles as the connection test and warms it up
+                test_response = await self._llm.load()
+            else:
+                self._llm = OllamaLLM(
+                    model=self.model_name,
+                    base_url=self.ollama_base_url,
+                    temperature=self.temperature,
+                    num_predict=self.max_tokens,
+                )
+                
+                # Test connection with a simple query
+                test_response = await self._llm.ainvoke("Hello")
             if test_response:
                 self._is_available = True
                 self._using_mock = False
@@ -104,17 +283,41 @@ class LocalLLM:
         """Check if the LLM is available for use."""
         return self._is_available
     
+    @property
+    def using_mock(self) -> bool:
+        """Check if responses come from the mock fallback."""
+        return self._using_mock
+    
     async def generate_response(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        mock_fallback: bool = True,
     ) -> Optional[str]:
-        """Generate a response from the LLM."""
+        """Generate a response from the LLM.
+        
+        ``history`` holds earlier turns of the session (``role``/``content``),
+        sent between the system prompt and ``prompt``. Raises LLMOverloaded
+        when no generation slot is available in time. With
+        ``mock_fallback=False`` a failed generation returns None instead of
+        switching the LLM to the mock backend, for background work.
+        """
         if not self.is_available:
             logger.error("LLM is not available")
             return None
-            
+        
+        async with self.admission.slot():
+            return await self._generate_response(prompt, system_prompt, history, mock_fallback)
+    
+    async def _generate_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        history: Optional[List[Dict[str, str]]],
+        mock_fallback: bool = True,
+    ) -> Optional[str]:
         try:
             if self._using_mock:
                 # Use mock LLM
@@ -124,13 +327,10 @@ class LocalLLM:
                     return response
             else:
                 # Use real LLM
-                # Combine system prompt and user prompt
-                full_prompt = ""
-                if system_prompt:
-                    full_prompt += f"System: {system_prompt}\n\n"
-                full_prompt += f"User: {prompt}\n\nAssistant:"
-                
-                response = await self._llm.ainvoke(full_prompt)
+                if isinstance(self._llm, OllamaClient):
+                    response = await self._llm.achat(self._build_messages(prompt, system_prompt, history))
+                else:
+                    response = await self._llm.ainvoke(self._build_full_prompt(prompt, system_prompt, history))
                 
                 if response:
                     # Clean up the response
@@ -144,7 +344,7 @@ class LocalLLM:
         except Exception as e:
             logger.error(f"Error generating LLM response: {str(e)}")
             # Try fallback to mock if we're not already using it
-            if not self._using_mock and self.use_mock_fallback:
+            if not self._using_mock and self.use_mock_fallback and mock_fallback:
                 logger.info("Attempting fallback to mock LLM...")
                 try:
                     await self._initialize_mock()
@@ -158,28 +358,83 @@ class LocalLLM:
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
     ):
-        """Generate a streaming response from the LLM."""
+        """Generate a streaming response from the LLM, yielding text as it is produced.
+        
+        Holds a generation slot for the whole stream; raises LLMOverloaded
+        before the first chunk when none is available in time.
+        """
         if not self.is_available:
             logger.error("LLM is not available for streaming")
             return
-            
+        
+        async with self.admission.slot():
+            async for chunk in self._generate_streaming_response(prompt, system_prompt, history):
+                yield chunk
+    
+    async def _generate_streaming_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        history: Optional[List[Dict[str, str]]],
+    ):
+        if self._using_mock:
+            async for chunk in self._mock_llm.astream(prompt):
+                yield chunk
+            return
+        
+        if isinstance(self._llm, OllamaClient):
+            stream = self._llm.astream_chat(self._build_messages(prompt, system_prompt, history))
+        else:
+            stream = self._llm.astream(self._build_full_prompt(prompt, system_prompt, history))
+        produced_output = False
+        
         try:
-            # For streaming, we'd need to implement the Ollama streaming API
-            # This is a simplified version - you may want to use the actual streaming
-            full_prompt = ""
-            if system_prompt:
-                full_prompt += f"System: {system_prompt}\n\n"
-            full_prompt += f"User: {prompt}\n\nAssistant:"
-            
-            # For now, return the full response
-            # In a real implementation, you'd stream chunks
-            response = await self._llm.ainvoke(full_prompt)
-            yield response
-            
+            async for chunk in stream:
+                if chunk:
+                    produced_output = True
+                    yield chunk
+                    
         except Exception as e:
             logger.error(f"Error in streaming response: {str(e)}")
-            yield f"Error: {str(e)}"
+            # Fall back to mock only if nothing was sent yet
+            if not produced_output and self.use_mock_fallback:
+                logger.info("Attempting fallback to mock LLM...")
+                if await self._initialize_mock():
+                    async for chunk in self._mock_llm.astream(prompt):
+                        yield chunk
+    
+    def _build_full_prompt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """Combine system prompt, earlier turns and user prompt into a single completion prompt.
+        
+        Earlier turns render the same way on every request, so consecutive
+        prompts of a session share everything up to the newest turns.
+        """
+        full_prompt = ""
+        if system_prompt:
+            full_prompt += f"System: {system_prompt}\n\n"
+        for message in history or []:
+            full_prompt += f"{message['role'].title()}: {message['content']}\n\n"
+        full_prompt += f"User: {prompt}\n\nAssistant:"
+        return full_prompt
+    
+    @staticmethod
+    def _build_messages(
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> List[Dict[str, str]]:
+        """Chat messages: system prompt, earlier turns, then the user prompt."""
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history or [])
+        messages.append({"role": "user", "content": prompt})
+        return messages
     
     async def health_check(self) -> Dict[str, Any]:
         """Perform a health check on the LLM."""
@@ -230,17 +485,74 @@ class LocalLLM:
                 "using_mock": self._using_mock,
             }
     
+    async def ping(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Cheap health probe: checks Ollama is reachable and has the model, without generating."""
+        if not self.is_available:
+            return {
+                "status": "unavailable",
+                "message": "LLM not initialized",
+                "model": self.model_name,
+                "using_mock": self._using_mock,
+            }
+        
+        if self._using_mock:
+            return {
+                "status": "healthy",
+                "message": "Mock LLM active",
+                "model": self.model_name,
+                "using_mock": True,
+            }
+        
+        try:
+            start_time = asyncio.get_event_loop().time()
+            if isinstance(self._llm, OllamaClient):
+                models = set(await self._llm.list_models(timeout=timeout))
+            else:
+                async with httpx.AsyncClient(base_url=self.ollama_base_url, timeout=timeout) as client:
+                    response = await client.get("/api/tags")
+                    response.raise_for_status()
+                models = {model.get("name", "") for model in response.json().get("models", [])}
+            response_time = asyncio.get_event_loop().time() - start_time
+            
+            has_model = any(name.split(":")[0] == self.model_name.split(":")[0] for name in models)
+            
+            return {
+                "status": "healthy" if has_model else "degraded",
+                "message": "Ollama reachable" if has_model else f"Model {self.model_name} not found in Ollama",
+                "model": self.model_name,
+                "response_time_seconds": round(response_time, 3),
+                "using_mock": False,
+            }
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"LLM ping failed: {str(e)}",
+                "model": self.model_name,
+                "using_mock": False,
+            }
+    
+    async def aclose(self) -> None:
+        """Close the native client's pooled connections."""
+        if isinstance(self._llm, OllamaClient):
+            await self._llm.aclose()
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model."""
-        return {
+        info = {
             "model_name": self.model_name,
+            "backend": self.backend,
             "base_url": self.ollama_base_url,
             "temperature": self.temperature,
             "max_tokens": self.max_tokens,
             "is_available": self.is_available,
             "using_mock": self._using_mock,
             "mode": "Mock LLM (Fallback)" if self._using_mock else "Ollama LLM",
+            "admission": self.admission.get_stats(),
         }
+        if isinstance(self._llm, OllamaClient):
+            info["client"] = self._llm.get_stats()
+        return info
 
 
 # Global LLM instance
@@ -254,10 +566,31 @@ async def get_llm() -> LocalLLM:
     if _llm_instance is None:
         model_name = os.getenv("OLLAMA_MODEL", "llama3.2")
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        backend = os.getenv("LLM_BACKEND", "langchain").lower()
+        
+        ollama_client = None
+        if backend == "ollama":
+            ollama_client = OllamaClient(
+                model=model_name,
+                base_url=base_url,
+                keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+                connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT_SECONDS", "5")),
+                read_timeout=float(os.getenv("OLLAMA_READ_TIMEOUT_SECONDS", "60")),
+                total_timeout=float(os.getenv("OLLAMA_TOTAL_TIMEOUT_SECONDS", "300")),
+                max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8")),
+                http2=os.getenv("OLLAMA_HTTP2", "false").lower() == "true",
+            )
         
         _llm_instance = LocalLLM(
             model_name=model_name,
             ollama_base_url=base_url,
+            backend=backend,
+            ollama_client=ollama_client,
+            admission=AdmissionController(
+                max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "2")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+                queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "15")),
+            ),
         )
         
         await _llm_instance.initialize()
@@ -269,3 +602,9 @@ async def initialize_llm() -> bool:
     """Initialize the global LLM instance."""
     llm = await get_llm()
     return llm.is_available
+
+
+async def close_llm() -> None:
+    """Close the global LLM instance's connections."""
+    if _llm_instance is not None:
+        await _llm_instance.aclose()
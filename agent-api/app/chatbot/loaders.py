@@ -0,0 +1,62 @@
+"""
+Document loading and splitting.
+
+Kept free of heavy imports (embedding models, vector store) so bulk
+ingestion worker processes start quickly.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.document_loaders import UnstructuredFileLoader
+
+from .manifest import file_sha256
+
+
+def load_file_documents(file_path: Path) -> List[Document]:
+    """Load a document with the loader for its file type (blocking)."""
+    file_extension = file_path.suffix.lower()
+
+    if file_extension == ".pdf":
+        loader = PyPDFLoader(str(file_path))
+    elif file_extension == ".txt":
+        loader = TextLoader(str(file_path))
+    else:
+        # Try with unstructured loader for other formats
+        loader = UnstructuredFileLoader(str(file_path))
+
+    documents = loader.load()
+
+    # Add source metadata
+    for doc in documents:
+        doc.metadata["source"] = str(file_path)
+        doc.metadata["file_type"] = file_extension
+
+    return documents
+
+
+def parse_file(
+    source: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    known_sha256: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Hash, load and split one file (runs in a worker process).
+
+    When the content hash equals ``known_sha256`` the file is not parsed and
+    ``chunks`` is None.
+    """
+    file_hash = file_sha256(source)
+    if file_hash == known_sha256:
+        return {"sha256": file_hash, "chunks": None}
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    chunks = splitter.split_documents(load_file_documents(Path(source)))
+    return {"sha256": file_hash, "chunks": [(chunk.page_content, chunk.metadata) for chunk in chunks]}
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_source(path: str) -> str:
+    """The key a source file is indexed under: its absolute path with symlinks and ``..`` resolved."""
+    return str(Path(path).resolve())
+
+
+def make_chunk_ids(source: str, texts: List[str]) -> List[str]:
+    """Deterministic chunk IDs from the source and chunk content.
+
+    Repeated chunks within a file are told apart by their occurrence number,
+    so an unchanged chunk keeps its ID even when chunks before it change.
+    """
+    occurrences: Dict[str, int] = {}
+    ids = []
+    for text in texts:
+        occurrence = occurrences.get(text, 0)
+        occurrences[text] = occurrence + 1
+        digest = hashlib.sha256(f"{source}\0{occurrence}\0{text}".encode("utf-8")).hexdigest()
+        ids.append(digest[:32])
+    return ids
+
+
+class IngestManifest:
+    """Record of ingested source files: content hash, mtime, size and chunk IDs.
+
+    Persisted as a single JSON document next to the vector store and
+    replaced atomically on every save. ``version`` is that of the loaded
+    file (0 when there was none); version 2 keys sources by resolved path.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        """Get the entry for a source file, or None if it was never ingested."""
+        with self._lock:
+            entry = self._entries.get(source)
+            return dict(entry) if entry is not None else None
+
+    def set(self, source: str, entry: Dict[str, Any]) -> None:
+        """Record the ingested state of a source file."""
+        with self._lock:
+            self._entries[source] = entry
+
+    def remove(self, source: str) -> Optional[Dict[str, Any]]:
+        """Forget a source file, returning its last entry."""
+        with self._lock:
+            return self._entries.pop(source, None)
+
+    def sources(self) -> List[str]:
+        """List the ingested source files."""
+        with self._lock:
+            return list(self._entries)
+
+    def save(self) -> None:
+        """Write the manifest to disk atomically."""
+        with self._lock:
+            data = json.dumps({"version": self.VERSION, "sources": self._entries}, ensure_ascii=False)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+            self.version = self.VERSION
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get manifest statistics."""
+        with self._lock:
+            return {
+                "sources": len(self._entries),
+                "chunks": sum(len(entry.get("chunk_ids", [])) for entry in self._entries.values()),
+            }
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.version = data.get("version", 1)
+            self._entries = data.get("sources", {})
+            if self.version < self.VERSION:
+                self._entries = self._normalize(self._entries)
+        except Exception as e:
+            logger.error(f"Error loading ingest manifest {self.path}: {str(e)}")
+            self._entries = {}
+
+    @staticmethod
+    def _normalize(entries: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Re-key entries saved under unresolved paths by older versions.
+
+        Their chunk IDs were derived from the old key, so the entry is marked
+        as changed: the next sync re-plans the file and deletes the old chunks.
+        Entries for the same file under different spellings are merged.
+        """
+        normalized: Dict[str, Dict[str, Any]] = {}
+        for source, entry in entries.items():
+            key = normalize_source(source)
+            if key == source and key not in normalized:
+                normalized[key] = entry
+                continue
+            chunk_ids = normalized.get(key, {}).get("chunk_ids", []) + entry.get("chunk_ids", [])
+            normalized[key] = {**entry, "sha256": None, "mtime": None, "chunk_ids": list(dict.fromkeys(chunk_ids))}
+        return normalized
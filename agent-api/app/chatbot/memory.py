@@ -1,34 +1,162 @@
-import json
+import asyncio
 import os
+import threading
 import uuid
+from collections import Counter, OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import logging
 from pathlib import Path
 
+from .storage import SessionStorage, JsonlSessionStorage, create_storage
+from .topics import topic_matcher
+
 logger = logging.getLogger(__name__)
 
 
+class SessionState:
+    """Values derived from a cached session's messages, kept up to date as messages come and go.
+    
+    Holds per-role counts, topic counts, the first and last timestamps and
+    the last ``context_window`` messages pre-rendered as context lines, so
+    summaries and recent-context lookups never rescan the history.
+    """
+    
+    def __init__(self, context_window: int = 10):
+        self.role_counts: Counter = Counter()
+        self.topics: Counter = Counter()
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+        self.lines: deque = deque(maxlen=context_window)
+        self._contexts: Dict[Tuple[int, int], str] = {}
+    
+    def add(self, message: Dict[str, Any]) -> None:
+        """Account for a message appended to the history."""
+        self.role_counts[message["role"]] += 1
+        self.topics.update(topic_matcher.count(message["content"]))
+        if self.first_timestamp is None:
+            self.first_timestamp = message["timestamp"]
+        self.last_timestamp = message["timestamp"]
+        self.lines.append(f"{message['role'].title()}: {message['content']}")
+        self._contexts.clear()
+    
+    def remove(self, message: Dict[str, Any], next_timestamp: Optional[str]) -> None:
+        """Account for the oldest message being trimmed; ``next_timestamp`` is the new oldest."""
+        self.role_counts[message["role"]] -= 1
+        self.topics.subtract(topic_matcher.count(message["content"]))
+        self.topics += Counter()  # drop topics no longer mentioned
+        self.first_timestamp = next_timestamp
+    
+    def recent_context(self, max_messages: int, max_chars: int) -> Optional[str]:
+        """The newest messages that fit in ``max_chars``, or None if the window is too small."""
+        if not max_messages or max_messages > self.lines.maxlen:
+            return None
+        key = (max_messages, max_chars)
+        context = self._contexts.get(key)
+        if context is None:
+            parts = []
+            total_chars = 0
+            for line in islice(reversed(self.lines), max_messages):
+                if total_chars + len(line) > max_chars:
+                    break
+                parts.append(line)
+                total_chars += len(line)
+            context = self._contexts[key] = "\n".join(reversed(parts))
+        return context
+    
+    def duration_minutes(self) -> float:
+        """Minutes between the oldest and newest retained messages."""
+        if self.first_timestamp is None or self.first_timestamp == self.last_timestamp:
+            return 0
+        try:
+            duration = datetime.fromisoformat(self.last_timestamp) - datetime.fromisoformat(self.first_timestamp)
+            return round(duration.total_seconds() / 60, 2)
+        except Exception:
+            return 0
+
+
 class ConversationMemory:
-    """Manages conversation memory for the chatbot."""
+    """Manages conversation memory for the chatbot.
+    
+    Sessions are persisted through a pluggable ``SessionStorage`` backend
+    (append-only JSON Lines files by default, or SQLite). Adding a message
+    appends a single record, and a session's stored history is compacted to
+    the retained window once it grows past ``compact_threshold`` records.
     
-    def __init__(self, memory_dir: str = "data/memory", max_history: int = 50):
+    Active sessions are kept in an LRU cache bounded by session count and by
+    approximate size in bytes. With ``write_behind_seconds`` set, appends are
+    buffered and flushed by a background thread, coalescing the records of
+    rapid consecutive messages into one write per session. Each cached
+    session also carries a ``SessionState`` updated on every message, which
+    serves summaries and recent context without rescanning the history.
+    
+    The ``a``-prefixed methods are the async API for request handlers: they
+    never block the event loop on storage IO, and new messages are persisted
+    by a background writer task fed through a bounded queue, so callers wait
+    (backpressure) only when the writer falls ``write_queue_size`` behind.
+    """
+    
+    def __init__(
+        self,
+        memory_dir: str = "data/memory",
+        max_history: int = 50,
+        compact_threshold: Optional[int] = None,
+        max_cached_sessions: int = 1000,
+        max_cache_bytes: int = 64 * 1024 * 1024,
+        write_behind_seconds: float = 0,
+        storage: Optional[SessionStorage] = None,
+        write_queue_size: int = 1000,
+        context_window: int = 10,
+    ):
         self.memory_dir = Path(memory_dir)
         self.max_history = max_history
+        self.compact_threshold = compact_threshold or max_history * 2
+        self.max_cached_sessions = max_cached_sessions
+        self.max_cache_bytes = max_cache_bytes
+        self.write_behind_seconds = write_behind_seconds
+        self.write_queue_size = write_queue_size
+        self.context_window = min(context_window, max_history)
         self.memory_dir.mkdir(parents=True, exist_ok=True)
+        self.storage = storage if storage is not None else JsonlSessionStorage(memory_dir)
         
-        # In-memory cache for active sessions
-        self._session_cache: Dict[str, List[Dict[str, Any]]] = {}
+        # In-memory LRU cache for active sessions
+        self._session_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
         self._session_metadata: Dict[str, Dict[str, Any]] = {}
+        self._session_state: Dict[str, SessionState] = {}
+        self._session_bytes: Dict[str, int] = {}
+        self._resident_bytes = 0
+        # Number of records each session has in storage
+        self._stored_records: Dict[str, int] = {}
+        # Records waiting for the write-behind flusher or the async writer
+        self._pending_records: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.RLock()
+        # Set while an operation runs inline on the event loop (under the lock)
+        self._inline = False
+        
+        # Async writer: session IDs with pending records, bound to one event loop
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._writer_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.backpressure_waits = 0
+        
+        self._stop_flusher = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if write_behind_seconds > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="memory-write-behind", daemon=True
+            )
+            self._flusher.start()
     
     def generate_session_id(self) -> str:
         """Generate a new session ID."""
         return str(uuid.uuid4())
     
-    def get_session_file_path(self, session_id: str) -> Path:
-        """Get the file path for a session."""
-        return self.memory_dir / f"session_{session_id}.json"
-    
     def add_message(
         self,
         session_id: str,
@@ -38,32 +166,29 @@ class ConversationMemory:
         user_id: Optional[str] = None,
     ) -> None:
         """Add a message to the conversation memory."""
-        message = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": metadata or {},
-        }
-        
-        # Add to cache
-        if session_id not in self._session_cache:
-            self._session_cache[session_id] = []
-            self._session_metadata[session_id] = {
-                "created_at": datetime.now().isoformat(),
-                "user_id": user_id,
-                "message_count": 0,
-            }
-        
-        self._session_cache[session_id].append(message)
-        self._session_metadata[session_id]["message_count"] += 1
-        self._session_metadata[session_id]["updated_at"] = datetime.now().isoformat()
-        
-        # Trim history if too long
-        if len(self._session_cache[session_id]) > self.max_history:
-            self._session_cache[session_id] = self._session_cache[session_id][-self.max_history:]
-        
-        # Persist to disk
-        self._save_session(session_id)
+        with self._lock:
+            self._record_message(session_id, role, content, metadata, user_id)
+            
+            # Persist to disk unless the write-behind flusher will
+            if self._flusher is None:
+                self._flush_session(session_id)
+            
+            self._evict_idle_sessions(keep=session_id)
+    
+    async def aadd_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        user_id: Optional[str] = None,
+    ) -> None:
+        """Add a message, leaving persistence to the background writer."""
+        await self._run_nonblocking(
+            session_id, self._buffer_message, session_id, role, content, metadata, user_id
+        )
+        if self._flusher is None:
+            await self._enqueue_write(session_id)
     
     def get_conversation_history(
         self,
@@ -71,14 +196,10 @@ class ConversationMemory:
         limit: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """Get conversation history for a session."""
-        # Try cache first
-        if session_id in self._session_cache:
-            messages = self._session_cache[session_id]
-        else:
-            # Load from disk
-            messages = self._load_session(session_id)
+        with self._lock:
+            messages = self._get_cached_session(session_id)
             if messages:
-                self._session_cache[session_id] = messages
+                self._evict_idle_sessions(keep=session_id)
         
         if not messages:
             return []
@@ -89,6 +210,14 @@ class ConversationMemory:
         
         return messages
     
+    async def aget_conversation_history(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get conversation history without blocking the event loop."""
+        return await self._run_nonblocking(session_id, self.get_conversation_history, session_id, limit)
+    
     def get_recent_context(
         self,
         session_id: str,
@@ -96,156 +225,454 @@ class ConversationMemory:
         max_chars: int = 2000,
     ) -> str:
         """Get recent conversation context as a formatted string."""
-        history = self.get_conversation_history(session_id, limit=max_messages)
-        
-        if not history:
-            return "No previous conversation."
+        with self._lock:
+            history = self.get_conversation_history(session_id, limit=max_messages)
+            
+            if not history:
+                return "No previous conversation."
+            
+            context = self._session_state[session_id].recent_context(max_messages, max_chars)
+            if context is not None:
+                return context
         
+        # Wider than the pre-rendered window: work backwards from most recent
         context_parts = []
         total_chars = 0
-        
-        # Work backwards from most recent
         for message in reversed(history):
-            role = message["role"].title()
-            content = message["content"]
-            
-            message_text = f"{role}: {content}"
+            message_text = f"{message['role'].title()}: {message['content']}"
             
             # Check if adding this message would exceed character limit
             if total_chars + len(message_text) > max_chars:
                 break
             
-            context_parts.insert(0, message_text)
+            context_parts.append(message_text)
             total_chars += len(message_text)
         
-        return "\n".join(context_parts)
+        return "\n".join(reversed(context_parts))
+    
+    async def aget_recent_context(
+        self,
+        session_id: str,
+        max_messages: int = 10,
+        max_chars: int = 2000,
+    ) -> str:
+        """Get recent conversation context without blocking the event loop."""
+        return await self._run_nonblocking(
+            session_id, self.get_recent_context, session_id, max_messages, max_chars
+        )
     
     def get_session_summary(self, session_id: str) -> Dict[str, Any]:
         """Get a summary of the session."""
-        metadata = self._session_metadata.get(session_id, {})
-        history = self.get_conversation_history(session_id)
-        
-        # Calculate basic statistics
-        user_messages = [msg for msg in history if msg["role"] == "user"]
-        assistant_messages = [msg for msg in history if msg["role"] == "assistant"]
-        
-        # Extract topics (simple keyword extraction)
-        topics = self._extract_topics(history)
-        
-        return {
-            "session_id": session_id,
-            "metadata": metadata,
-            "message_count": len(history),
-            "user_message_count": len(user_messages),
-            "assistant_message_count": len(assistant_messages),
-            "topics": topics,
-            "duration_minutes": self._calculate_session_duration(history),
-        }
+        with self._lock:
+            history = self.get_conversation_history(session_id)
+            metadata = self._session_metadata.get(session_id, {})
+            state = self._session_state.get(session_id) if history else None
+            if state is None:
+                state = SessionState()
+            
+            return {
+                "session_id": session_id,
+                "metadata": metadata,
+                "message_count": len(history),
+                "user_message_count": state.role_counts["user"],
+                "assistant_message_count": state.role_counts["assistant"],
+                "topics": [topic for topic, _ in state.topics.most_common()],
+                "duration_minutes": state.duration_minutes(),
+            }
+    
+    async def aget_session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Get a session summary without blocking the event loop."""
+        return await self._run_nonblocking(session_id, self.get_session_summary, session_id)
+    
+    def get_summarized_history(self, session_id: str) -> Tuple[Optional[str], List[Dict[str, Any]], int]:
+        """Get the stored conversation summary and the messages it does not cover.
+    
+        Returns ``(summary, messages, start)`` where ``start`` is the position of
+        the first returned message in the whole conversation, counting
+        messages already trimmed from history.
+        """
+        with self._lock:
+            history = self.get_conversation_history(session_id)
+            metadata = self._session_metadata.get(session_id, {})
+            start = max(metadata.get("message_count", len(history)) - len(history), 0)
+            summary = metadata.get("conversation_summary")
+            if not summary:
+                return None, history, start
+    
+            skip = min(max(metadata.get("summary_through", 0) - start, 0), len(history))
+            return summary, history[skip:], start + skip
+    
+    async def aget_summarized_history(self, session_id: str) -> Tuple[Optional[str], List[Dict[str, Any]], int]:
+        """Get the summary and unsummarized messages without blocking the event loop."""
+        return await self._run_nonblocking(session_id, self.get_summarized_history, session_id)
+    
+    def set_summary(self, session_id: str, summary: str, through: int) -> bool:
+        """Store a summary of the first ``through`` messages of a conversation."""
+        with self._lock:
+            if not self._buffer_summary(session_id, summary, through):
+                return False
+            if self._flusher is None:
+                self._flush_session(session_id)
+        return True
+    
+    async def aset_summary(self, session_id: str, summary: str, through: int) -> bool:
+        """Store a summary, leaving persistence to the background writer."""
+        stored = await self._run_nonblocking(session_id, self._buffer_summary_locked, session_id, summary, through)
+        if stored and self._flusher is None:
+            await self._enqueue_write(session_id)
+        return stored
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a conversation session."""
         try:
-            # Remove from cache
-            self._session_cache.pop(session_id, None)
-            self._session_metadata.pop(session_id, None)
-            
-            # Remove from disk
-            session_file = self.get_session_file_path(session_id)
-            if session_file.exists():
-                session_file.unlink()
+            with self._lock:
+                # Remove from cache
+                self._pending_records.pop(session_id, None)
+                self._drop_session(session_id)
+                
+                # Remove from storage
+                self.storage.delete(session_id)
             
             return True
         except Exception as e:
             logger.error(f"Error deleting session {session_id}: {str(e)}")
             return False
     
+    async def adelete_session(self, session_id: str) -> bool:
+        """Delete a session in a worker thread."""
+        return await asyncio.to_thread(self.delete_session, session_id)
+    
     def cleanup_old_sessions(self, days: int = 30) -> int:
         """Clean up sessions older than specified days."""
         cutoff_date = datetime.now() - timedelta(days=days)
-        deleted_count = 0
         
         try:
-            for session_file in self.memory_dir.glob("session_*.json"):
-                if session_file.stat().st_mtime < cutoff_date.timestamp():
-                    session_id = session_file.stem.replace("session_", "")
-                    if self.delete_session(session_id):
-                        deleted_count += 1
+            with self._lock:
+                # Sessions with buffered writes are still active
+                self.flush()
+                deleted = self.storage.delete_older_than(cutoff_date)
+                for session_id in deleted:
+                    self._drop_session(session_id)
+            return len(deleted)
         except Exception as e:
             logger.error(f"Error during session cleanup: {str(e)}")
-        
-        return deleted_count
+            return 0
+    
+    def list_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """List stored sessions, optionally for a single user, most recent first."""
+        with self._lock:
+            self.flush()
+            return self.storage.list_sessions(user_id=user_id, limit=limit)
+    
+    async def alist_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """List stored sessions in a worker thread."""
+        return await asyncio.to_thread(self.list_sessions, user_id, limit)
+    
+    def flush(self) -> None:
+        """Write out all buffered records."""
+        with self._lock:
+            session_ids = list(self._pending_records)
+            for session_id in session_ids:
+                self._flush_session(session_id)
+            if session_ids:
+                self.flushes += 1
+            self._evict_idle_sessions()
     
-    def _save_session(self, session_id: str) -> None:
-        """Save session to disk."""
+    async def adrain(self) -> None:
+        """Wait until the async writer has persisted everything queued so far."""
+        if self._write_queue is not None and self._writer_loop is asyncio.get_running_loop():
+            await self._write_queue.join()
+    
+    def close(self) -> None:
+        """Stop the write-behind flusher and write out anything still buffered."""
+        self._stop_flusher.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+        self.storage.close()
+    
+    async def aclose(self) -> None:
+        """Drain and stop the async writer, then flush and close storage."""
         try:
-            session_data = {
-                "session_id": session_id,
-                "metadata": self._session_metadata.get(session_id, {}),
-                "messages": self._session_cache.get(session_id, []),
+            await self.adrain()
+        finally:
+            if self._writer_task is not None:
+                self._writer_task.cancel()
+                self._writer_task = None
+            self._write_queue = None
+            self._writer_loop = None
+            # Anything the writer did not get to is still in the pending buffer
+            await asyncio.to_thread(self.close)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get memory cache statistics."""
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "active_sessions": len(self._session_cache),
+                "max_cached_sessions": self.max_cached_sessions,
+                "resident_bytes": self._resident_bytes,
+                "max_cache_bytes": self.max_cache_bytes,
+                "max_history": self.max_history,
+                "storage_backend": type(self.storage).__name__,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "write_behind_seconds": self.write_behind_seconds,
+                "pending_writes": sum(len(records) for records in self._pending_records.values()),
+                "flushes": self.flushes,
+                "write_queue_depth": self._write_queue.qsize() if self._write_queue is not None else 0,
+                "write_queue_size": self.write_queue_size,
+                "backpressure_waits": self.backpressure_waits,
             }
+    
+    def _record_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]],
+        user_id: Optional[str],
+    ) -> None:
+        """Add a message to the cache and buffer its records for persistence."""
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            "metadata": metadata or {},
+        }
+        records = []
+        
+        # Add to cache, picking up any history already on disk
+        messages = self._get_cached_session(session_id)
+        
+        if messages is None:
+            messages = []
+            self._session_metadata[session_id] = {
+                "created_at": message["timestamp"],
+                "user_id": user_id,
+                "message_count": 0,
+            }
+            self._cache_session(session_id, messages)
+            records.append({"type": "meta", "metadata": dict(self._session_metadata[session_id])})
+        
+        messages.append(message)
+        self._session_state[session_id].add(message)
+        self._session_metadata[session_id]["message_count"] += 1
+        self._session_metadata[session_id]["updated_at"] = message["timestamp"]
+        records.append({"type": "message", "message": message})
+        self._adjust_session_bytes(session_id, self._estimate_size(message))
+        
+        # Trim history if too long
+        if len(messages) > self.max_history:
+            trimmed = messages[:-self.max_history]
+            del messages[:-self.max_history]
+            state = self._session_state[session_id]
+            for old in trimmed:
+                state.remove(old, messages[0]["timestamp"])
+            self._adjust_session_bytes(session_id, -sum(self._estimate_size(m) for m in trimmed))
+        
+        self._pending_records.setdefault(session_id, []).extend(records)
+    
+    def _buffer_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]],
+        user_id: Optional[str],
+    ) -> None:
+        """Record a message, leaving its records in the pending buffer."""
+        with self._lock:
+            self._record_message(session_id, role, content, metadata, user_id)
+            self._evict_idle_sessions(keep=session_id)
+    
+    def _buffer_summary(self, session_id: str, summary: str, through: int) -> bool:
+        """Record a conversation summary in the session metadata and buffer it for persistence."""
+        if self._get_cached_session(session_id) is None:
+            return False
+    
+        metadata = self._session_metadata[session_id]
+        if through <= metadata.get("summary_through", 0):
+            return False
+    
+        metadata["conversation_summary"] = summary
+        metadata["summary_through"] = through
+        # A metadata snapshot replaces the stored one; later message records count on from it
+        self._pending_records.setdefault(session_id, []).append({"type": "meta", "metadata": dict(metadata)})
+        return True
+    
+    def _buffer_summary_locked(self, session_id: str, summary: str, through: int) -> bool:
+        with self._lock:
+            return self._buffer_summary(session_id, summary, through)
+    
+    def _flush_session(self, session_id: str) -> None:
+        """Write out a session's buffered records."""
+        records = self._pending_records.pop(session_id, None)
+        if records:
+            self._append_records(session_id, records)
+    
+    def _flush_sessions(self, session_ids: List[str]) -> None:
+        """Write out the buffered records of several sessions (async writer thread)."""
+        with self._lock:
+            for session_id in session_ids:
+                self._flush_session(session_id)
+            # Sessions skipped by inline eviction can go now that they are written
+            self._evict_idle_sessions()
+    
+    async def _run_nonblocking(self, session_id: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run an operation inline when it needs no IO, otherwise in a worker thread.
+        
+        Inline means the session is already cached and the lock is free; the
+        lock may be held by a thread doing storage IO, so the event loop never
+        waits for it. Inline eviction never writes: sessions with unwritten
+        records are left for the writer to evict once it has flushed them.
+        """
+        if session_id in self._session_cache and self._lock.acquire(blocking=False):
+            try:
+                if session_id in self._session_cache:
+                    self._inline = True
+                    try:
+                        return func(*args)
+                    finally:
+                        self._inline = False
+            finally:
+                self._lock.release()
+        return await asyncio.to_thread(func, *args)
+    
+    async def _enqueue_write(self, session_id: str) -> None:
+        """Hand a session with pending records to the async writer."""
+        loop = asyncio.get_running_loop()
+        if self._write_queue is None or self._writer_loop is not loop:
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_size)
+            self._writer_loop = loop
+            self._writer_task = loop.create_task(self._write_loop(self._write_queue))
+        
+        if self._write_queue.full():
+            self.backpressure_waits += 1
+        await self._write_queue.put(session_id)
+    
+    async def _write_loop(self, queue: asyncio.Queue) -> None:
+        """Background task persisting buffered records, one batch of sessions at a time."""
+        while True:
+            session_ids = [await queue.get()]
+            while not queue.empty():
+                session_ids.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._flush_sessions, list(dict.fromkeys(session_ids)))
+            except Exception as e:
+                logger.error(f"Error persisting conversation memory: {str(e)}")
+            finally:
+                for _ in session_ids:
+                    queue.task_done()
+    
+    def _get_cached_session(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get a session's messages from the cache, loading it from disk on a miss."""
+        if session_id in self._session_cache:
+            self.cache_hits += 1
+            self._session_cache.move_to_end(session_id)
+            return self._session_cache[session_id]
+        
+        self.cache_misses += 1
+        messages = self._load_session(session_id)
+        if messages is None:
+            return None
+        
+        self._cache_session(session_id, messages)
+        return messages
+    
+    def _cache_session(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Insert a session as the most recently used cache entry."""
+        self._session_cache[session_id] = messages
+        self._session_cache.move_to_end(session_id)
+        state = self._session_state[session_id] = SessionState(self.context_window)
+        for message in messages:
+            state.add(message)
+        self._session_bytes[session_id] = 0
+        self._adjust_session_bytes(session_id, sum(self._estimate_size(m) for m in messages))
+    
+    def _adjust_session_bytes(self, session_id: str, delta: int) -> None:
+        self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + delta
+        self._resident_bytes += delta
+    
+    def _drop_session(self, session_id: str) -> None:
+        """Remove a session from all in-memory structures."""
+        self._session_cache.pop(session_id, None)
+        self._session_metadata.pop(session_id, None)
+        self._session_state.pop(session_id, None)
+        self._stored_records.pop(session_id, None)
+        self._resident_bytes -= self._session_bytes.pop(session_id, 0)
+    
+    def _evict_idle_sessions(self, keep: Optional[str] = None) -> None:
+        """Evict least recently used sessions until the cache is within its limits.
+        
+        Inline on the event loop, sessions with unwritten records are skipped
+        instead of flushed; the writer evicts them after writing them out.
+        """
+        for session_id in list(self._session_cache):
+            if (
+                len(self._session_cache) <= self.max_cached_sessions
+                and self._resident_bytes <= self.max_cache_bytes
+            ):
+                break
+            if session_id == keep:
+                continue
             
-            session_file = self.get_session_file_path(session_id)
-            with open(session_file, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, indent=2, ensure_ascii=False)
-                
+            # Buffered writes must reach disk before the session leaves memory
+            if session_id in self._pending_records:
+                if self._inline:
+                    continue
+                self._flush_session(session_id)
+            
+            self._drop_session(session_id)
+            self.evictions += 1
+    
+    @staticmethod
+    def _estimate_size(message: Dict[str, Any]) -> int:
+        """Approximate the memory footprint of a message in bytes."""
+        metadata = message.get("metadata")
+        return 200 + len(message.get("content", "")) * 2 + (len(str(metadata)) if metadata else 0)
+    
+    def _flush_loop(self) -> None:
+        """Background thread for write-behind persistence."""
+        while not self._stop_flusher.wait(self.write_behind_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing conversation memory: {str(e)}")
+    
+    def _append_records(self, session_id: str, records: List[Dict[str, Any]]) -> None:
+        """Persist records, compacting the stored history when it gets long."""
+        try:
+            self._stored_records[session_id] = self.storage.append(session_id, records)
+            if self._stored_records[session_id] > self.compact_threshold:
+                self._stored_records[session_id] = self.storage.compact(
+                    session_id,
+                    self._session_metadata.get(session_id, {}),
+                    self._session_cache.get(session_id, []),
+                )
         except Exception as e:
             logger.error(f"Error saving session {session_id}: {str(e)}")
     
     def _load_session(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
-        """Load session from disk."""
+        """Load session from storage."""
         try:
-            session_file = self.get_session_file_path(session_id)
-            if not session_file.exists():
+            loaded = self.storage.load(session_id, self.max_history)
+            if loaded is None:
                 return None
             
-            with open(session_file, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
+            metadata, messages, stored_records = loaded
             
             # Update metadata cache
-            self._session_metadata[session_id] = session_data.get("metadata", {})
+            self._session_metadata[session_id] = metadata
+            self._stored_records[session_id] = stored_records
             
-            return session_data.get("messages", [])
+            return messages
             
         except Exception as e:
             logger.error(f"Error loading session {session_id}: {str(e)}")
             return None
-    
-    def _extract_topics(self, history: List[Dict[str, Any]]) -> List[str]:
-        """Extract topics from conversation history using simple keyword matching."""
-        financial_keywords = {
-            "budget": ["budget", "budgeting", "expenses", "income"],
-            "saving": ["save", "savings", "emergency fund", "money"],
-            "investing": ["invest", "investment", "stocks", "bonds", "portfolio"],
-            "debt": ["debt", "loan", "credit", "mortgage", "payment"],
-            "credit_score": ["credit score", "credit report", "credit card"],
-            "retirement": ["retirement", "401k", "ira", "pension"],
-            "insurance": ["insurance", "coverage", "premium", "policy"],
-            "taxes": ["tax", "taxes", "deduction", "refund"],
-        }
-        
-        topics = set()
-        all_text = " ".join([msg["content"].lower() for msg in history])
-        
-        for topic, keywords in financial_keywords.items():
-            for keyword in keywords:
-                if keyword in all_text:
-                    topics.add(topic)
-                    break
-        
-        return list(topics)
-    
-    def _calculate_session_duration(self, history: List[Dict[str, Any]]) -> float:
-        """Calculate session duration in minutes."""
-        if len(history) < 2:
-            return 0
-        
-        try:
-            start_time = datetime.fromisoformat(history[0]["timestamp"])
-            end_time = datetime.fromisoformat(history[-1]["timestamp"])
-            duration = (end_time - start_time).total_seconds() / 60
-            return round(duration, 2)
-        except Exception:
-            return 0
 
 
 # Global memory instance
@@ -259,6 +686,19 @@ def get_memory() -> ConversationMemory:
     if _memory_instance is None:
         memory_dir = os.getenv("MEMORY_DIR", "data/memory")
         max_history = int(os.getenv("MAX_CONVERSATION_HISTORY", "50"))
-        _memory_instance = ConversationMemory(memory_dir, max_history)
+        storage = create_storage(
+            os.getenv("MEMORY_BACKEND", "jsonl"),
+            memory_dir,
+            db_path=os.getenv("MEMORY_DB_PATH"),
+        )
+        _memory_instance = ConversationMemory(
+            memory_dir,
+            max_history,
+            storage=storage,
+            max_cached_sessions=int(os.getenv("MEMORY_CACHE_MAX_SESSIONS", "1000")),
+            max_cache_bytes=int(os.getenv("MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            write_behind_seconds=float(os.getenv("MEMORY_WRITE_BEHIND_SECONDS", "0")),
+            write_queue_size=int(os.getenv("MEMORY_WRITE_QUEUE_SIZE", "1000")),
+        )
     
     return _memory_instance
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class OllamaError(Exception):
+    """Raised when Ollama returns an error or a request times out."""
+
+
+class OllamaClient:
+    """Native Ollama backend on one pooled ``httpx.AsyncClient``.
+
+    Exposes the same ``ainvoke``/``astream`` interface as the LangChain
+    ``OllamaLLM`` and ``MockLLM``, plus ``achat``/``astream_chat`` for chat
+    messages. Every generation streams over a kept-alive connection, and
+    ``keep_alive`` keeps the model loaded between requests. ``connect_timeout`` and
+    ``read_timeout`` (between streamed chunks) are enforced by httpx,
+    ``total_timeout`` across the whole generation.
+    """
+
+    def __init__(
+        self,
+        model: str = "llama3.2",
+        base_url: str = "http://localhost:11434",
+        temperature: float = 0.7,
+        num_predict: int = 1024,
+        keep_alive: str = "30m",
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        total_timeout: float = 300.0,
+        max_connections: int = 8,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.model = model
+        self.base_url = base_url
+        self.options = {"temperature": temperature, "num_predict": num_predict}
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_connections = max_connections
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("h2 not installed, using HTTP/1.1 for Ollama")
+
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cold_loads = 0
+        self._first_token_seconds = 0.0
+        self._eval_seconds = 0.0
+
+    async def ainvoke(self, prompt: str) -> str:
+        """Generate a complete response (streamed from Ollama and joined)."""
+        return "".join([chunk async for chunk in self.astream(prompt)])
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream response text as Ollama produces it."""
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+        }
+        async for chunk in self._stream("/api/generate", payload):
+            yield chunk
+
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        """Generate a complete chat reply."""
+        return "".join([chunk async for chunk in self.astream_chat(messages)])
+
+    async def astream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream a chat reply to ``messages`` (``role``/``content`` dicts)."""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self.options,
+        }
+        async for chunk in self._stream("/api/chat", payload):
+            yield chunk
+
+    async def load(self) -> bool:
+        """Load the model into memory without generating, so the first request is warm."""
+        try:
+            response = await self._get_client().post(
+                "/api/generate", json={"model": self.model, "keep_alive": self.keep_alive}
+            )
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load Ollama model {self.model}: {str(e)}")
+            return False
+
+    async def list_models(self, timeout: Optional[float] = None) -> List[str]:
+        """Names of the models Ollama has installed."""
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        response = await self._get_client().get("/api/tags", **kwargs)
+        response.raise_for_status()
+        return [model.get("name", "") for model in response.json().get("models", [])]
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._client is not None:
+            client, self._client = self._client, None
+            try:
+                await client.aclose()
+            except RuntimeError:
+                # The loop the client was created on is already closed
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get client statistics."""
+        return {
+            "backend": "ollama",
+            "http2": self.http2,
+            "keep_alive": self.keep_alive,
+            "timeouts_seconds": {
+                "connect": self.connect_timeout,
+                "read": self.read_timeout,
+                "total": self.total_timeout,
+            },
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cold_loads": self.cold_loads,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_first_token_ms": round(self._first_token_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "tokens_per_second": round(self.completion_tokens / self._eval_seconds, 1) if self._eval_seconds else 0.0,
+        }
+
+    async def _stream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        client = self._get_client()
+        start = time.perf_counter()
+        deadline = start + self.total_timeout
+        first_token = True
+        self.requests += 1
+
+        try:
+            request = client.build_request("POST", path, json=payload)
+            response = await asyncio.wait_for(client.send(request, stream=True), timeout=self.total_timeout)
+            try:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise OllamaError(f"Ollama returned {response.status_code}: {response.text[:200]}")
+
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if "error" in data:
+                        raise OllamaError(data["error"])
+
+                    text = data.get("response") or data.get("message", {}).get("content", "")
+                    if text:
+                        if first_token:
+                            self._first_token_seconds += time.perf_counter() - start
+                            first_token = False
+                        yield text
+                    if data.get("done"):
+                        self._record_usage(data)
+                        break
+                    if time.perf_counter() > deadline:
+                        raise asyncio.TimeoutError()
+            finally:
+                await response.aclose()
+
+        except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+            self.errors += 1
+            self.timeouts += 1
+            raise OllamaError(f"Ollama request timed out: {type(e).__name__}") from e
+        except Exception:
+            self.errors += 1
+            raise
+
+    def _record_usage(self, data: Dict[str, Any]) -> None:
+        """Keep Ollama's token counts and timings from the final chunk of a response."""
+        prompt_tokens = data.get("prompt_eval_count", 0)
+        completion_tokens = data.get("eval_count", 0)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self._eval_seconds += data.get("eval_duration", 0) / 1e9
+        if data.get("load_duration", 0) > 1e9:
+            self.cold_loads += 1
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled client, recreating it if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._retire_client()
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                transport=self._transport,
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout,
+                    read=self.read_timeout,
+                    write=self.connect_timeout,
+                    pool=self.total_timeout,
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=300.0,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _retire_client(self) -> None:
+        """Close the client of a previous event loop, which cannot be used from this one."""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        # A transport passed in is owned by the caller and shared with the next client
+        if client is None or self._transport is not None:
+            return
+        if loop is not None and loop.is_running():
+            # Still running in another thread: close the client there
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            # Its connections can only be closed on their own loop, which no longer runs
+            logger.info("Event loop changed; dropping the Ollama client of the previous loop")
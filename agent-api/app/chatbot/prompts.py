@@ -1,11 +1,15 @@
 from string import Template
 from typing import Dict, List, Optional
 
+from .topics import topic_matcher
+
 
 class FinancialPromptTemplates:
     """Template system for financial literacy chatbot prompts."""
     
-    SYSTEM_PROMPT = """Eres un asistente de educación financiera amigable y conocedor. Tu función es ayudar a los usuarios a comprender conceptos de finanzas personales, presupuestos, inversiones y tomar decisiones financieras informadas.
+    # Static instructions, identical on every request so the model server can reuse
+    # their prefill; history follows as chat turns and per-request content comes last
+    SYSTEM_INSTRUCTIONS = """Eres un asistente de educación financiera amigable y conocedor. Tu función es ayudar a los usuarios a comprender conceptos de finanzas personales, presupuestos, inversiones y tomar decisiones financieras informadas.
 
 IMPORTANTE: Debes responder SIEMPRE en español, sin importar el idioma en que te escriban.
 
@@ -17,29 +21,22 @@ Directrices:
 - Enfócate en contenido educativo en lugar de recomendaciones de inversión específicas
 - Sé comprensivo y alentador sobre los procesos de aprendizaje financiero
 
-Contexto de los datos de la aplicación financiera del usuario: {user_context}
+Basándote en el historial de conversación y los materiales educativos financieros relevantes, proporciona una respuesta completa pero concisa que:
+1. Responda directamente a la pregunta del usuario
+2. Incorpore información relevante de los materiales educativos
+3. Proporcione consejos prácticos cuando sea apropiado
+4. Sugiera temas relacionados que podrían interesarle
 
-Contenido de educación financiera relevante: {rag_context}
+IMPORTANTE: Tu respuesta debe ser COMPLETAMENTE en español.
 """
 
-    CHAT_PROMPT = Template("""Basándote en el historial de conversación y los materiales educativos financieros relevantes, proporciona una respuesta útil a la pregunta del usuario sobre: $user_message
-
-Contexto de conversación previo:
-$conversation_history
-
-Contenido educativo relevante:
+    CHAT_PROMPT = Template("""Contenido educativo relevante:
 $rag_context
 
 Contexto financiero del usuario (si está disponible):
 $user_context
 
-Por favor proporciona una respuesta completa pero concisa que:
-1. Responda directamente a la pregunta del usuario
-2. Incorpore información relevante de los materiales educativos
-3. Proporcione consejos prácticos cuando sea apropiado
-4. Sugiera temas relacionados que podrían interesarle
-
-IMPORTANTE: Tu respuesta debe ser COMPLETAMENTE en español.
+Pregunta del usuario: $user_message
 """)
 
     RAG_CONTEXT_PROMPT = Template("""Aquí hay extractos relevantes de materiales de educación financiera que pueden ayudar a responder la pregunta del usuario:
@@ -50,7 +47,7 @@ Por favor usa esta información para proporcionar contexto en tu respuesta, pero
 """)
 
     CONVERSATION_SUMMARY_PROMPT = Template("""Please provide a brief summary of this financial conversation to maintain context:
-
+$previous_summary
 Conversation history:
 $messages
 
@@ -63,30 +60,32 @@ Summary should capture:
 Keep summary under 200 words.
 """)
 
+    SUMMARY_TURN = Template("Resumen de la conversación anterior: $summary")
+
     ERROR_RESPONSE = "Lo siento, pero estoy teniendo problemas para procesar tu solicitud en este momento. Por favor intenta reformular tu pregunta sobre temas financieros, y haré mi mejor esfuerzo para ayudarte a aprender sobre finanzas personales, presupuestos, inversiones u otros temas de gestión del dinero."
 
     SUGGESTION_PROMPTS = {
-        "presupuesto": [
+        "budget": [
             "¿Cómo creo mi primer presupuesto?",
             "¿Qué es la regla 50/30/20 para presupuestos?",
             "¿Cómo puedo seguir mejor mi presupuesto?",
         ],
-        "ahorro": [
+        "saving": [
             "¿Cuánto debería tener en un fondo de emergencia?",
             "¿Cuáles son las mejores cuentas de ahorro de alto rendimiento?",
             "¿Cómo puedo ahorrar dinero en gastos diarios?",
         ],
-        "inversion": [
+        "investing": [
             "¿Cuál es la diferencia entre acciones y bonos?",
             "¿Cómo empiezo a invertir con poco dinero?",
             "¿Qué es el promedio de costo en dólares?",
         ],
-        "deuda": [
+        "debt": [
             "¿Debo pagar deudas o invertir primero?",
             "¿Cuál es la diferencia entre deuda buena y mala?",
             "¿Cómo funciona el método bola de nieve para deudas?",
         ],
-        "credito": [
+        "credit_score": [
             "¿Cómo puedo mejorar mi puntaje de crédito?",
             "¿Qué factores afectan mi puntaje de crédito?",
             "¿Debería cerrar tarjetas de crédito antiguas?",
@@ -95,11 +94,10 @@ Keep summary under 200 words.
 
     @classmethod
     def get_suggestions_for_topic(cls, topic: str) -> List[str]:
-        """Get relevant follow-up questions based on the topic."""
-        topic_lower = topic.lower()
-        for key, suggestions in cls.SUGGESTION_PROMPTS.items():
-            if key in topic_lower:
-                return suggestions
+        """Get relevant follow-up questions for the main topic of a message (English or Spanish)."""
+        main_topic = topic_matcher.main_topic(topic, among=cls.SUGGESTION_PROMPTS)
+        if main_topic is not None:
+            return cls.SUGGESTION_PROMPTS[main_topic]
         return [
             "Cuéntame sobre conceptos básicos de presupuestos",
             "¿Cómo empiezo a construir un fondo de emergencia?",
@@ -110,29 +108,20 @@ Keep summary under 200 words.
     def format_chat_prompt(
         cls,
         user_message: str,
-        conversation_history: str = "",
         rag_context: str = "",
         user_context: str = "",
     ) -> str:
-        """Format the main chat prompt with context."""
+        """Format the final user turn: retrieved content and user data, then the question."""
         return cls.CHAT_PROMPT.substitute(
             user_message=user_message,
-            conversation_history=conversation_history or "No hay conversación previa.",
             rag_context=rag_context or "No se recuperó contenido educativo específico.",
             user_context=user_context or "No hay contexto financiero específico del usuario disponible.",
         )
 
     @classmethod
-    def format_system_prompt(
-        cls,
-        user_context: str = "",
-        rag_context: str = "",
-    ) -> str:
-        """Format the system prompt with context."""
-        return cls.SYSTEM_PROMPT.format(
-            user_context=user_context or "No hay contexto específico del usuario disponible.",
-            rag_context=rag_context or "No hay contenido educativo específico disponible.",
-        )
+    def format_summary_turn(cls, summary: str) -> str:
+        """Format a stored conversation summary as a history turn."""
+        return cls.SUMMARY_TURN.substitute(summary=summary)
 
     @classmethod
     def format_rag_context(cls, retrieved_content: str) -> str:
@@ -140,10 +129,12 @@ Keep summary under 200 words.
         return cls.RAG_CONTEXT_PROMPT.substitute(retrieved_content=retrieved_content)
 
     @classmethod
-    def format_conversation_summary_prompt(cls, messages: List[Dict]) -> str:
-        """Format prompt for conversation summarization."""
+    def format_conversation_summary_prompt(cls, messages: List[Dict], previous_summary: str = "") -> str:
+        """Format prompt for conversation summarization, extending an earlier summary if given."""
         messages_text = "\n".join([
             f"{msg.get('role', 'unknown')}: {msg.get('content', '')}"
             for msg in messages
         ])
-        return cls.CONVERSATION_SUMMARY_PROMPT.substitute(messages=messages_text)
+        if previous_summary:
+            previous_summary = f"\nSummary of the earlier conversation:\n{previous_summary}\n"
+        return cls.CONVERSATION_SUMMARY_PROMPT.substitute(messages=messages_text, previous_summary=previous_summary)
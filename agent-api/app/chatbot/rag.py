@@ -1,22 +1,27 @@
 import os
+import asyncio
 import logging
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
 import chromadb
+import numpy as np
 from chromadb.config import Settings
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-import uuid
 import hashlib
-import re
+
+from .cache import QueryEmbeddingCache, SemanticResponseCache
+from .executor import BoundedExecutor
+from .lexical import BM25Index, reciprocal_rank_fusion
+from .loaders import load_file_documents
+from .manifest import IngestManifest, file_sha256, make_chunk_ids, normalize_source
+from .rerank import CrossEncoderReranker
 
 logger = logging.getLogger(__name__)
 
 try:
     from sentence_transformers import SentenceTransformer
-    import numpy as np
     SENTENCE_TRANSFORMERS_AVAILABLE = True
 except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
@@ -26,58 +31,233 @@ except ImportError:
 class SimpleTextEmbedder:
     """Simple text embedder that uses basic text features when sentence-transformers is not available."""
     
+    DIMENSIONS = 32
+    KEYWORDS = ("budget", "save", "invest", "debt", "money", "financial", "credit", "loan", "bank")
+    # Rough maximums for the length, word, sentence, $, %, number and unique word counts, then keywords
+    MAX_VALUES = np.array([1000, 200, 20, 10, 10, 50, 100] + [20] * len(KEYWORDS), dtype=np.float32)
+    
     def __init__(self):
         self.vocab_size = 10000  # Simple vocabulary for basic embedding
         
-    def encode(self, texts: List[str]) -> List[List[float]]:
-        """Create simple embeddings based on text features."""
-        embeddings = []
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Create simple embeddings based on text features, as an (n, 32) array."""
+        n = len(texts)
+        embeddings = np.zeros((n, self.DIMENSIONS), dtype=np.float32)
+        if n == 0:
+            return embeddings
+        
+        # str.count and str.split run in C and beat a single regex pass over the text
+        rows = []
         for text in texts:
-            # Simple embedding based on text characteristics
             text_lower = text.lower()
-            
-            # Basic features
-            features = [
+            words = text_lower.split()
+            rows.append([
                 len(text),  # Text length
-                len(text.split()),  # Word count
-                text.count('.'),  # Sentence count approximation
-                text.count('$'),  # Dollar signs (financial context)
-                text.count('%'),  # Percentages
-                len(re.findall(r'\d+', text)),  # Number count
-                len(set(text_lower.split())),  # Unique word count
-                text_lower.count('budget'),
-                text_lower.count('save'),
-                text_lower.count('invest'),
-                text_lower.count('debt'),
-                text_lower.count('money'),
-                text_lower.count('financial'),
-                text_lower.count('credit'),
-                text_lower.count('loan'),
-                text_lower.count('bank'),
-            ]
-            
-            # Normalize features to 0-1 range (simple approach)
-            max_vals = [1000, 200, 20, 10, 10, 50, 100] + [20] * 9  # Rough maximums
-            normalized = [min(f / max_val, 1.0) for f, max_val in zip(features, max_vals)]
+                len(words),  # Word count
+                text.count("."),  # Sentence count approximation
+                text.count("$"),  # Dollar signs (financial context)
+                text.count("%"),  # Percentages
+                0,  # Number count, filled in below
+                len(set(words)),  # Unique word count
+            ] + [text_lower.count(keyword) for keyword in self.KEYWORDS])
+        features = np.array(rows, dtype=np.float32)
+        features[:, 5] = self._count_numbers(texts)
+        
+        # Normalize features to 0-1 range and pad to a fixed size
+        embeddings[:, :features.shape[1]] = np.minimum(features / self.MAX_VALUES, 1.0)
+        return embeddings
+    
+    @staticmethod
+    def _count_numbers(texts: List[str]) -> np.ndarray:
+        """Count runs of digits in each text, for the whole batch at once."""
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        chars = np.frombuffer("\n".join(texts).encode("utf-32-le"), dtype=np.uint32)
+        digits = (chars >= ord("0")) & (chars <= ord("9"))
+        run_starts = np.flatnonzero(digits & ~np.concatenate(([False], digits[:-1])))
+        
+        # Texts are joined with a one-character separator, so text i starts at starts[i]
+        starts = np.concatenate(([0], np.cumsum(lengths[:-1] + 1)))
+        owners = np.searchsorted(starts, run_starts, side="right") - 1
+        return np.bincount(owners, minlength=len(texts))
+
+
+class EmbeddingBatcher:
+    """Micro-batching scheduler for query embeddings.
+    
+    Concurrent callers are collected for up to ``max_wait_ms`` or
+    ``max_batch_size`` items, encoded with a single batched call, and each
+    caller gets its own vector back.
+    """
+    
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Any],
+        executor: BoundedExecutor,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode = encode
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.total_encode_time = 0.0
+    
+    @property
+    def pending(self) -> int:
+        """Number of texts waiting for the next batch."""
+        return len(self._pending)
+    
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single text, sharing an encode call with concurrent callers."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch_size or self.max_wait_ms <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        
+        return await future
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_encode_ms": round(self.total_encode_time / self.batches * 1000, 3) if self.batches else 0.0,
+        }
+    
+    def _flush(self) -> None:
+        """Hand the pending requests to a batch task."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Encode a batch and fan the vectors back out to the waiting callers."""
+        # Identical concurrent queries are encoded once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        
+        try:
+            start_time = time.perf_counter()
+            vectors = (await self.executor.run(self.encode, unique_texts)).tolist()
+            self.total_encode_time += time.perf_counter() - start_time
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        
+        vectors_by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors_by_text[text])
+
+
+class RetrievalResult:
+    """Results of a single retrieval pass, reused for context, sources and scoring."""
+    
+    def __init__(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None,
+        rerank_ms: Optional[float] = None,
+    ):
+        self.query = query
+        self.results = results
+        self.query_embedding = query_embedding
+        # Time spent reranking, or None when results are in retrieval order
+        self.rerank_ms = rerank_ms
+    
+    def __len__(self) -> int:
+        return len(self.results)
+    
+    def __bool__(self) -> bool:
+        return bool(self.results)
+    
+    def format_context(self, max_context_length: int = 2000) -> str:
+        """Format the retrieved chunks as prompt context."""
+        if not self.results:
+            return "No relevant information found in the knowledge base."
+        
+        context_parts = []
+        total_length = 0
+        
+        for result in self.results:
+            # Add source information
+            context_part = self.format_chunk(result)
             
-            # Pad to fixed size
-            while len(normalized) < 32:
-                normalized.append(0.0)
+            # Check if adding this would exceed max length
+            if total_length + len(context_part) > max_context_length:
+                break
             
-            embeddings.append(normalized[:32])
+            context_parts.append(context_part)
+            total_length += len(context_part)
         
-        return embeddings
+        return "\n---\n".join(context_parts)
+    
+    @staticmethod
+    def format_chunk(result: Dict[str, Any]) -> str:
+        """Format one retrieved chunk with its source file name."""
+        source = result["metadata"].get("source", "Unknown")
+        return f"Source: {Path(source).name}\n{result['content']}\n"
+    
+    def get_sources(self, limit: Optional[int] = None) -> List[str]:
+        """Get the unique source file names, in retrieval order."""
+        sources = [result["metadata"].get("source", "Unknown") for result in self.results]
+        unique_sources = list(dict.fromkeys(
+            source.split("/")[-1] for source in sources if source != "Unknown"
+        ))
+        return unique_sources[:limit] if limit else unique_sources
+    
+    @property
+    def confidence_score(self) -> float:
+        """Simple confidence score based on whether anything was retrieved."""
+        return 0.85 if self.results else 0.7
 
 
 class RAGPipeline:
     """Retrieval Augmented Generation pipeline for financial education content."""
     
+    SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md"}
+    
     def __init__(
         self,
         docs_dir: str = "data/docs",
         embeddings_dir: str = "data/embeddings",
         collection_name: str = "financial_docs",
         embedding_model: str = "all-MiniLM-L6-v2",
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        response_cache: Optional[SemanticResponseCache] = None,
+        executor: Optional[BoundedExecutor] = None,
+        ingest_executor: Optional[BoundedExecutor] = None,
+        embed_batch_size: int = 16,
+        embed_batch_wait_ms: float = 5.0,
+        hybrid_search: bool = True,
+        rrf_k: int = 60,
+        hybrid_candidates: int = 20,
+        reranker: Optional[CrossEncoderReranker] = None,
+        rerank_candidates: int = 20,
     ):
         self.docs_dir = Path(docs_dir)
         self.embeddings_dir = Path(embeddings_dir)
@@ -93,14 +273,47 @@ class RAGPipeline:
         self.chroma_client = None
         self.collection = None
         self.using_simple_embedder = False
+        self.query_cache = query_cache if query_cache is not None else QueryEmbeddingCache()
+        self.response_cache = response_cache if response_cache is not None else SemanticResponseCache()
+        # Embedding and Chroma calls are blocking, so they run off the event loop
+        self.executor = executor if executor is not None else BoundedExecutor()
+        # Ingestion gets its own lane so large uploads do not queue ahead of queries
+        self.ingest_executor = (
+            ingest_executor if ingest_executor is not None
+            else BoundedExecutor(max_workers=1, max_queue_size=16, name="ingest")
+        )
+        self.embedding_batcher = EmbeddingBatcher(
+            lambda texts: self.embedding_model.encode(texts),
+            self.executor,
+            max_batch_size=embed_batch_size,
+            max_wait_ms=embed_batch_wait_ms,
+        )
+        self.chunk_size = 1000
+        self.chunk_overlap = 200
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             length_function=len,
         )
+        # Which files are indexed, with their content hashes and chunk IDs
+        self.manifest = IngestManifest(str(self.embeddings_dir / f"{collection_name}_manifest.json"))
+        self._source_locks: Dict[str, asyncio.Lock] = {}
+        # BM25 over the same chunks, fused with vector results for exact terms ("401k", "IRA")
+        self.lexical_index = BM25Index()
+        self.hybrid_search = hybrid_search
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
+        # Optional cross-encoder pass over a wider candidate set
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+    
+    @property
+    def embedder_key(self) -> str:
+        """Identifies the embedding space, so vectors from different embedders are never mixed."""
+        return f"{self.embedding_model_name}:{'simple' if self.using_simple_embedder else 'st'}"
         
-    async def initialize(self) -> bool:
-        """Initialize the RAG pipeline."""
+    async def initialize(self, sync: bool = True) -> bool:
+        """Initialize the RAG pipeline, syncing the docs directory unless ``sync`` is False."""
         try:
             # Initialize embedding model with fallback
             if SENTENCE_TRANSFORMERS_AVAILABLE:
@@ -136,9 +349,20 @@ class RAGPipeline:
                 )
                 logger.info(f"Created new collection: {self.collection_name}")
             
-            # Load and process documents if collection is empty
-            if self.collection.count() == 0:
-                await self._load_initial_documents()
+            # Chunks indexed by older versions carry unresolved source paths
+            if self.manifest.version < IngestManifest.VERSION:
+                await self.ingest_executor.run(self._normalize_chunk_sources)
+            
+            if self.reranker is not None and not await self.ingest_executor.run(self.reranker.load):
+                logger.info("Reranking disabled")
+            
+            # The lexical index lives in memory and is rebuilt from the stored chunks
+            if self.hybrid_search:
+                await self.ingest_executor.run(self._rebuild_lexical_index)
+            
+            # Index new and changed documents; unchanged files are skipped cheaply
+            if sync:
+                await self.sync_documents()
             
             logger.info("RAG pipeline initialized successfully")
             return True
@@ -147,61 +371,344 @@ class RAGPipeline:
             logger.error(f"Failed to initialize RAG pipeline: {str(e)}")
             return False
     
-    async def add_document(self, file_path: str, metadata: Optional[Dict] = None) -> bool:
-        """Add a document to the knowledge base."""
+    async def add_document(
+        self,
+        file_path: str,
+        metadata: Optional[Dict] = None,
+        force: bool = False,
+    ) -> bool:
+        """Add a document to the knowledge base, or refresh it if it changed."""
+        return await self.ingest_document(file_path, metadata, force=force) is not None
+    
+    async def ingest_document(
+        self,
+        file_path: str,
+        metadata: Optional[Dict] = None,
+        force: bool = False,
+    ) -> Optional[Dict[str, int]]:
+        """Incrementally index a file: embed only new chunks and delete vanished ones.
+        
+        Returns the number of added, deleted and kept chunks, or None on failure.
+        ``metadata=None`` keeps the metadata the file was last indexed with.
+        """
+        source = normalize_source(file_path)
+        async with self.source_lock(source):
+            return await self._ingest_document(Path(source), metadata, force)
+    
+    async def _ingest_document(
+        self,
+        file_path: Path,
+        metadata: Optional[Dict],
+        force: bool,
+    ) -> Optional[Dict[str, int]]:
         try:
-            file_path = Path(file_path)
             if not file_path.exists():
                 logger.error(f"File does not exist: {file_path}")
-                return False
+                return None
+            
+            source = str(file_path)
+            previous, metadata, reusable = self.manifest_entry(source, metadata, force)
+            
+            # Unchanged files are detected from mtime and size, then from the content hash
+            stat = await self.ingest_executor.run(file_path.stat)
+            if reusable and self.stat_unchanged(previous, stat):
+                return {"added": 0, "deleted": 0, "kept": len(previous["chunk_ids"])}
+            
+            file_hash = await self.ingest_executor.run(file_sha256, source)
+            if reusable and previous["sha256"] == file_hash:
+                result = self.mark_unchanged(source, previous, stat)
+                await self.ingest_executor.run(self.manifest.save)
+                return result
             
             # Load document based on file type
             documents = await self._load_document(file_path)
             if not documents:
                 logger.error(f"Failed to load document: {file_path}")
-                return False
+                return None
             
             # Split into chunks
-            chunks = self.text_splitter.split_documents(documents)
+            chunks = await self.ingest_executor.run(self.text_splitter.split_documents, documents)
             
-            # Prepare data for ChromaDB
-            chunk_texts = [chunk.page_content for chunk in chunks]
-            chunk_embeddings = self.embedding_model.encode(chunk_texts).tolist()
-            
-            # Generate IDs and metadata
-            chunk_ids = [str(uuid.uuid4()) for _ in chunks]
-            chunk_metadata = []
+            plan = await self.plan_chunks(
+                source,
+                previous,
+                metadata,
+                force,
+                [(chunk.page_content, chunk.metadata) for chunk in chunks],
+                file_hash,
+                stat,
+            )
+            new_texts = [plan["texts"][i] for i in plan["new"]]
+            embeddings = await self.embed_texts(new_texts) if new_texts else []
+            result = (await self.store_plans([plan], embeddings))[0]
+            await self.ingest_executor.run(self.manifest.save)
             
-            for i, chunk in enumerate(chunks):
-                chunk_meta = {
-                    "source": str(file_path),
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    **(metadata or {}),
-                    **(chunk.metadata or {}),
-                }
-                chunk_metadata.append(chunk_meta)
+            # Cached answers may no longer reflect the knowledge base
+            if result["added"] or result["deleted"]:
+                self.response_cache.clear()
             
-            # Add to collection
-            self.collection.add(
-                ids=chunk_ids,
-                documents=chunk_texts,
-                embeddings=chunk_embeddings,
-                metadatas=chunk_metadata,
+            logger.info(
+                f"Indexed {file_path}: {result['added']} chunks embedded, "
+                f"{result['kept']} unchanged, {result['deleted']} removed"
             )
-            
-            logger.info(f"Added {len(chunks)} chunks from {file_path}")
-            return True
+            return result
             
         except Exception as e:
             logger.error(f"Error adding document {file_path}: {str(e)}")
-            return False
+            return None
+    
+    def source_lock(self, source: str) -> asyncio.Lock:
+        """Get the lock that serializes index changes to one file.
+        
+        Hold it from ``plan_chunks`` until ``store_plans`` has written the plan.
+        """
+        return self._source_locks.setdefault(source, asyncio.Lock())
+    
+    def manifest_entry(
+        self,
+        source: str,
+        metadata: Optional[Dict],
+        force: bool,
+    ) -> Tuple[Optional[Dict[str, Any]], Dict, bool]:
+        """Look up a file's manifest entry and whether its indexed chunks can be reused."""
+        previous = self.manifest.get(source)
+        if metadata is None:
+            metadata = previous.get("metadata", {}) if previous else {}
+        reusable = (
+            previous is not None
+            and not force
+            and previous.get("embedder") == self.embedder_key
+            and previous.get("metadata") == metadata
+        )
+        return previous, metadata, reusable
+    
+    @staticmethod
+    def stat_unchanged(previous: Dict[str, Any], stat: os.stat_result) -> bool:
+        """Whether a file's mtime and size still match its manifest entry."""
+        return previous["mtime"] == stat.st_mtime and previous["size"] == stat.st_size
+    
+    def mark_unchanged(self, source: str, previous: Dict[str, Any], stat: os.stat_result) -> Dict[str, int]:
+        """Record a new mtime for a file whose content hash did not change."""
+        self.manifest.set(source, {**previous, "mtime": stat.st_mtime, "size": stat.st_size})
+        return {"added": 0, "deleted": 0, "kept": len(previous["chunk_ids"])}
+    
+    async def plan_chunks(
+        self,
+        source: str,
+        previous: Optional[Dict[str, Any]],
+        metadata: Dict,
+        force: bool,
+        chunks: List[Tuple[str, Dict]],
+        file_hash: str,
+        stat: os.stat_result,
+    ) -> Dict[str, Any]:
+        """Work out which of a file's chunks must be embedded, which are kept and which are stale."""
+        texts = [text for text, _ in chunks]
+        chunk_ids = make_chunk_ids(source, texts)
+        metadatas = [
+            {
+                "source": source,
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+                **metadata,
+                **(chunk_meta or {}),
+            }
+            for i, (_, chunk_meta) in enumerate(chunks)
+        ]
+        
+        # Chunks already indexed: from the manifest, or from Chroma for files indexed before it existed
+        if previous is not None:
+            existing_ids = set(previous["chunk_ids"])
+        else:
+            existing = await self.ingest_executor.run(self.collection.get, where={"source": source}, include=[])
+            existing_ids = set(existing["ids"])
+        
+        reembed_all = force or (previous is not None and previous.get("embedder") != self.embedder_key)
+        return {
+            "source": source,
+            "chunk_ids": chunk_ids,
+            "texts": texts,
+            "metadatas": metadatas,
+            "new": [i for i, chunk_id in enumerate(chunk_ids) if reembed_all or chunk_id not in existing_ids],
+            "kept": [i for i, chunk_id in enumerate(chunk_ids) if not reembed_all and chunk_id in existing_ids],
+            "stale_ids": list(existing_ids - set(chunk_ids)),
+            "manifest_entry": {
+                "sha256": file_hash,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "embedder": self.embedder_key,
+                "metadata": metadata,
+                "chunk_ids": chunk_ids,
+            },
+        }
+    
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks in one encode call."""
+        return (await self.ingest_executor.run(self.embedding_model.encode, texts)).tolist()
+    
+    async def store_plans(
+        self,
+        plans: List[Dict[str, Any]],
+        embeddings: List[List[float]],
+        upsert_batch_size: int = 1000,
+    ) -> List[Dict[str, int]]:
+        """Write planned chunk changes for one or more files and record them in the manifest.
+        
+        ``embeddings`` holds the vectors of every plan's new chunks, in order.
+        """
+        ids, texts, metadatas = [], [], []
+        kept_ids, kept_metadatas, stale_ids = [], [], []
+        for plan in plans:
+            for i in plan["new"]:
+                ids.append(plan["chunk_ids"][i])
+                texts.append(plan["texts"][i])
+                metadatas.append(plan["metadatas"][i])
+            for i in plan["kept"]:
+                kept_ids.append(plan["chunk_ids"][i])
+                kept_metadatas.append(plan["metadatas"][i])
+            stale_ids.extend(plan["stale_ids"])
+        
+        # Upsert before deleting, so an interrupted run is repaired by the next one
+        for start in range(0, len(ids), upsert_batch_size):
+            end = start + upsert_batch_size
+            await self.ingest_executor.run(
+                self.collection.upsert,
+                ids=ids[start:end],
+                documents=texts[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end],
+            )
+        
+        # Unchanged chunks keep their embeddings; only their positions may have moved
+        for start in range(0, len(kept_ids), upsert_batch_size):
+            end = start + upsert_batch_size
+            await self.ingest_executor.run(
+                self.collection.update,
+                ids=kept_ids[start:end],
+                metadatas=kept_metadatas[start:end],
+            )
+        
+        if stale_ids:
+            await self.ingest_executor.run(self.collection.delete, ids=stale_ids)
+        
+        if self.hybrid_search:
+            await self.ingest_executor.run(self._update_lexical_index, ids, texts, stale_ids)
+        
+        for plan in plans:
+            self.manifest.set(plan["source"], plan["manifest_entry"])
+        
+        return [
+            {"added": len(plan["new"]), "deleted": len(plan["stale_ids"]), "kept": len(plan["kept"])}
+            for plan in plans
+        ]
+    
+    async def remove_document(self, file_path: str) -> int:
+        """Remove a document's chunks from the knowledge base."""
+        source = normalize_source(file_path)
+        async with self.source_lock(source):
+            try:
+                entry = self.manifest.remove(source)
+                if entry is not None:
+                    chunk_ids = entry["chunk_ids"]
+                else:
+                    existing = await self.ingest_executor.run(self.collection.get, where={"source": source}, include=[])
+                    chunk_ids = existing["ids"]
+                
+                if chunk_ids:
+                    await self.ingest_executor.run(self.collection.delete, ids=chunk_ids)
+                    self.lexical_index.remove_many(chunk_ids)
+                    self.response_cache.clear()
+                await self.ingest_executor.run(self.manifest.save)
+                
+                logger.info(f"Removed {len(chunk_ids)} chunks from {file_path}")
+                return len(chunk_ids)
+                
+            except Exception as e:
+                logger.error(f"Error removing document {file_path}: {str(e)}")
+                return 0
+    
+    def _rebuild_lexical_index(self, page_size: int = 5000) -> None:
+        """Index every stored chunk in the lexical index, replacing its contents."""
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add_many(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        logger.info(f"Built lexical index over {len(self.lexical_index)} chunks")
+    
+    def _normalize_chunk_sources(self, page_size: int = 5000) -> None:
+        """Rewrite chunk ``source`` metadata saved under unresolved paths, so syncs find and replace those chunks."""
+        resolved: Dict[str, str] = {}
+        updated = 0
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            ids, metadatas = [], []
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                source = (metadata or {}).get("source")
+                if not source:
+                    continue
+                if source not in resolved:
+                    resolved[source] = normalize_source(source)
+                if resolved[source] != source:
+                    ids.append(chunk_id)
+                    metadatas.append({**metadata, "source": resolved[source]})
+            if ids:
+                self.collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+            offset += len(page["ids"])
+        # Record that the migration ran
+        self.manifest.save()
+        if updated:
+            logger.info(f"Normalized the source path of {updated} chunks")
+    
+    def _update_lexical_index(self, ids: List[str], texts: List[str], stale_ids: List[str]) -> None:
+        self.lexical_index.add_many(ids, texts)
+        self.lexical_index.remove_many(stale_ids)
+    
+    async def yield_to_queries(self, max_wait_seconds: float = 0.05) -> None:
+        """Let pending query work run before the next ingestion batch, for at most ``max_wait_seconds``."""
+        deadline = time.monotonic() + max_wait_seconds
+        while time.monotonic() < deadline:
+            stats = self.executor.get_stats()
+            if not (stats["queue_depth"] or stats["waiting_for_slot"] or self.embedding_batcher.pending):
+                return
+            await asyncio.sleep(0.005)
+    
+    async def sync_documents(self, force: bool = False) -> Dict[str, Any]:
+        """Bring the index in line with the docs directory, re-embedding only what changed."""
+        from .ingest import create_ingestor
+        
+        logger.info("Syncing documents from docs directory")
+        
+        # Create some sample financial education content on first run
+        if not any(self.docs_dir.iterdir()) and not self.manifest.sources():
+            await self._create_sample_documents()
+        
+        return await create_ingestor(self).run(force=force)
+    
+    async def remove_missing_documents(self) -> List[str]:
+        """Remove indexed files that no longer exist in the docs directory."""
+        docs_root = self.docs_dir.resolve()
+        removed = []
+        for source in self.manifest.sources():
+            source_path = Path(source)
+            if source_path.resolve().is_relative_to(docs_root) and not source_path.exists():
+                await self.remove_document(source)
+                removed.append(source)
+        return removed
     
     async def search(
         self,
         query: str,
         n_results: int = 5,
         filter_metadata: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
         """Search for relevant documents."""
         try:
@@ -210,26 +717,30 @@ class RAGPipeline:
                 return []
             
             # Generate query embedding
-            query_embedding = self.embedding_model.encode([query]).tolist()[0]
+            if query_embedding is None:
+                query_embedding = await self._embed_query(query)
             
-            # Search in ChromaDB
-            results = self.collection.query(
+            # Filters only apply to vector search, so filtered queries skip the lexical index
+            hybrid = self.hybrid_search and not filter_metadata and len(self.lexical_index) > 0
+            vector_search = self.executor.run(
+                self.collection.query,
                 query_embeddings=[query_embedding],
-                n_results=n_results,
+                n_results=max(n_results, self.hybrid_candidates) if hybrid else n_results,
                 where=filter_metadata,
                 include=["documents", "metadatas", "distances"],
             )
             
-            # Format results
-            formatted_results = []
-            for i in range(len(results["documents"][0])):
-                result = {
-                    "content": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i],
-                    "relevance_score": 1 - results["distances"][0][i],  # Convert distance to similarity
-                }
-                formatted_results.append(result)
+            if not hybrid:
+                results = await vector_search
+                formatted_results = self._format_vector_results(results)
+            else:
+                results, lexical_hits = await asyncio.gather(
+                    vector_search,
+                    self.executor.run(self.lexical_index.search, query, max(n_results, self.hybrid_candidates)),
+                )
+                formatted_results = await self._fuse_results(
+                    results, lexical_hits, query_embedding, n_results
+                )
             
             logger.info(f"Retrieved {len(formatted_results)} results for query: {query[:50]}...")
             return formatted_results
@@ -238,6 +749,146 @@ class RAGPipeline:
             logger.error(f"Error searching documents: {str(e)}")
             return []
     
+    @staticmethod
+    def _format_vector_results(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        formatted_results = []
+        for i in range(len(results["documents"][0])):
+            result = {
+                "id": results["ids"][0][i],
+                "content": results["documents"][0][i],
+                "metadata": results["metadatas"][0][i],
+                "distance": results["distances"][0][i],
+                "relevance_score": 1 - results["distances"][0][i],  # Convert distance to similarity
+            }
+            formatted_results.append(result)
+        return formatted_results
+    
+    async def _fuse_results(
+        self,
+        vector_results: Dict[str, Any],
+        lexical_hits: List[Tuple[str, float]],
+        query_embedding: List[float],
+        n_results: int,
+    ) -> List[Dict[str, Any]]:
+        """Combine vector and BM25 rankings with reciprocal rank fusion."""
+        by_id = {result["id"]: result for result in self._format_vector_results(vector_results)}
+        fused = reciprocal_rank_fusion(
+            [list(by_id), [doc_id for doc_id, _ in lexical_hits]], k=self.rrf_k
+        )[:n_results]
+        
+        # Chunks found only by BM25 are fetched, with a distance computed like Chroma's (squared L2)
+        missing = [doc_id for doc_id, _ in fused if doc_id not in by_id]
+        if missing:
+            fetched = await self.executor.run(
+                self.collection.get, ids=missing, include=["documents", "metadatas", "embeddings"]
+            )
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            for doc_id, content, metadata, embedding in zip(
+                fetched["ids"], fetched["documents"], fetched["metadatas"], fetched["embeddings"]
+            ):
+                distance = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_vector) ** 2))
+                by_id[doc_id] = {
+                    "id": doc_id,
+                    "content": content,
+                    "metadata": metadata,
+                    "distance": distance,
+                    "relevance_score": 1 - distance,
+                }
+        
+        lexical_scores = dict(lexical_hits)
+        formatted_results = []
+        for doc_id, fusion_score in fused:
+            if doc_id in by_id:
+                formatted_results.append({
+                    **by_id[doc_id],
+                    "fusion_score": fusion_score,
+                    "lexical_score": lexical_scores.get(doc_id),
+                })
+        return formatted_results
+    
+    async def _embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing cached embeddings for repeated questions."""
+        cache_key = self.embedder_key
+        
+        # The disk tier does file IO, so only in-memory lookups stay on the event loop
+        if self.query_cache.cache_dir:
+            query_embedding = await self.executor.run(self.query_cache.get, cache_key, query)
+        else:
+            query_embedding = self.query_cache.get(cache_key, query)
+        
+        if query_embedding is None:
+            query_embedding = await self.embedding_batcher.embed(query)
+            if self.query_cache.cache_dir:
+                await self.executor.run(self.query_cache.put, cache_key, query, query_embedding)
+            else:
+                self.query_cache.put(cache_key, query, query_embedding)
+        
+        return query_embedding
+    
+    async def retrieve(self, query: str, n_results: int = 5) -> RetrievalResult:
+        """Run a single retrieval pass for a query."""
+        if not self.collection:
+            logger.error("RAG pipeline not initialized")
+            return RetrievalResult(query, [])
+        
+        try:
+            query_embedding = await self._embed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {str(e)}")
+            return RetrievalResult(query, [])
+        
+        rerank = self.reranker is not None and self.reranker.available
+        results = await self.search(
+            query,
+            n_results=max(n_results, self.rerank_candidates) if rerank else n_results,
+            query_embedding=query_embedding,
+        )
+        
+        rerank_ms = None
+        if rerank and results:
+            results, info = await self.reranker.rerank(query, results, self.executor, top_n=n_results)
+            rerank_ms = info["rerank_ms"]
+            logger.info(
+                f"Reranked {info['scored']}/{info['candidates']} candidates in {rerank_ms:.1f} ms"
+            )
+        
+        return RetrievalResult(query, results, query_embedding, rerank_ms=rerank_ms)
+    
+    async def find_cached_response(
+        self,
+        retrieval: RetrievalResult,
+        user_context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Optional[str]:
+        """Find a previously generated answer for a near-duplicate question.
+        
+        ``history`` is the conversation sent along with the question; a
+        follow-up only makes sense within its own conversation, so turns
+        with history never use the cache.
+        """
+        # Answers built from user-specific context or conversation are never shared
+        if user_context or history or retrieval.query_embedding is None:
+            return None
+        
+        entry = self.response_cache.lookup(retrieval.query_embedding, self.embedder_key)
+        if entry:
+            logger.info(f"Response cache hit (similarity {entry['similarity']:.3f}) for query: {retrieval.query[:50]}...")
+            return entry["response"]
+        return None
+    
+    async def cache_response(
+        self,
+        retrieval: RetrievalResult,
+        response: str,
+        user_context: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Cache a generated answer so near-duplicate questions can reuse it."""
+        if user_context or history or retrieval.query_embedding is None:
+            return
+        
+        self.response_cache.store(retrieval.query, retrieval.query_embedding, response, self.embedder_key)
+    
     async def get_context_for_query(
         self,
         query: str,
@@ -245,40 +896,30 @@ class RAGPipeline:
         n_results: int = 5,
     ) -> str:
         """Get formatted context for a query."""
-        results = await self.search(query, n_results=n_results)
-        
-        if not results:
-            return "No relevant information found in the knowledge base."
-        
-        context_parts = []
-        total_length = 0
-        
-        for result in results:
-            content = result["content"]
-            source = result["metadata"].get("source", "Unknown")
-            
-            # Add source information
-            context_part = f"Source: {Path(source).name}\n{content}\n"
-            
-            # Check if adding this would exceed max length
-            if total_length + len(context_part) > max_context_length:
-                break
-            
-            context_parts.append(context_part)
-            total_length += len(context_part)
+        retrieval = await self.retrieve(query, n_results=n_results)
+        return retrieval.format_context(max_context_length)
+    
+    async def health_check(self) -> Dict[str, Any]:
+        """Cheap health probe: only counts the documents in the collection."""
+        if not self.collection:
+            return {"status": "not_initialized"}
         
-        return "\n---\n".join(context_parts)
+        try:
+            count = await self.executor.run(self.collection.count)
+            return {"status": "healthy", "total_documents": count}
+        except Exception as e:
+            return {"status": "error", "error": str(e)}
     
-    def get_collection_stats(self) -> Dict[str, Any]:
+    async def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the document collection."""
         if not self.collection:
             return {"status": "not_initialized"}
         
         try:
-            count = self.collection.count()
+            count = await self.executor.run(self.collection.count)
             
             # Get sample of documents to analyze sources
-            sample_results = self.collection.get(limit=min(100, count))
+            sample_results = await self.executor.run(self.collection.get, limit=min(100, count))
             sources = set()
             
             for metadata in sample_results.get("metadatas", []):
@@ -293,6 +934,15 @@ class RAGPipeline:
                 "embedding_model": self.embedding_model_name,
                 "using_simple_embedder": self.using_simple_embedder,
                 "embedder_type": "Simple Text Features" if self.using_simple_embedder else "SentenceTransformers",
+                "query_cache": self.query_cache.get_stats(),
+                "response_cache": self.response_cache.get_stats(),
+                "manifest": self.manifest.get_stats(),
+                "executor": self.executor.get_stats(),
+                "ingest_executor": self.ingest_executor.get_stats(),
+                "embedding_batcher": self.embedding_batcher.get_stats(),
+                "hybrid_search": self.hybrid_search,
+                "lexical_index": self.lexical_index.get_stats(),
+                "reranker": self.reranker.get_stats() if self.reranker is not None else None,
             }
             
         except Exception as e:
@@ -305,43 +955,17 @@ class RAGPipeline:
     async def _load_document(self, file_path: Path) -> Optional[List[Document]]:
         """Load a document based on its file type."""
         try:
-            file_extension = file_path.suffix.lower()
-            
-            if file_extension == ".pdf":
-                loader = PyPDFLoader(str(file_path))
-            elif file_extension == ".txt":
-                loader = TextLoader(str(file_path))
-            else:
-                # Try with unstructured loader for other formats
-                loader = UnstructuredFileLoader(str(file_path))
-            
-            documents = loader.load()
-            
-            # Add source metadata
-            for doc in documents:
-                doc.metadata["source"] = str(file_path)
-                doc.metadata["file_type"] = file_extension
-            
-            return documents
-            
+            return await self.ingest_executor.run(load_file_documents, file_path)
         except Exception as e:
             logger.error(f"Error loading document {file_path}: {str(e)}")
             return None
     
-    async def _load_initial_documents(self) -> None:
-        """Load initial documents from the docs directory."""
-        logger.info("Loading initial documents from docs directory")
-        
-        # Create some sample financial education content if directory is empty
-        if not any(self.docs_dir.iterdir()):
-            await self._create_sample_documents()
-        
-        # Load all documents in the docs directory
-        supported_extensions = {".pdf", ".txt", ".md"}
-        
-        for file_path in self.docs_dir.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                await self.add_document(str(file_path))
+    def document_files(self) -> List[Path]:
+        """List the supported files in the docs directory."""
+        return sorted(
+            file_path for file_path in self.docs_dir.rglob("*")
+            if file_path.is_file() and file_path.suffix.lower() in self.SUPPORTED_EXTENSIONS
+        )
     
     async def _create_sample_documents(self) -> None:
         """Create sample financial education documents."""
@@ -494,8 +1118,55 @@ async def get_rag() -> RAGPipeline:
     if _rag_instance is None:
         docs_dir = os.getenv("DOCS_DIR", "data/docs")
         embeddings_dir = os.getenv("EMBEDDINGS_DIR", "data/embeddings")
+        executor = BoundedExecutor(
+            max_workers=int(os.getenv("RAG_EXECUTOR_WORKERS", "2")),
+            max_queue_size=int(os.getenv("RAG_EXECUTOR_MAX_QUEUE", "64")),
+        )
+        query_cache = QueryEmbeddingCache(
+            max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600")),
+            cache_dir=os.getenv("QUERY_CACHE_DIR") or None,
+        )
+        response_cache = SemanticResponseCache(
+            enabled=os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true",
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+            max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400")),
+        )
+        reranker = None
+        if os.getenv("RERANK_ENABLED", "false").lower() == "true":
+            reranker = CrossEncoderReranker(
+                model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+                batch_size=int(os.getenv("RERANK_BATCH_SIZE", "8")),
+                budget_ms=float(os.getenv("RERANK_BUDGET_MS", "150")),
+            )
         
-        _rag_instance = RAGPipeline(docs_dir, embeddings_dir)
+        _rag_instance = RAGPipeline(
+            docs_dir,
+            embeddings_dir,
+            query_cache=query_cache,
+            response_cache=response_cache,
+            executor=executor,
+            ingest_executor=BoundedExecutor(
+                max_workers=int(os.getenv("INGEST_EXECUTOR_WORKERS", "1")),
+                max_queue_size=16,
+                name="ingest",
+            ),
+            embed_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "16")),
+            embed_batch_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5")),
+            hybrid_search=os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true",
+            rrf_k=int(os.getenv("HYBRID_RRF_K", "60")),
+            hybrid_candidates=int(os.getenv("HYBRID_CANDIDATES", "20")),
+            reranker=reranker,
+            rerank_candidates=int(os.getenv("RERANK_CANDIDATES", "20")),
+        )
         await _rag_instance.initialize()
     
     return _rag_instance
+
+
+async def close_rag() -> None:
+    """Release the global RAG instance's worker threads."""
+    if _rag_instance is not None:
+        _rag_instance.executor.shutdown(wait=False)
+        _rag_instance.ingest_executor.shutdown(wait=False)
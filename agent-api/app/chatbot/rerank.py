@@ -0,0 +1,130 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .executor import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import CrossEncoder
+    CROSS_ENCODER_AVAILABLE = True
+except ImportError:
+    CROSS_ENCODER_AVAILABLE = False
+
+
+class CrossEncoderReranker:
+    """Reorders retrieved chunks with a small cross-encoder under a per-request latency budget.
+
+    Candidates are scored in batches, best-ranked first. Once the budget is
+    spent (or the next batch is expected to overrun it) scoring stops; the
+    scored candidates are ordered by score and the rest keep their
+    retrieval order after them.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 8,
+        budget_ms: float = 150.0,
+        max_length: int = 256,
+        model: Optional[Any] = None,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.max_length = max_length
+        self.model = model
+
+        self.requests = 0
+        self.candidates_scored = 0
+        self.budget_exhausted = 0
+        self.failures = 0
+        self.total_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> bool:
+        """Load the cross-encoder; reranking stays off if it cannot be loaded."""
+        if self.model is not None:
+            return True
+        if not CROSS_ENCODER_AVAILABLE:
+            return False
+        try:
+            logger.info(f"Loading reranking model: {self.model_name}")
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load reranking model {self.model_name}: {str(e)}")
+            return False
+
+    async def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        executor: BoundedExecutor,
+        top_n: int,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Rerank retrieval results, returning the best ``top_n`` and what was done."""
+        start = time.perf_counter()
+        budget_seconds = self.budget_ms / 1000
+        scores: List[float] = []
+        exhausted = False
+
+        try:
+            batch_seconds = 0.0
+            for offset in range(0, len(candidates), self.batch_size):
+                elapsed = time.perf_counter() - start
+                if scores and elapsed + batch_seconds > budget_seconds:
+                    exhausted = True
+                    break
+
+                batch_start = time.perf_counter()
+                pairs = [(query, candidate["content"]) for candidate in candidates[offset:offset + self.batch_size]]
+                batch_scores = await executor.run(
+                    self.model.predict, pairs, batch_size=len(pairs), show_progress_bar=False
+                )
+                scores.extend(float(score) for score in batch_scores)
+                batch_seconds = max(batch_seconds, time.perf_counter() - batch_start)
+        except Exception as e:
+            logger.error(f"Error reranking results: {str(e)}")
+            self.failures += 1
+            scores = []
+
+        scored = [
+            {**candidate, "rerank_score": score}
+            for candidate, score in zip(candidates, scores)
+        ]
+        scored.sort(key=lambda candidate: candidate["rerank_score"], reverse=True)
+        results = (scored + candidates[len(scored):])[:top_n]
+
+        rerank_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.requests += 1
+        self.candidates_scored += len(scored)
+        self.budget_exhausted += exhausted
+        self.total_ms += rerank_ms
+        if exhausted:
+            logger.info(f"Rerank budget of {self.budget_ms} ms used after {len(scored)}/{len(candidates)} candidates")
+
+        return results, {
+            "rerank_ms": rerank_ms,
+            "candidates": len(candidates),
+            "scored": len(scored),
+            "budget_exhausted": exhausted,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get reranker statistics."""
+        return {
+            "model": self.model_name,
+            "available": self.available,
+            "batch_size": self.batch_size,
+            "budget_ms": self.budget_ms,
+            "requests": self.requests,
+            "candidates_scored": self.candidates_scored,
+            "budget_exhausted": self.budget_exhausted,
+            "failures": self.failures,
+            "avg_rerank_ms": round(self.total_ms / self.requests, 3) if self.requests else 0.0,
+        }
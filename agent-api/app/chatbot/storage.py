@@ -0,0 +1,446 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (metadata, retained messages, number of records the backend currently stores)
+LoadedSession = Tuple[Dict[str, Any], List[Dict[str, Any]], int]
+
+
+class SessionStorage(ABC):
+    """Persistence backend for ConversationMemory.
+
+    Writes are expressed as records: ``{"type": "meta", "metadata": {...}}``
+    when a session is created or its metadata changes, and
+    ``{"type": "message", "message": {...}}`` for each new message. Records
+    are applied in order: a meta record replaces the metadata and each later
+    message record adds one to ``message_count``. Backends implement every
+    abstract method; ``close`` is optional.
+    """
+
+    @abstractmethod
+    def load(self, session_id: str, max_history: int) -> Optional[LoadedSession]:
+        """Load a session's metadata and its last ``max_history`` messages."""
+
+    @abstractmethod
+    def append(self, session_id: str, records: List[Dict[str, Any]]) -> int:
+        """Persist new records, returning the number of records now stored."""
+
+    @abstractmethod
+    def compact(
+        self,
+        session_id: str,
+        metadata: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+    ) -> int:
+        """Replace a session's stored state with only the retained messages."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Delete a session."""
+
+    @abstractmethod
+    def delete_older_than(self, cutoff: datetime) -> List[str]:
+        """Delete sessions not updated since ``cutoff``, returning their IDs."""
+
+    @abstractmethod
+    def list_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """List sessions, most recently updated first."""
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+
+
+class JsonlSessionStorage(SessionStorage):
+    """One append-only JSON Lines log per session under ``memory_dir``."""
+
+    def __init__(self, memory_dir: str = "data/memory"):
+        self.memory_dir = Path(memory_dir)
+        self.memory_dir.mkdir(parents=True, exist_ok=True)
+        self._line_counts: Dict[str, int] = {}
+
+    def get_session_file_path(self, session_id: str) -> Path:
+        """Get the file path for a session."""
+        return self.memory_dir / f"session_{session_id}.jsonl"
+
+    def get_legacy_session_file_path(self, session_id: str) -> Path:
+        """Get the path of a session stored in the old single-JSON-document layout."""
+        return self.memory_dir / f"session_{session_id}.json"
+
+    def load(self, session_id: str, max_history: int) -> Optional[LoadedSession]:
+        session_file = self.get_session_file_path(session_id)
+        if not session_file.exists():
+            return self._migrate_legacy_session(session_id, max_history)
+
+        metadata, messages, line_count = self._read_session_file(session_file)
+        self._line_counts[session_id] = line_count
+        return metadata, messages[-max_history:] if max_history else [], line_count
+
+    def append(self, session_id: str, records: List[Dict[str, Any]]) -> int:
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        with open(self.get_session_file_path(session_id), "ab+") as f:
+            # After a crash mid-append, start on a new line instead of extending the partial one
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+
+        self._line_counts[session_id] = self._line_counts.get(session_id, 0) + len(records)
+        return self._line_counts[session_id]
+
+    def compact(
+        self,
+        session_id: str,
+        metadata: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+    ) -> int:
+        # Replaying the log adds one to message_count per message record
+        metadata = dict(metadata)
+        metadata["message_count"] = max(metadata.get("message_count", 0) - len(messages), 0)
+
+        records = [{"type": "meta", "metadata": metadata}]
+        records += [{"type": "message", "message": message} for message in messages]
+
+        session_file = self.get_session_file_path(session_id)
+        tmp_file = session_file.with_suffix(".jsonl.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, session_file)
+
+        self._line_counts[session_id] = len(records)
+        return len(records)
+
+    def delete(self, session_id: str) -> None:
+        self._line_counts.pop(session_id, None)
+        for session_file in (
+            self.get_session_file_path(session_id),
+            self.get_legacy_session_file_path(session_id),
+        ):
+            if session_file.exists():
+                session_file.unlink()
+
+    def delete_older_than(self, cutoff: datetime) -> List[str]:
+        deleted = []
+        for session_file in self._session_files():
+            if session_file.stat().st_mtime < cutoff.timestamp():
+                session_id = session_file.stem.replace("session_", "")
+                self.delete(session_id)
+                deleted.append(session_id)
+        return deleted
+
+    def list_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        # Without an index this has to read every session; use the SQLite backend at scale
+        sessions = []
+        for session_file in self._session_files():
+            session_id = session_file.stem.replace("session_", "")
+            try:
+                metadata = self._read_session_file(session_file)[0]
+            except Exception as e:
+                logger.error(f"Error reading session {session_id}: {str(e)}")
+                continue
+            if user_id is not None and metadata.get("user_id") != user_id:
+                continue
+            sessions.append({"session_id": session_id, **metadata})
+
+        sessions.sort(key=lambda session: session.get("updated_at") or "", reverse=True)
+        return sessions[:limit]
+
+    def _session_files(self) -> List[Path]:
+        session_files = list(self.memory_dir.glob("session_*.jsonl"))
+        session_files += self.memory_dir.glob("session_*.json")
+        return session_files
+
+    def _read_session_file(self, session_file: Path) -> LoadedSession:
+        """Read all metadata and messages from a session file in either layout."""
+        if session_file.suffix == ".json":
+            with open(session_file, "r", encoding="utf-8") as f:
+                session_data = json.load(f)
+            return session_data.get("metadata", {}), session_data.get("messages", []), 1
+
+        metadata: Dict[str, Any] = {}
+        messages: List[Dict[str, Any]] = []
+        line_count = 0
+
+        with open(session_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                line_count += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append can leave a partial last line
+                    logger.warning(f"Skipping corrupt record in {session_file.name}")
+                    continue
+
+                if record.get("type") == "meta":
+                    metadata = record.get("metadata", {})
+                elif record.get("type") == "message":
+                    message = record["message"]
+                    messages.append(message)
+                    metadata["message_count"] = metadata.get("message_count", 0) + 1
+                    metadata["updated_at"] = message.get("timestamp")
+
+        return metadata, messages, line_count
+
+    def _migrate_legacy_session(self, session_id: str, max_history: int) -> Optional[LoadedSession]:
+        """Read a session in the old single-JSON layout once and convert it to a log."""
+        legacy_file = self.get_legacy_session_file_path(session_id)
+        if not legacy_file.exists():
+            return None
+
+        metadata, messages, _ = self._read_session_file(legacy_file)
+        retained = messages[-max_history:] if max_history else []
+        line_count = self.compact(session_id, metadata, retained)
+
+        legacy_file.unlink()
+        logger.info(f"Migrated session {session_id} to the append-only log format")
+
+        return metadata, retained, line_count
+
+
+class SQLiteSessionStorage(SessionStorage):
+    """All sessions in one SQLite database (WAL mode), indexed by session, user and update time."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            user_id TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            metadata TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT,
+            metadata TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages(session_id, id);
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
+    """
+
+    # Columns kept outside the metadata JSON blob
+    SESSION_COLUMNS = ("user_id", "created_at", "updated_at", "message_count")
+
+    def __init__(self, db_path: str = "data/memory/sessions.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+
+    def load(self, session_id: str, max_history: int) -> Optional[LoadedSession]:
+        with self._lock:
+            session = self._conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if session is None:
+                return None
+
+            rows = self._conn.execute(
+                "SELECT role, content, timestamp, metadata FROM messages "
+                "WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, max_history),
+            ).fetchall()
+            stored = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+        metadata = json.loads(session["metadata"])
+        metadata.update({column: session[column] for column in self.SESSION_COLUMNS})
+        messages = [
+            {
+                "role": row["role"],
+                "content": row["content"],
+                "timestamp": row["timestamp"],
+                "metadata": json.loads(row["metadata"]),
+            }
+            for row in reversed(rows)
+        ]
+        return metadata, messages, stored
+
+    def append(self, session_id: str, records: List[Dict[str, Any]]) -> int:
+        with self._lock, self._conn:
+            # Apply records in order, as a JSONL replay would: a metadata
+            # snapshot already counts the messages recorded before it
+            messages: List[Dict[str, Any]] = []
+            for record in records:
+                if record.get("type") == "meta":
+                    self._insert_messages(session_id, messages)
+                    messages = []
+                    self._upsert_session(session_id, record["metadata"])
+                elif record.get("type") == "message":
+                    messages.append(record["message"])
+            self._insert_messages(session_id, messages)
+
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def compact(
+        self,
+        session_id: str,
+        metadata: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+    ) -> int:
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if not exists:
+                # Importing a session: write it out in full
+                self._upsert_session(session_id, metadata)
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, timestamp, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            session_id,
+                            message["role"],
+                            message["content"],
+                            message.get("timestamp"),
+                            json.dumps(message.get("metadata") or {}, ensure_ascii=False),
+                        )
+                        for message in messages
+                    ],
+                )
+            else:
+                # Rows are already stored, so only drop the ones outside the retained window
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, len(messages)),
+                )
+            return len(messages)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def delete_older_than(self, cutoff: datetime) -> List[str]:
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ? RETURNING session_id",
+                (cutoff.isoformat(),),
+            ).fetchall()
+        return [row["session_id"] for row in rows]
+
+    def list_sessions(self, user_id: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        query = "SELECT session_id, user_id, created_at, updated_at, message_count FROM sessions"
+        params: Tuple[Any, ...] = ()
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            params = (user_id,)
+        query += " ORDER BY updated_at DESC LIMIT ?"
+
+        with self._lock:
+            rows = self._conn.execute(query, params + (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _insert_messages(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Insert messages and count them on the session row. Caller holds the lock and transaction."""
+        if not messages:
+            return
+        self._conn.executemany(
+            "INSERT INTO messages (session_id, role, content, timestamp, metadata) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    session_id,
+                    message["role"],
+                    message["content"],
+                    message.get("timestamp"),
+                    json.dumps(message.get("metadata") or {}, ensure_ascii=False),
+                )
+                for message in messages
+            ],
+        )
+        self._conn.execute(
+            "UPDATE sessions SET message_count = message_count + ?, updated_at = ? WHERE session_id = ?",
+            (len(messages), messages[-1].get("timestamp"), session_id),
+        )
+
+    def _upsert_session(self, session_id: str, metadata: Dict[str, Any]) -> None:
+        """Insert or replace a session row. Caller holds the lock and transaction."""
+        extra = {key: value for key, value in metadata.items() if key not in self.SESSION_COLUMNS}
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, user_id, created_at, updated_at, message_count, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET user_id = excluded.user_id, "
+            "created_at = excluded.created_at, updated_at = excluded.updated_at, "
+            "message_count = excluded.message_count, metadata = excluded.metadata",
+            (
+                session_id,
+                metadata.get("user_id"),
+                metadata.get("created_at"),
+                metadata.get("updated_at") or metadata.get("created_at"),
+                metadata.get("message_count", 0),
+                json.dumps(extra, ensure_ascii=False),
+            ),
+        )
+
+
+def import_json_sessions(memory_dir: str, storage: SessionStorage) -> int:
+    """One-shot import of ``session_*.json`` / ``session_*.jsonl`` files into another backend."""
+    source = JsonlSessionStorage(memory_dir)
+    imported = 0
+
+    for session_file in source._session_files():
+        session_id = session_file.stem.replace("session_", "")
+        try:
+            # Source files are read without migrating or modifying them
+            metadata, messages, _ = source._read_session_file(session_file)
+            storage.delete(session_id)
+            storage.compact(session_id, metadata, messages)
+            imported += 1
+        except Exception as e:
+            logger.error(f"Error importing session {session_id}: {str(e)}")
+
+    return imported
+
+
+def create_storage(backend: str, memory_dir: str, db_path: Optional[str] = None) -> SessionStorage:
+    """Create a storage backend by name (``jsonl`` or ``sqlite``)."""
+    if backend == "sqlite":
+        return SQLiteSessionStorage(db_path or str(Path(memory_dir) / "sessions.db"))
+    if backend != "jsonl":
+        logger.warning(f"Unknown memory backend '{backend}', using jsonl")
+    return JsonlSessionStorage(memory_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import session_*.json(l) files into the SQLite conversation store."
+    )
+    parser.add_argument("memory_dir", nargs="?", default=os.getenv("MEMORY_DIR", "data/memory"))
+    parser.add_argument("--db", default=os.getenv("MEMORY_DB_PATH"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_storage = SQLiteSessionStorage(args.db or str(Path(args.memory_dir) / "sessions.db"))
+    count = import_json_sessions(args.memory_dir, db_storage)
+    db_storage.close()
+    print(f"Imported {count} sessions into {db_storage.db_path}")
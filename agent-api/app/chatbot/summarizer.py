@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from .llm import LocalLLM, get_llm
+from .memory import ConversationMemory, get_memory
+from .prompts import FinancialPromptTemplates
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSummarizer:
+    """Background summarizer that folds the older turns of long sessions into a stored summary.
+
+    Once a session has ``trigger_messages`` messages not covered by its
+    summary, all but the newest ``keep_recent`` of them are summarized by the
+    LLM (together with the previous summary) and the result is stored in the
+    session metadata. Request handlers only call ``schedule``, which queues
+    the session ID and returns at once; a single worker task does the
+    summarizing, and only starts a generation when the LLM has nothing else
+    running or waiting, so user requests keep priority. Work that cannot be
+    queued or does not get an idle LLM within ``max_idle_wait_seconds`` is
+    dropped, and is picked up again after the session's next turn.
+    """
+
+    def __init__(
+        self,
+        memory: ConversationMemory,
+        llm_factory: Callable[[], Awaitable[LocalLLM]] = get_llm,
+        trigger_messages: int = 20,
+        keep_recent: int = 8,
+        max_pending: int = 100,
+        idle_poll_seconds: float = 0.5,
+        max_idle_wait_seconds: float = 60.0,
+    ):
+        if keep_recent >= trigger_messages:
+            raise ValueError("keep_recent must be smaller than trigger_messages")
+        self.memory = memory
+        self.llm_factory = llm_factory
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.max_pending = max_pending
+        self.idle_poll_seconds = idle_poll_seconds
+        self.max_idle_wait_seconds = max_idle_wait_seconds
+
+        # Session IDs waiting for the worker, bound to one event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[str] = set()
+
+        self.scheduled = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.summaries = 0
+        self.summarized_messages = 0
+        self.errors = 0
+        self._total_seconds = 0.0
+
+    def schedule(self, session_id: str) -> bool:
+        """Queue a session for a summary check without waiting; False if it was not queued."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._loop = loop
+            self._pending.clear()
+            self._task = loop.create_task(self._worker(self._queue))
+
+        if session_id in self._pending:
+            return False
+        try:
+            self._queue.put_nowait(session_id)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(session_id)
+        self.scheduled += 1
+        return True
+
+    async def summarize(self, session_id: str) -> bool:
+        """Summarize a session's older messages if it is past the trigger; True if a summary was stored."""
+        summary, messages, start = await self.memory.aget_summarized_history(session_id)
+        if len(messages) < self.trigger_messages:
+            return False
+
+        older = messages[:len(messages) - self.keep_recent]
+        turns = [m for m in older if m.get("role") in ("user", "assistant")]
+        llm = await self.llm_factory()
+        if not llm.is_available or llm.using_mock:
+            return False
+        if not await self._wait_for_idle(llm):
+            self.deferred += 1
+            return False
+
+        started = time.perf_counter()
+        prompt = FinancialPromptTemplates.format_conversation_summary_prompt(turns, summary or "")
+        # A failed summary must not switch every user's chat to the mock backend
+        new_summary = await llm.generate_response(prompt, mock_fallback=False)
+        if not new_summary:
+            self.errors += 1
+            return False
+
+        stored = await self.memory.aset_summary(session_id, new_summary.strip(), start + len(older))
+        if stored:
+            self.summaries += 1
+            self.summarized_messages += len(older)
+            self._total_seconds += time.perf_counter() - started
+            logger.info(f"Summarized {len(older)} messages of session {session_id}")
+        return stored
+
+    async def stop(self) -> None:
+        """Cancel the worker, dropping any queued work."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, RuntimeError):
+                pass
+            self._task = None
+        self._queue = None
+        self._loop = None
+        self._pending.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get summarizer statistics."""
+        return {
+            "trigger_messages": self.trigger_messages,
+            "keep_recent": self.keep_recent,
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "scheduled": self.scheduled,
+            "dropped": self.dropped,
+            "deferred": self.deferred,
+            "summaries": self.summaries,
+            "summarized_messages": self.summarized_messages,
+            "errors": self.errors,
+            "avg_summary_ms": round(self._total_seconds / self.summaries * 1000, 1) if self.summaries else 0.0,
+        }
+
+    async def _wait_for_idle(self, llm: LocalLLM) -> bool:
+        """Wait until no generation is running or queued; False if that takes too long."""
+        deadline = time.monotonic() + self.max_idle_wait_seconds
+        while not llm.admission.idle:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.idle_poll_seconds)
+        return True
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        """Background task summarizing queued sessions one at a time."""
+        while True:
+            session_id = await queue.get()
+            # Turns finishing from here on queue the session again
+            self._pending.discard(session_id)
+            try:
+                await self.summarize(session_id)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error summarizing session {session_id}: {str(e)}")
+            finally:
+                queue.task_done()
+
+
+# Global summarizer instance
+_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_summarizer() -> Optional[ConversationSummarizer]:
+    """Get the global summarizer instance, or None when summarization is disabled."""
+    global _summarizer
+
+    if _summarizer is None and os.getenv("SUMMARY_ENABLED", "true").lower() == "true":
+        _summarizer = ConversationSummarizer(
+            get_memory(),
+            trigger_messages=int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "20")),
+            keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "8")),
+            max_pending=int(os.getenv("SUMMARY_MAX_PENDING", "100")),
+            max_idle_wait_seconds=float(os.getenv("SUMMARY_MAX_IDLE_WAIT_SECONDS", "60")),
+        )
+
+    return _summarizer
+
+
+async def close_summarizer() -> None:
+    """Stop the global summarizer's worker."""
+    if _summarizer is not None:
+        await _summarizer.stop()
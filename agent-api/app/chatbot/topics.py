@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from .lexical import fold_accents
+
+# Accent-folded English and Spanish keywords per topic. A keyword matches at the
+# start of a word; a trailing "*" lets it match as a stem ("ahorr*" matches
+# "ahorro" and "ahorrar"), otherwise the whole word must match ("ira" does not
+# match "mira").
+TOPIC_KEYWORDS: Dict[str, Sequence[str]] = {
+    "budget": (
+        "budget*", "expense*", "income", "50/30/20",
+        "presupuest*", "gasto*", "ingreso*",
+    ),
+    "saving": (
+        "save", "saves", "saved", "saving*", "emergency fund*", "money",
+        "ahorr*", "fondo de emergencia", "fondos de emergencia", "dinero",
+    ),
+    "investing": (
+        "invest*", "stock*", "bond", "bonds", "portfolio*", "etf*", "index fund*",
+        "inversion*", "invert*", "acciones", "bono", "bonos", "cartera*", "fondo indexado", "fondos indexados",
+    ),
+    "debt": (
+        "debt*", "loan*", "credit", "mortgage*", "payment*",
+        "deuda*", "prestamo*", "credito*", "hipoteca*", "pago", "pagos", "pagar",
+    ),
+    "credit_score": (
+        "credit score*", "credit report*", "credit card*", "fico",
+        "puntaje de credito", "puntaje crediticio", "historial crediticio", "tarjeta de credito", "tarjetas de credito",
+    ),
+    "retirement": (
+        "retire*", "401k", "ira", "iras", "pension*",
+        "jubil*", "retiro",
+    ),
+    "insurance": (
+        "insur*", "coverage", "premium*", "policy", "policies",
+        "seguro de*", "seguros", "aseguradora*", "poliza*", "cobertura*",
+    ),
+    "taxes": (
+        "tax", "taxes", "deduction*", "refund*",
+        "impuesto*", "deduccion*", "reembolso*",
+    ),
+}
+
+
+class TopicMatcher:
+    """Finds topic keywords in text in a single pass.
+
+    All keywords are compiled into one trie-shaped regular expression, so
+    the text is scanned once (in C) and at each word start the engine walks
+    the keyword trie instead of trying every keyword in turn. Shared
+    prefixes are tested once and the longest keyword wins. Text is
+    accent-folded first, so "inversión" and "inversion" match alike.
+    """
+
+    def __init__(self, keywords: Dict[str, Sequence[str]]):
+        self._owners: Dict[str, str] = {}
+        trie: Dict[str, dict] = {}
+        for topic, topic_keywords in keywords.items():
+            for keyword in topic_keywords:
+                stem = keyword.endswith("*")
+                keyword = fold_accents(keyword.rstrip("*"))
+                if keyword in self._owners and self._owners[keyword] != topic:
+                    raise ValueError(f"Keyword {keyword!r} belongs to two topics")
+                self._owners[keyword] = topic
+                node = trie
+                for char in keyword:
+                    node = node.setdefault(char, {})
+                node[""] = "stem" if stem else "word"
+
+        self.pattern = re.compile(r"\b(" + self._compile(trie) + ")")
+
+    def count(self, text: str) -> Counter:
+        """Number of keyword matches per topic."""
+        return Counter(map(self._owners.__getitem__, self.pattern.findall(fold_accents(text))))
+
+    def rank(self, text: str) -> List[str]:
+        """Topics found in ``text``, most matches first, then by first appearance."""
+        counts: Dict[str, int] = {}
+        for match in self.pattern.findall(fold_accents(text)):
+            topic = self._owners[match]
+            counts[topic] = counts.get(topic, 0) + 1
+        return sorted(counts, key=lambda topic: -counts[topic])
+
+    def main_topic(self, text: str, among: Optional[Sequence[str]] = None) -> Optional[str]:
+        """The top-ranked topic of ``text``, optionally only considering ``among``."""
+        for topic in self.rank(text):
+            if among is None or topic in among:
+                return topic
+        return None
+
+    @classmethod
+    def _compile(cls, node: Dict[str, dict]) -> str:
+        # Longer continuations come first so the longest keyword wins
+        branches = [re.escape(char) + cls._compile(child) for char, child in sorted(node.items()) if char]
+        if node.get("") == "word":
+            branches.append(r"\b")
+        elif node.get("") == "stem":
+            branches.append("")
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+
+topic_matcher = TopicMatcher(TOPIC_KEYWORDS)
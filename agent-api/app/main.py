@@ -1,15 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from .routes import router
-from .chatbot.llm import initialize_llm
-from .chatbot.rag import get_rag
+from .chatbot.llm import initialize_llm, close_llm
+from .chatbot.rag import get_rag, close_rag
 from .chatbot.memory import get_memory
+from .chatbot.health import get_health_monitor
+from .chatbot.jobs import get_job_queue
+from .chatbot.summarizer import close_summarizer
 
 # Load environment variables
 load_dotenv()
@@ -48,10 +52,13 @@ async def lifespan(app: FastAPI):
         logger.info("✅ Memory system initialized successfully")
         
         # Clean up old sessions (older than 30 days)
-        cleaned = memory.cleanup_old_sessions(30)
+        cleaned = await asyncio.to_thread(memory.cleanup_old_sessions, 30)
         if cleaned > 0:
             logger.info(f"🧹 Cleaned up {cleaned} old sessions")
         
+        # Keep readiness state fresh in the background
+        await get_health_monitor().start()
+        
         logger.info("🚀 Financial AI Agent API is ready!")
         
     except Exception as e:
@@ -62,6 +69,13 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Financial AI Agent API...")
+    await get_health_monitor().stop()
+    await get_job_queue().stop()
+    await close_summarizer()
+    # Persist every queued conversation write before exiting
+    await get_memory().aclose()
+    await close_rag()
+    await close_llm()
 
 
 # Create FastAPI app with lifespan
@@ -98,6 +112,7 @@ async def http_exception_handler(request, exc):
                 "status_code": exc.status_code,
             }
         },
+        headers=getattr(exc, "headers", None),
     )
 
 
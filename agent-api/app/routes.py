@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Dict, Any, Optional
+import json
 import logging
+import time
 import uuid
 from datetime import datetime
 
@@ -12,9 +15,14 @@ from .models import (
     HealthResponse,
     ConversationHistory,
 )
-from .chatbot.llm import get_llm
+from .chatbot.llm import LLMOverloaded, get_llm
 from .chatbot.rag import get_rag
 from .chatbot.memory import get_memory
+from .chatbot.health import get_health_monitor
+from .chatbot.context import get_prompt_assembler
+from .chatbot.summarizer import get_summarizer
+from .chatbot.ingest import create_ingestor
+from .chatbot.jobs import JobQueueFull, get_job_queue
 from .chatbot.prompts import FinancialPromptTemplates
 
 logger = logging.getLogger(__name__)
@@ -23,101 +31,37 @@ router = APIRouter()
 
 
 @router.post("/chat", response_model=ChatResponse) 
-async def chat_endpoint(request: ChatRequest) -> ChatResponse:
-    """Main chat endpoint for the financial AI agent."""
+async def chat_endpoint(request: ChatRequest, response: Response) -> ChatResponse:
+    """Main chat endpoint for the financial AI agent.
+    
+    Reports how long each stage took in a ``Server-Timing`` header.
+    """
     try:
-        # Get or create session ID
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        # Initialize components
-        llm = await get_llm()
-        rag = await get_rag()
-        memory = get_memory()
-        
-        if not llm.is_available:
-            raise HTTPException(
-                status_code=503,
-                detail="AI model is currently unavailable. Please try again later."
+        turn = await _prepare_chat_turn(request)
+        timings = turn["timings"]
+        
+        response_text = turn["cached_response"]
+        if response_text is None:
+            # Generate response from LLM (including any wait for a generation slot)
+            started = time.perf_counter()
+            response_text = await turn["llm"].generate_response(
+                prompt=turn["main_prompt"],
+                system_prompt=turn["system_prompt"],
+                history=turn["history"],
             )
+            timings["llm"] = _elapsed_ms(started)
         
-        # Get conversation context
-        conversation_context = memory.get_recent_context(session_id, max_messages=10)
-        
-        # Get RAG context
-        rag_context = await rag.get_context_for_query(
-            request.message,
-            max_context_length=1500,
-            n_results=3,
-        )
-        
-        # Format user context (from the app)
-        user_context = ""
-        if request.context:
-            context_parts = []
-            if "user_balance" in request.context:
-                context_parts.append(f"Current balance: {request.context['user_balance']}")
-            if "recent_transactions" in request.context:
-                context_parts.append(f"Recent transactions: {len(request.context['recent_transactions'])} transactions")
-            if "budget_info" in request.context:
-                context_parts.append(f"Budget status: {request.context['budget_info']}")
-            user_context = "; ".join(context_parts) if context_parts else ""
-        
-        # Create system prompt
-        system_prompt = FinancialPromptTemplates.format_system_prompt(
-            user_context=user_context,
-            rag_context=rag_context[:500],  # Brief context for system prompt
-        )
-        
-        # Create main prompt
-        main_prompt = FinancialPromptTemplates.format_chat_prompt(
-            user_message=request.message,
-            conversation_history=conversation_context,
-            rag_context=rag_context,
-            user_context=user_context,
-        )
-        
-        # Generate response from LLM
-        response_text = await llm.generate_response(
-            prompt=main_prompt,
-            system_prompt=system_prompt,
-        )
-        
-        if not response_text:
-            response_text = FinancialPromptTemplates.ERROR_RESPONSE
-        
-        # Store conversation in memory
-        memory.add_message(
-            session_id=session_id,
-            role="user",
-            content=request.message,
-            metadata={"context": request.context},
-            user_id=request.user_id,
-        )
-        
-        memory.add_message(
-            session_id=session_id,
-            role="assistant",
-            content=response_text,
-            metadata={"rag_sources": len(await rag.search(request.message, n_results=3))},
-        )
-        
-        # Extract topics for suggestions
-        topic_keywords = request.message.lower()
-        suggestions = FinancialPromptTemplates.get_suggestions_for_topic(topic_keywords)
-        
-        # Get sources from RAG results
-        rag_results = await rag.search(request.message, n_results=3)
-        sources = [result["metadata"].get("source", "Unknown") for result in rag_results]
-        unique_sources = list(set([source.split("/")[-1] for source in sources if source != "Unknown"]))
+        started = time.perf_counter()
+        chat_response = await _finish_chat_turn(request, turn, response_text)
+        timings["store"] = _elapsed_ms(started)
+        response.headers["Server-Timing"] = _server_timing(timings)
         
-        return ChatResponse(
-            message=response_text,
-            session_id=session_id,
-            sources=unique_sources[:3],  # Limit to top 3 sources
-            confidence_score=0.85 if rag_results else 0.7,  # Simple confidence scoring
-            suggestions=suggestions[:3],  # Limit to 3 suggestions
-        )
+        return chat_response
         
+    except HTTPException:
+        raise
+    except LLMOverloaded as e:
+        raise _overloaded(e)
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(
@@ -126,6 +70,216 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
         )
 
 
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest) -> StreamingResponse:
+    """Chat endpoint that streams the response as Server-Sent Events.
+    
+    Emits ``token`` events as the model produces text, then a single ``done``
+    event carrying the full ChatResponse once memory and sources are stored.
+    """
+    try:
+        turn = await _prepare_chat_turn(request)
+    except HTTPException:
+        raise
+    except LLMOverloaded as e:
+        raise _overloaded(e)
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your request. Please try again."
+        )
+    
+    async def event_stream():
+        try:
+            if turn["cached_response"] is not None:
+                response_text = turn["cached_response"]
+                yield _sse_event("token", {"token": response_text})
+            else:
+                chunks = []
+                async for chunk in turn["llm"].generate_streaming_response(
+                    prompt=turn["main_prompt"],
+                    system_prompt=turn["system_prompt"],
+                    history=turn["history"],
+                ):
+                    chunks.append(chunk)
+                    yield _sse_event("token", {"token": chunk})
+                response_text = "".join(chunks).strip()
+            
+            # Persist and attribute only after the stream has finished
+            chat_response = await _finish_chat_turn(request, turn, response_text)
+            yield _sse_event("done", chat_response.model_dump())
+            
+        except LLMOverloaded as e:
+            logger.warning(f"Chat stream not admitted: {str(e)}")
+            yield _sse_event("error", {"message": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield _sse_event("error", {
+                "message": "An error occurred while processing your request. Please try again.",
+            })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _prepare_chat_turn(request: ChatRequest) -> Dict[str, Any]:
+    """Retrieve context and build prompts for a chat turn."""
+    # Get or create session ID
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    # Initialize components
+    llm = await get_llm()
+    rag = await get_rag()
+    memory = get_memory()
+    
+    if not llm.is_available:
+        raise HTTPException(
+            status_code=503,
+            detail="AI model is currently unavailable. Please try again later."
+        )
+    
+    timings: Dict[str, float] = {}
+    
+    # Get the stored summary and the messages after it; the prompt assembler decides how much fits
+    started = time.perf_counter()
+    summary, history, _ = await memory.aget_summarized_history(session_id)
+    timings["history"] = _elapsed_ms(started)
+    
+    # Retrieve once and reuse for context, sources and scoring
+    started = time.perf_counter()
+    retrieval = await rag.retrieve(request.message, n_results=3)
+    timings["retrieval"] = _elapsed_ms(started)
+    if retrieval.rerank_ms:
+        timings["rerank"] = round(retrieval.rerank_ms, 1)
+    
+    # Format user context (from the app)
+    user_context = ""
+    if request.context:
+        context_parts = []
+        if "user_balance" in request.context:
+            context_parts.append(f"Current balance: {request.context['user_balance']}")
+        if "recent_transactions" in request.context:
+            context_parts.append(f"Recent transactions: {len(request.context['recent_transactions'])} transactions")
+        if "budget_info" in request.context:
+            context_parts.append(f"Budget status: {request.context['budget_info']}")
+        user_context = "; ".join(context_parts) if context_parts else ""
+    
+    # Pack instructions, history, retrieved chunks and user context into one token budget
+    started = time.perf_counter()
+    assembled = get_prompt_assembler().assemble(
+        user_message=request.message,
+        history=history,
+        chunks=retrieval.results,
+        user_context=user_context,
+        summary=summary,
+    )
+    timings["prompt"] = _elapsed_ms(started)
+    
+    # Reuse an earlier answer to a near-duplicate question when possible
+    started = time.perf_counter()
+    cached_response = await rag.find_cached_response(retrieval, request.context, assembled["history"])
+    timings["cache"] = _elapsed_ms(started)
+    if cached_response is None:
+        # Turn away new generations early when the model queue is already full
+        llm.admission.check()
+    
+    return {
+        "session_id": session_id,
+        "llm": llm,
+        "rag": rag,
+        "memory": memory,
+        "retrieval": retrieval,
+        "cached_response": cached_response,
+        "system_prompt": assembled["system_prompt"],
+        "history": assembled["history"],
+        "main_prompt": assembled["prompt"],
+        "prompt_tokens": assembled["tokens"],
+        "unsummarized_messages": len(history),
+        "timings": timings,
+    }
+
+
+async def _finish_chat_turn(
+    request: ChatRequest,
+    turn: Dict[str, Any],
+    response_text: Optional[str],
+) -> ChatResponse:
+    """Cache, store and attribute a generated response."""
+    llm = turn["llm"]
+    rag = turn["rag"]
+    memory = turn["memory"]
+    retrieval = turn["retrieval"]
+    session_id = turn["session_id"]
+    from_cache = turn["cached_response"] is not None
+    
+    if response_text and not from_cache and not llm.using_mock:
+        await rag.cache_response(retrieval, response_text, request.context, turn["history"])
+    
+    if not response_text:
+        response_text = FinancialPromptTemplates.ERROR_RESPONSE
+    
+    # Store conversation in memory
+    await memory.aadd_message(
+        session_id=session_id,
+        role="user",
+        content=request.message,
+        metadata={"context": request.context},
+        user_id=request.user_id,
+    )
+    
+    await memory.aadd_message(
+        session_id=session_id,
+        role="assistant",
+        content=response_text,
+        metadata={"rag_sources": len(retrieval), "cached": from_cache},
+    )
+    
+    # Fold older turns into the session summary in the background once there are enough
+    summarizer = get_summarizer()
+    if summarizer is not None and turn["unsummarized_messages"] + 2 >= summarizer.trigger_messages:
+        summarizer.schedule(session_id)
+    
+    # Extract topics for suggestions
+    topic_keywords = request.message.lower()
+    suggestions = FinancialPromptTemplates.get_suggestions_for_topic(topic_keywords)
+    
+    return ChatResponse(
+        message=response_text,
+        session_id=session_id,
+        sources=retrieval.get_sources(limit=3),  # Limit to top 3 sources
+        confidence_score=retrieval.confidence_score,
+        suggestions=suggestions[:3],  # Limit to 3 suggestions
+    )
+
+
+def _overloaded(error: LLMOverloaded) -> HTTPException:
+    """503 response telling the client when to retry."""
+    logger.warning(f"Chat request not admitted: {str(error)}")
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is busy right now. Please try again shortly.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    """Format stage durations as a Server-Timing header value."""
+    return ", ".join(f"{stage};dur={duration}" for stage, duration in timings.items())
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/feedback", response_model=FeedbackResponse)
 async def feedback_endpoint(request: FeedbackRequest) -> FeedbackResponse:
     """Endpoint for collecting user feedback on responses."""
@@ -133,7 +287,7 @@ async def feedback_endpoint(request: FeedbackRequest) -> FeedbackResponse:
         memory = get_memory()
         
         # Get session history to validate
-        history = memory.get_conversation_history(request.session_id)
+        history = await memory.aget_conversation_history(request.session_id)
         if not history:
             raise HTTPException(
                 status_code=404,
@@ -155,7 +309,7 @@ async def feedback_endpoint(request: FeedbackRequest) -> FeedbackResponse:
         logger.info(f"Received feedback: {feedback_data}")
         
         # Add feedback to conversation metadata
-        memory.add_message(
+        await memory.aadd_message(
             session_id=request.session_id,
             role="system",
             content=f"User provided feedback: {request.feedback_type}",
@@ -178,9 +332,22 @@ async def feedback_endpoint(request: FeedbackRequest) -> FeedbackResponse:
         )
 
 
+@router.get("/live")
+async def live_endpoint() -> Dict[str, Any]:
+    """Liveness probe; never touches the LLM or the vector store."""
+    return get_health_monitor().liveness()
+
+
+@router.get("/ready")
+async def ready_endpoint() -> JSONResponse:
+    """Readiness probe served from the background prober's cached state."""
+    readiness = get_health_monitor().readiness()
+    return JSONResponse(content=readiness, status_code=200 if readiness["ready"] else 503)
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_endpoint() -> HealthResponse:
-    """Health check endpoint for monitoring system status."""
+    """Deep health check; calls the LLM and vector store on every request."""
     try:
         # Check LLM status
         llm = await get_llm()
@@ -188,7 +355,7 @@ async def health_endpoint() -> HealthResponse:
         
         # Check RAG status
         rag = await get_rag()
-        rag_stats = rag.get_collection_stats()
+        rag_stats = await rag.get_collection_stats()
         
         # Overall system status
         overall_status = "healthy"
@@ -214,6 +381,22 @@ async def health_endpoint() -> HealthResponse:
         )
 
 
+@router.get("/sessions")
+async def list_sessions_endpoint(user_id: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """List stored sessions, most recently updated first."""
+    try:
+        memory = get_memory()
+        sessions = await memory.alist_sessions(user_id=user_id, limit=min(max(limit, 1), 1000))
+        return {"sessions": sessions, "count": len(sessions)}
+        
+    except Exception as e:
+        logger.error(f"Error listing sessions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while listing sessions."
+        )
+
+
 @router.get("/sessions/{session_id}", response_model=ConversationHistory)
 async def get_session_endpoint(session_id: str) -> ConversationHistory:
     """Get conversation history for a specific session."""
@@ -221,7 +404,7 @@ async def get_session_endpoint(session_id: str) -> ConversationHistory:
         memory = get_memory()
         
         # Get conversation history
-        messages = memory.get_conversation_history(session_id)
+        messages = await memory.aget_conversation_history(session_id)
         if not messages:
             raise HTTPException(
                 status_code=404,
@@ -229,7 +412,7 @@ async def get_session_endpoint(session_id: str) -> ConversationHistory:
             )
         
         # Get session summary for metadata
-        session_summary = memory.get_session_summary(session_id)
+        session_summary = await memory.aget_session_summary(session_id)
         session_metadata = session_summary.get("metadata", {})
         
         # Convert messages to proper format
@@ -277,7 +460,7 @@ async def delete_session_endpoint(session_id: str) -> Dict[str, str]:
     try:
         memory = get_memory()
         
-        success = memory.delete_session(session_id)
+        success = await memory.adelete_session(session_id)
         if not success:
             raise HTTPException(
                 status_code=404,
@@ -298,24 +481,27 @@ async def delete_session_endpoint(session_id: str) -> Dict[str, str]:
 
 @router.post("/documents/upload")
 async def upload_document_endpoint(
-    background_tasks: BackgroundTasks,
     file_path: str,
     metadata: Optional[Dict[str, Any]] = None,
-) -> Dict[str, str]:
+) -> Dict[str, Any]:
     """Upload a new document to the knowledge base."""
     try:
         rag = await get_rag()
         
-        # Add document processing as background task
-        background_tasks.add_task(
-            _process_document,
-            rag,
-            file_path,
-            metadata or {},
-        )
+        # Queue document processing as an ingestion job
+        async def ingest(report):
+            return await create_ingestor(rag, workers=0, on_progress=report).run([file_path], metadata or {})
+        
+        job = get_job_queue().submit("upload", ingest, description=file_path)
         
-        return {"message": "Document upload started. Processing in background."}
+        return {
+            "message": "Document upload started. Processing in background.",
+            "job_id": job["job_id"],
+            "status": job["status"],
+        }
         
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error starting document upload: {str(e)}")
         raise HTTPException(
@@ -324,16 +510,50 @@ async def upload_document_endpoint(
         )
 
 
-async def _process_document(rag, file_path: str, metadata: Dict[str, Any]) -> None:
-    """Background task to process uploaded documents."""
+@router.post("/documents/ingest")
+async def bulk_ingest_endpoint(force: bool = False) -> Dict[str, Any]:
+    """Queue a sync of the whole docs directory."""
     try:
-        success = await rag.add_document(file_path, metadata)
-        if success:
-            logger.info(f"Successfully processed document: {file_path}")
-        else:
-            logger.error(f"Failed to process document: {file_path}")
+        rag = await get_rag()
+        
+        async def ingest(report):
+            return await create_ingestor(rag, on_progress=report).run(force=force)
+        
+        job = get_job_queue().submit("sync", ingest, description=str(rag.docs_dir))
+        
+        return {
+            "message": "Bulk ingestion queued.",
+            "job_id": job["job_id"],
+            "status": job["status"],
+        }
+        
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        logger.error(f"Error processing document {file_path}: {str(e)}")
+        logger.error(f"Error starting bulk ingestion: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while starting bulk ingestion."
+        )
+
+
+@router.get("/documents/jobs")
+async def list_ingest_jobs_endpoint(limit: int = 50) -> Dict[str, Any]:
+    """List recent ingestion jobs, newest first."""
+    jobs = get_job_queue().list_jobs(limit=min(max(limit, 1), 200))
+    return {"jobs": jobs, "count": len(jobs)}
+
+
+@router.get("/documents/jobs/{job_id}")
+async def get_ingest_job_endpoint(job_id: str) -> Dict[str, Any]:
+    """Get an ingestion job's status and progress."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Job not found"
+        )
+    return job
 
 
 @router.get("/stats")
@@ -342,22 +562,24 @@ async def stats_endpoint() -> Dict[str, Any]:
     try:
         # RAG stats
         rag = await get_rag()
-        rag_stats = rag.get_collection_stats()
+        rag_stats = await rag.get_collection_stats()
         
         # LLM stats
         llm = await get_llm()
         llm_info = llm.get_model_info()
         
-        # Memory stats (simplified)
+        # Memory stats
         memory = get_memory()
+        summarizer = get_summarizer()
         
         return {
             "rag": rag_stats,
             "llm": llm_info,
-            "memory": {
-                "active_sessions": len(memory._session_cache),
-                "max_history": memory.max_history,
-            },
+            "memory": memory.get_stats(),
+            "health": get_health_monitor().get_stats(),
+            "ingest_jobs": get_job_queue().get_stats(),
+            "prompts": get_prompt_assembler().get_stats(),
+            "summarizer": summarizer.get_stats() if summarizer else None,
             "version": "1.0.0",
         }
         
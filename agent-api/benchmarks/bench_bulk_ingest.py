@@ -0,0 +1,107 @@
+"""
+Benchmark for bulk ingestion of the docs directory.
+
+Generates synthetic text documents and indexes them twice into fresh
+collections: file by file with RAGPipeline.add_document, and with the
+BulkIngestor (parallel parsing, cross-file embedding batches, batched
+upserts). Reports files per second for each.
+
+Usage (from the agent-api directory):
+    python -m benchmarks.bench_bulk_ingest
+    python -m benchmarks.bench_bulk_ingest --files 1000 --workers 8
+
+Uses a synthetic encoder with a fixed per-call cost plus a per-item cost,
+so the numbers reflect batching rather than a particular model.
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+
+from app.chatbot.executor import BoundedExecutor
+from app.chatbot.ingest import DEFAULT_WORKERS, BulkIngestor
+from app.chatbot.rag import RAGPipeline
+from benchmarks.bench_embedding_batcher import SyntheticEncoder
+
+WORDS = (
+    "budget savings emergency fund interest rate credit score debt loan investment "
+    "stocks bonds retirement inflation income expenses mortgage insurance taxes"
+).split()
+
+
+def write_documents(docs_dir: Path, files: int, paragraphs: int) -> None:
+    rng = random.Random(42)
+    for i in range(files):
+        text = "\n\n".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 160)))
+            for _ in range(paragraphs)
+        )
+        (docs_dir / f"doc_{i:05d}.txt").write_text(text, encoding="utf-8")
+
+
+def make_pipeline(root: Path, docs_dir: Path, name: str) -> RAGPipeline:
+    rag = RAGPipeline(
+        docs_dir=str(docs_dir),
+        embeddings_dir=str(root / name),
+        executor=BoundedExecutor(max_workers=2),
+    )
+    rag.embedding_model = SyntheticEncoder()
+    rag.chroma_client = chromadb.PersistentClient(path=str(root / name))
+    rag.collection = rag.chroma_client.get_or_create_collection(rag.collection_name)
+    return rag
+
+
+async def run_sequential(rag: RAGPipeline) -> float:
+    start = time.perf_counter()
+    for file_path in rag.document_files():
+        await rag.add_document(str(file_path))
+    return time.perf_counter() - start
+
+
+async def run_bulk(rag: RAGPipeline, workers: int, embed_batch_size: int) -> float:
+    start = time.perf_counter()
+    await BulkIngestor(rag, workers=workers, embed_batch_size=embed_batch_size).run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--embed-batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        docs_dir = root / "docs"
+        docs_dir.mkdir()
+        write_documents(docs_dir, args.files, args.paragraphs)
+        print(f"{args.files} files, {args.paragraphs} paragraphs each; workers={args.workers}")
+
+        sequential = make_pipeline(root, docs_dir, "sequential")
+        sequential_s = asyncio.run(run_sequential(sequential))
+        bulk = make_pipeline(root, docs_dir, "bulk")
+        bulk_s = asyncio.run(run_bulk(bulk, args.workers, args.embed_batch_size))
+        resync_s = asyncio.run(run_bulk(bulk, args.workers, args.embed_batch_size))
+
+        print(f"{'mode':<12} {'seconds':>10} {'files/s':>10} {'chunks':>10}")
+        for mode, seconds, rag in [
+            ("sequential", sequential_s, sequential),
+            ("bulk", bulk_s, bulk),
+            ("bulk resync", resync_s, bulk),
+        ]:
+            print(f"{mode:<12} {seconds:>10.2f} {args.files / seconds:>10.1f} {rag.collection.count():>10}")
+        print(f"Cold-start speedup: {sequential_s / bulk_s:.2f}x")
+
+        sequential.executor.shutdown()
+        bulk.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
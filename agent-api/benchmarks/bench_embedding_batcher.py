@@ -0,0 +1,118 @@
+"""
+Benchmark for the query embedding micro-batcher.
+
+Fires concurrent query embeddings through EmbeddingBatcher with batching
+disabled (one encode call per query) and enabled, and reports throughput.
+
+Usage (from the agent-api directory):
+    python -m benchmarks.bench_embedding_batcher
+    python -m benchmarks.bench_embedding_batcher --concurrency 64 --requests 1024
+
+Uses the real SentenceTransformer model when it can be loaded, otherwise a
+synthetic encoder with a fixed per-call cost plus a per-item cost.
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.chatbot.executor import BoundedExecutor
+from app.chatbot.rag import EmbeddingBatcher
+
+QUERIES = [
+    "¿Cómo creo mi primer presupuesto?",
+    "¿Qué es la regla 50/30/20 para presupuestos?",
+    "¿Cuánto debería tener en un fondo de emergencia?",
+    "How do I start investing with little money?",
+    "What is the difference between stocks and bonds?",
+    "¿Debo pagar deudas o invertir primero?",
+    "How can I improve my credit score?",
+    "What is a 401k match?",
+]
+
+
+class SyntheticEncoder:
+    """Stand-in encoder: fixed per-call overhead plus a smaller per-item cost."""
+
+    def __init__(self, call_overhead_ms: float = 4.0, per_item_ms: float = 0.4, dim: int = 384):
+        self.call_overhead_ms = call_overhead_ms
+        self.per_item_ms = per_item_ms
+        self.dim = dim
+
+    def encode(self, texts):
+        time.sleep((self.call_overhead_ms + self.per_item_ms * len(texts)) / 1000)
+        return np.random.rand(len(texts), self.dim).astype(np.float32)
+
+
+def load_encoder(model_name: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name)
+        return model.encode, f"SentenceTransformer({model_name})"
+    except Exception:
+        encoder = SyntheticEncoder()
+        return encoder.encode, "SyntheticEncoder"
+
+
+async def run(encode, concurrency: int, requests: int, max_batch_size: int, max_wait_ms: float) -> dict:
+    executor = BoundedExecutor(max_workers=2, max_queue_size=max(64, concurrency))
+    batcher = EmbeddingBatcher(encode, executor, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            # Unique text per request so deduplication does not flatter the numbers
+            text = f"{QUERIES[i % len(QUERIES)]} #{i}"
+            start = time.perf_counter()
+            await batcher.embed(text)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    latencies.sort()
+    return {
+        "throughput_qps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "avg_batch_size": batcher.get_stats()["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    encode, encoder_name = load_encoder(args.model)
+    print(f"Encoder: {encoder_name}; concurrency={args.concurrency}, requests={args.requests}")
+
+    results = {
+        "unbatched": asyncio.run(run(encode, args.concurrency, args.requests, 1, 0)),
+        "batched": asyncio.run(
+            run(encode, args.concurrency, args.requests, args.max_batch_size, args.max_wait_ms)
+        ),
+    }
+
+    print(f"{'mode':<10} {'qps':>10} {'p50 ms':>10} {'p99 ms':>10} {'avg batch':>10}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['throughput_qps']:>10.1f} {r['p50_ms']:>10.2f} "
+            f"{r['p99_ms']:>10.2f} {r['avg_batch_size']:>10.2f}"
+        )
+    speedup = results["batched"]["throughput_qps"] / results["unbatched"]["throughput_qps"]
+    print(f"Throughput gain: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
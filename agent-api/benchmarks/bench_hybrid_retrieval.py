@@ -0,0 +1,154 @@
+"""
+Benchmark for hybrid BM25 + vector retrieval.
+
+Builds a synthetic corpus of financial chunks in which some chunks carry a
+rare exact term (a plan code like "457k", a ratio like "40/40/20" or an
+account acronym). Each such chunk gets one query that mentions its term.
+Reports recall@k for vector-only, BM25-only and fused (RRF) retrieval,
+plus latency percentiles for each mode and for the BM25 index on its own.
+
+Usage (from the agent-api directory):
+    python -m benchmarks.bench_hybrid_retrieval
+    python -m benchmarks.bench_hybrid_retrieval --chunks 20000 --queries 300 --k 5
+    python -m benchmarks.bench_hybrid_retrieval --model all-MiniLM-L6-v2
+
+Vectors come from the fallback SimpleTextEmbedder unless --model names a
+SentenceTransformer model that is available locally.
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import chromadb
+
+from app.chatbot.executor import BoundedExecutor
+from app.chatbot.lexical import BM25Index
+from app.chatbot.rag import RAGPipeline, SimpleTextEmbedder
+
+WORDS = (
+    "budget savings emergency fund interest rate credit score debt loan investment stocks bonds "
+    "retirement inflation income expenses mortgage insurance taxes presupuesto ahorro deuda "
+    "inversion jubilacion impuestos ingresos gastos tarjeta credito cuenta banco"
+).split()
+ACRONYMS = ["ira", "cd", "hsa", "etf", "apr", "apy", "reit", "fico", "roth", "sep"]
+
+
+def make_corpus(chunks: int, targets: int, seed: int = 42) -> Tuple[List[str], List[Tuple[str, int]]]:
+    """Chunks of filler text; the first ``targets`` each carry a unique exact term."""
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120))) for _ in range(chunks)]
+    queries = []
+    for i in range(targets):
+        kind = i % 3
+        if kind == 0:
+            term = f"{400 + i}k"
+        elif kind == 1:
+            term = f"{10 + i % 80}/{(i * 7) % 90}/{i % 50}"
+        else:
+            term = f"{ACRONYMS[i % len(ACRONYMS)]}{i}"
+        position = rng.randrange(len(texts[i]))
+        texts[i] = f"{texts[i][:position]} {term} {texts[i][position:]}"
+        queries.append((f"how does the {term} work for {rng.choice(WORDS)}", i))
+    rng.shuffle(queries)
+    return texts, queries
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50": ordered[len(ordered) // 2] * 1000,
+        "p95": ordered[int(len(ordered) * 0.95)] * 1000,
+    }
+
+
+def make_pipeline(root: str, texts: List[str], model: str) -> RAGPipeline:
+    rag = RAGPipeline(
+        docs_dir=f"{root}/docs",
+        embeddings_dir=f"{root}/embeddings",
+        executor=BoundedExecutor(max_workers=2),
+    )
+    if model:
+        from sentence_transformers import SentenceTransformer
+        rag.embedding_model = SentenceTransformer(model)
+    else:
+        rag.embedding_model = SimpleTextEmbedder()
+    rag.chroma_client = chromadb.PersistentClient(path=f"{root}/embeddings")
+    rag.collection = rag.chroma_client.get_or_create_collection(rag.collection_name)
+
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    for start in range(0, len(texts), 1000):
+        batch = texts[start:start + 1000]
+        rag.collection.upsert(
+            ids=ids[start:start + 1000],
+            documents=batch,
+            embeddings=rag.embedding_model.encode(batch).tolist(),
+            metadatas=[{"source": "synthetic"} for _ in batch],
+        )
+    rag._rebuild_lexical_index()
+    return rag
+
+
+async def evaluate(rag: RAGPipeline, queries: List[Tuple[str, int]], k: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for mode in ("vector", "bm25", "hybrid"):
+        hits, latencies = 0, []
+        rag.hybrid_search = mode == "hybrid"
+        rag.query_cache.clear()  # every mode pays for its query embeddings
+        for query, target in queries:
+            start = time.perf_counter()
+            if mode == "bm25":
+                found = [doc_id for doc_id, _ in rag.lexical_index.search(query, k)]
+            else:
+                found = [result["id"] for result in await rag.search(query, n_results=k)]
+            latencies.append(time.perf_counter() - start)
+            hits += f"chunk-{target}" in found
+        results[mode] = {"recall": hits / len(queries), **percentiles(latencies)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--model", default="", help="SentenceTransformer model name (default: SimpleTextEmbedder)")
+    args = parser.parse_args()
+
+    texts, queries = make_corpus(args.chunks, args.queries)
+
+    # The lexical index on its own: build time, size and query latency
+    index = BM25Index()
+    start = time.perf_counter()
+    index.add_many([f"chunk-{i}" for i in range(len(texts))], texts)
+    build_s = time.perf_counter() - start
+    latencies = []
+    for query, _ in queries:
+        start = time.perf_counter()
+        index.search(query, args.k)
+        latencies.append(time.perf_counter() - start)
+    stats = index.get_stats()
+    index_latency = percentiles(latencies)
+    print(
+        f"BM25 index: {stats['documents']} chunks, {stats['terms']} terms, {stats['postings']} postings "
+        f"({stats['postings_bytes'] / 1e6:.1f} MB), built in {build_s:.2f}s; "
+        f"search p50 {index_latency['p50']:.2f} ms, p95 {index_latency['p95']:.2f} ms"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = make_pipeline(tmp, texts, args.model)
+        results = asyncio.run(evaluate(rag, queries, args.k))
+        rag.executor.shutdown()
+        rag.ingest_executor.shutdown()
+
+    print(f"{len(queries)} exact-term queries over {args.chunks} chunks, k={args.k}")
+    print(f"{'mode':<8} {f'recall@{args.k}':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8} {result['recall']:>10.3f} {result['p50']:>10.2f} {result['p95']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark for the fallback SimpleTextEmbedder.
+
+Compares the vectorized encoder with the previous per-text implementation
+(kept here as a reference) on synthetic document chunks, checks that both
+produce the same features, and reports texts per second.
+
+Usage (from the agent-api directory):
+    python -m benchmarks.bench_simple_embedder
+    python -m benchmarks.bench_simple_embedder --texts 20000 --batch-size 256 --repeats 10
+"""
+
+import argparse
+import random
+import re
+import time
+from typing import List
+
+import numpy as np
+
+from app.chatbot.rag import SimpleTextEmbedder
+
+WORDS = (
+    "budget savings save emergency fund interest rate credit score debt loan invest investment "
+    "stocks bonds bank money financial retirement inflation income expenses 401k 15% $250 the and of to"
+).split()
+
+
+class LegacySimpleTextEmbedder:
+    """The previous implementation: a Python loop over texts returning lists."""
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for text in texts:
+            text_lower = text.lower()
+            features = [
+                len(text),
+                len(text.split()),
+                text.count('.'),
+                text.count('$'),
+                text.count('%'),
+                len(re.findall(r'\d+', text)),
+                len(set(text_lower.split())),
+                text_lower.count('budget'),
+                text_lower.count('save'),
+                text_lower.count('invest'),
+                text_lower.count('debt'),
+                text_lower.count('money'),
+                text_lower.count('financial'),
+                text_lower.count('credit'),
+                text_lower.count('loan'),
+                text_lower.count('bank'),
+            ]
+            max_vals = [1000, 200, 20, 10, 10, 50, 100] + [20] * 9
+            normalized = [min(f / max_val, 1.0) for f, max_val in zip(features, max_vals)]
+            while len(normalized) < 32:
+                normalized.append(0.0)
+            embeddings.append(normalized[:32])
+        return embeddings
+
+
+def make_texts(count: int, words: int) -> List[str]:
+    rng = random.Random(42)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words))) + "."
+        for _ in range(count)
+    ]
+
+
+def throughput(encode, texts: List[str], batch_size: int, repeats: int) -> float:
+    """Best texts per second over ``repeats`` passes."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            encode(texts[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=180, help="maximum words per text (about one chunk)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.words)
+    legacy, vectorized = LegacySimpleTextEmbedder(), SimpleTextEmbedder()
+
+    expected = np.array(legacy.encode(texts[:500]), dtype=np.float32)
+    actual = vectorized.encode(texts[:500])
+    assert actual.shape == expected.shape and np.allclose(actual, expected), "feature mismatch"
+
+    results = {
+        "legacy": throughput(legacy.encode, texts, args.batch_size, args.repeats),
+        "vectorized": throughput(vectorized.encode, texts, args.batch_size, args.repeats),
+    }
+
+    print(f"{args.texts} texts of up to {args.words} words, batch size {args.batch_size}")
+    print(f"{'encoder':<12} {'texts/s':>12}")
+    for name, rate in results.items():
+        print(f"{name:<12} {rate:>12.0f}")
+    print(f"Speedup: {results['vectorized'] / results['legacy']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Microbenchmark for the shared topic matcher.
+
+Compares the single-pass TopicMatcher with the previous code paths (kept
+here as references): the English keyword loops of
+ConversationMemory._extract_topics over the joined history, and the Spanish
+substring scan of get_suggestions_for_topic. Also times a substring-scan
+baseline over the same bilingual keyword tables, so speed is compared at
+equal coverage, and checks each approach against a small labeled set of
+English and Spanish messages.
+
+Usage (from the agent-api directory):
+    python -m benchmarks.bench_topics
+    python -m benchmarks.bench_topics --messages 2000 --session-length 50 --repeats 10
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Set
+
+from app.chatbot.lexical import fold_accents
+from app.chatbot.topics import TOPIC_KEYWORDS, topic_matcher
+
+WORDS = (
+    "quiero saber como puedo hacer un plan para el mes que viene y the best way to plan my month "
+    "presupuesto gastos ahorrar dinero deuda tarjeta de credito inversión acciones jubilación impuestos "
+    "budget expenses save money debt loan invest stocks retirement taxes insurance hello thanks"
+).split()
+
+# (message, expected topics)
+LABELED = [
+    ("¿Cómo hago mi primer presupuesto?", {"budget"}),
+    ("Mira, quiero empezar a ahorrar", {"saving"}),
+    ("¿Cómo mejoro mi puntaje de crédito?", {"credit_score"}),
+    ("¿Conviene invertir en fondos indexados?", {"investing"}),
+    ("¿Cuándo debo pagar mis impuestos?", {"debt", "taxes"}),
+    ("Quiero jubilarme a los 60", {"retirement"}),
+    ("How do I build an emergency fund?", {"saving"}),
+    ("Should I pay off my credit card or invest?", {"credit_score", "investing"}),
+    ("What is a Roth IRA?", {"retirement"}),
+    ("I got a syntax error in the app", set()),
+    ("Hola, ¿qué tal la primavera?", set()),
+    ("¿Necesito un seguro de vida?", {"insurance"}),
+]
+
+LEGACY_KEYWORDS = {
+    "budget": ["budget", "budgeting", "expenses", "income"],
+    "saving": ["save", "savings", "emergency fund", "money"],
+    "investing": ["invest", "investment", "stocks", "bonds", "portfolio"],
+    "debt": ["debt", "loan", "credit", "mortgage", "payment"],
+    "credit_score": ["credit score", "credit report", "credit card"],
+    "retirement": ["retirement", "401k", "ira", "pension"],
+    "insurance": ["insurance", "coverage", "premium", "policy"],
+    "taxes": ["tax", "taxes", "deduction", "refund"],
+}
+LEGACY_SUGGESTION_KEYS = ["presupuesto", "ahorro", "inversion", "deuda", "credito"]
+
+
+def legacy_extract_topics(history: List[Dict[str, str]]) -> List[str]:
+    """The previous ConversationMemory._extract_topics."""
+    topics = set()
+    all_text = " ".join([msg["content"].lower() for msg in history])
+    for topic, keywords in LEGACY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in all_text:
+                topics.add(topic)
+                break
+    return list(topics)
+
+
+def legacy_suggestion_key(message: str) -> str:
+    """The previous get_suggestions_for_topic lookup."""
+    message = message.lower()
+    for key in LEGACY_SUGGESTION_KEYS:
+        if key in message:
+            return key
+    return ""
+
+
+FOLDED_KEYWORDS = {
+    topic: [fold_accents(keyword.rstrip("*")) for keyword in keywords]
+    for topic, keywords in TOPIC_KEYWORDS.items()
+}
+
+
+def substring_topics(text: str) -> Set[str]:
+    """The same bilingual tables matched with one substring scan per keyword."""
+    text = fold_accents(text)
+    return {
+        topic
+        for topic, keywords in FOLDED_KEYWORDS.items()
+        if any(keyword in text for keyword in keywords)
+    }
+
+
+def make_messages(count: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) for _ in range(count)]
+
+
+def best_us(func: Callable[[], object], calls: int, repeats: int) -> float:
+    """Best microseconds per call over ``repeats`` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--session-length", type=int, default=40, help="messages per session history")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    histories = [
+        [{"role": "user", "content": text} for text in messages[i:i + args.session_length]]
+        for i in range(0, len(messages), args.session_length)
+    ]
+
+    print(f"Labeled messages classified exactly right (of {len(LABELED)}):")
+    checks = {
+        "legacy": lambda text: set(legacy_extract_topics([{"content": text}])),
+        "substring": substring_topics,
+        "matcher": lambda text: set(topic_matcher.rank(text)),
+    }
+    for name, classify in checks.items():
+        correct = sum(classify(text) == expected for text, expected in LABELED)
+        print(f"  {name:<10} {correct:>3}")
+
+    print(f"\nPer message ({args.messages} messages of 5-40 words), us/call:")
+    per_message = {
+        "legacy suggestions": lambda: [legacy_suggestion_key(text) for text in messages],
+        "substring topics": lambda: [substring_topics(text) for text in messages],
+        "matcher topics": lambda: [topic_matcher.main_topic(text) for text in messages],
+    }
+    for name, func in per_message.items():
+        print(f"  {name:<20} {best_us(func, len(messages), args.repeats):>8.1f}")
+
+    print(f"\nPer session summary ({len(histories)} sessions of {args.session_length} messages), us/call:")
+    per_session = {
+        "legacy joined scan": lambda: [legacy_extract_topics(history) for history in histories],
+        "substring joined": lambda: [substring_topics(" ".join(m["content"] for m in history)) for history in histories],
+        "matcher joined": lambda: [
+            topic_matcher.count("\n".join(m["content"] for m in history)) for history in histories
+        ],
+        "matcher per message": lambda: [
+            [topic_matcher.count(m["content"]) for m in history] for history in histories
+        ],
+    }
+    for name, func in per_session.items():
+        print(f"  {name:<20} {best_us(func, len(histories), args.repeats):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+End-to-end load test for the chat API.
+
+Runs the real FastAPI app in-process (httpx ASGITransport, with the app's
+startup and shutdown) on its real RAG pipeline, conversation memory,
+prompt assembly and LocalLLM, in throwaway data directories seeded with
+data/docs. Only the model server is simulated: with ``--llm sim`` the
+native Ollama client talks to a fake Ollama whose timing follows a
+LatencyModel (time to first token growing with prompt length, then a
+fixed tokens-per-second rate, at most ``--server-parallel`` generations
+at once). ``--llm mock`` uses the built-in mock backend and ``--llm
+ollama`` a real server at OLLAMA_BASE_URL.
+
+Concurrent virtual users send a mix of /chat, /sessions/{id} and
+/documents/upload requests. The report has latency percentiles and
+throughput per endpoint, the /chat stage breakdown from its Server-Timing
+header, ingestion job durations and a /stats snapshot (admission queue
+waits, model client, memory, summarizer). With ``--output`` it is saved
+as JSON; ``--baseline`` compares against an earlier run and, with
+``--max-regression``, exits with status 1 when p95 latency or throughput
+got worse by more than that fraction, so CI can gate on it.
+
+Usage (from the agent-api directory):
+    HF_HUB_OFFLINE=1 python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 16 --requests 400 --output load.json
+    python -m benchmarks.load_test --tps 15 --first-token-ms 400 --baseline load.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+QUESTIONS = [
+    "¿Cómo creo mi primer presupuesto?",
+    "¿Qué es la regla 50/30/20?",
+    "¿Cuánto debería tener en un fondo de emergencia?",
+    "¿Conviene pagar primero la deuda de la tarjeta de crédito o ahorrar?",
+    "¿Cómo empiezo a invertir con poco dinero?",
+    "¿Qué es un fondo indexado?",
+    "How do I build an emergency fund?",
+    "Should I pay off my credit card or invest?",
+    "What is compound interest?",
+    "¿Cómo puedo reducir mis gastos mensuales?",
+]
+
+WORDS = (
+    "presupuesto ahorro gastos ingresos deuda interés inversión fondo emergencia crédito "
+    "budget savings expenses income debt interest investment fund emergency credit"
+).split()
+
+ANSWER_WORDS = (
+    "Para empezar, anota tus ingresos y gastos del mes, separa un porcentaje para el ahorro "
+    "y revisa cada semana si vas dentro del plan. Un fondo de emergencia cubre de tres a seis "
+    "meses de gastos esenciales."
+).split()
+
+
+class LatencyModel:
+    """Simulated model server timing.
+
+    A generation waits ``first_token_ms`` plus prompt processing at
+    ``prompt_tps`` tokens per second before its first token, then emits
+    ``output_tokens`` tokens at ``tps`` tokens per second. Every duration
+    varies by up to ``jitter`` either way.
+    """
+
+    def __init__(
+        self,
+        first_token_ms: float = 150.0,
+        prompt_tps: float = 1000.0,
+        tps: float = 40.0,
+        output_tokens: int = 80,
+        jitter: float = 0.1,
+        seed: int = 42,
+    ):
+        self.first_token_ms = first_token_ms
+        self.prompt_tps = prompt_tps
+        self.tps = tps
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def first_token_seconds(self, prompt_tokens: int) -> float:
+        return self._vary(self.first_token_ms / 1000 + prompt_tokens / self.prompt_tps)
+
+    def token_seconds(self) -> float:
+        return self._vary(1 / self.tps)
+
+    def completion_tokens(self) -> int:
+        return max(1, round(self._vary(self.output_tokens)))
+
+    def _vary(self, value: float) -> float:
+        return value * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+def simulated_ollama(model: LatencyModel, parallel: int) -> httpx.MockTransport:
+    """An httpx transport behaving like an Ollama server with ``parallel`` generation slots."""
+    slots = asyncio.Semaphore(parallel)
+
+    async def generate(path: str, prompt_tokens: int):
+        async with slots:
+            start = time.perf_counter()
+            await asyncio.sleep(model.first_token_seconds(prompt_tokens))
+            count = model.completion_tokens()
+            for i in range(count):
+                word = ANSWER_WORDS[i % len(ANSWER_WORDS)] + " "
+                if path == "/api/chat":
+                    line = {"message": {"role": "assistant", "content": word}, "done": False}
+                else:
+                    line = {"response": word, "done": False}
+                yield (json.dumps(line, ensure_ascii=False) + "\n").encode()
+                await asyncio.sleep(model.token_seconds())
+        # Free the slot before the last line: clients stop reading once they see it
+        yield (json.dumps({
+            "response": "", "done": True, "prompt_eval_count": prompt_tokens, "eval_count": count,
+            "eval_duration": int((time.perf_counter() - start) * 1e9), "load_duration": 0,
+        }) + "\n").encode()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": body.get("model", "llama3.2:latest")}]})
+        text = body.get("prompt") or " ".join(m.get("content", "") for m in body.get("messages", []))
+        if not text:
+            return httpx.Response(200, json={"done": True})
+        return httpx.Response(200, content=generate(request.url.path, len(text) // 4))
+
+    return httpx.MockTransport(handler)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    data = np.asarray(values)
+    return {
+        "count": len(values),
+        "mean": round(float(data.mean()), 1),
+        "p50": round(float(np.percentile(data, 50)), 1),
+        "p95": round(float(np.percentile(data, 95)), 1),
+        "p99": round(float(np.percentile(data, 99)), 1),
+        "max": round(float(data.max()), 1),
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for part in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = part.partition(";dur=")
+        if duration:
+            stages[name] = float(duration)
+    return stages
+
+
+def configure_environment(root: Path, args: argparse.Namespace) -> Path:
+    """Point every data directory of the app at a throwaway copy and set the load-related knobs."""
+    docs_dir = root / "docs"
+    shutil.copytree(Path(__file__).resolve().parent.parent / "data" / "docs", docs_dir)
+    os.environ.update({
+        "DOCS_DIR": str(docs_dir),
+        "EMBEDDINGS_DIR": str(root / "embeddings"),
+        "MEMORY_DIR": str(root / "memory"),
+        "MEMORY_BACKEND": args.memory_backend,
+        "QUERY_CACHE_DIR": "",
+        "LLM_MAX_IN_FLIGHT": str(args.max_in_flight),
+        "LLM_MAX_QUEUE": str(args.max_queue),
+        "LLM_BACKEND": "mock" if args.llm == "mock" else "ollama",
+    })
+    os.environ.pop("MEMORY_DB_PATH", None)
+    return docs_dir
+
+
+async def install_llm(args: argparse.Namespace) -> None:
+    """Create the app's LLM singleton, backed by the simulated server for ``--llm sim``."""
+    from app.chatbot import llm as llm_module
+
+    if args.llm != "sim":
+        await llm_module.get_llm()
+        return
+
+    latency = LatencyModel(args.first_token_ms, args.prompt_tps, args.tps, args.output_tokens, args.jitter, args.seed)
+    client = llm_module.OllamaClient(
+        model=os.getenv("OLLAMA_MODEL", "llama3.2"),
+        max_connections=max(args.max_in_flight, 1),
+        transport=simulated_ollama(latency, args.server_parallel),
+    )
+    llm_module._llm_instance = llm_module.LocalLLM(
+        backend="ollama",
+        ollama_client=client,
+        use_mock_fallback=False,
+        admission=llm_module.AdmissionController(max_in_flight=args.max_in_flight, max_queue=args.max_queue),
+    )
+    await llm_module._llm_instance.initialize()
+
+
+class LoadRunner:
+    """Virtual users sending a weighted mix of requests through one HTTP client."""
+
+    def __init__(self, client: httpx.AsyncClient, docs_dir: Path, args: argparse.Namespace):
+        self.client = client
+        self.docs_dir = docs_dir
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.sessions = [f"bench-{i:04d}" for i in range(args.sessions)]
+        self.active_sessions: List[str] = []
+        self.records: List[Dict[str, Any]] = []
+        self.job_ids: List[str] = []
+        self.uploads = 0
+
+    async def run(self, requests: int, record: bool = True) -> float:
+        operations = self.rng.choices(
+            ["chat", "session", "upload"],
+            weights=[self.args.chat_weight, self.args.session_weight, self.args.upload_weight],
+            k=requests,
+        )
+        queue: asyncio.Queue = asyncio.Queue()
+        for operation in operations:
+            queue.put_nowait(operation)
+
+        async def user():
+            while not queue.empty():
+                await self.request(queue.get_nowait(), record)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+        return time.perf_counter() - start
+
+    async def request(self, operation: str, record: bool) -> None:
+        if operation == "session" and not self.active_sessions:
+            operation = "chat"
+
+        start = time.perf_counter()
+        try:
+            if operation == "chat":
+                session_id = self.rng.choice(self.sessions)
+                response = await self.client.post("/api/v1/chat", json={
+                    "message": self.rng.choice(QUESTIONS),
+                    "session_id": session_id,
+                    "user_id": "bench",
+                })
+                if response.status_code == 200 and session_id not in self.active_sessions:
+                    self.active_sessions.append(session_id)
+            elif operation == "session":
+                response = await self.client.get(f"/api/v1/sessions/{self.rng.choice(self.active_sessions)}")
+            else:
+                response = await self.client.post("/api/v1/documents/upload", params={"file_path": self.write_document()})
+                if response.status_code == 200:
+                    self.job_ids.append(response.json()["job_id"])
+            status = response.status_code
+            stages = parse_server_timing(response.headers.get("Server-Timing", ""))
+        except Exception as e:
+            status = type(e).__name__
+            stages = {}
+
+        if record:
+            self.records.append({
+                "endpoint": operation,
+                "status": status,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "stages": stages,
+            })
+
+    def write_document(self) -> str:
+        self.uploads += 1
+        path = self.docs_dir / f"bench_upload_{self.uploads:04d}.txt"
+        text = "\n\n".join(
+            " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(60, 120)))
+            for _ in range(self.args.upload_paragraphs)
+        )
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    async def wait_for_jobs(self, timeout: float) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        jobs = []
+        for job_id in self.job_ids:
+            while True:
+                job = (await self.client.get(f"/api/v1/documents/jobs/{job_id}")).json()
+                if job.get("status") not in ("queued", "running") or time.monotonic() > deadline:
+                    break
+                await asyncio.sleep(0.1)
+            jobs.append(job)
+        return jobs
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint in ("chat", "session", "upload"):
+            records = [r for r in self.records if r["endpoint"] == endpoint]
+            if not records:
+                continue
+            ok = [r for r in records if r["status"] == 200]
+            stage_values: Dict[str, List[float]] = defaultdict(list)
+            for r in ok:
+                for stage, value in r["stages"].items():
+                    stage_values[stage].append(value)
+            endpoints[endpoint] = {
+                "requests": len(records),
+                "errors": len(records) - len(ok),
+                "status_codes": dict(Counter(str(r["status"]) for r in records)),
+                "throughput_rps": round(len(ok) / duration, 2),
+                "latency_ms": percentiles([r["latency_ms"] for r in ok]),
+                "stages_ms": {stage: percentiles(values) for stage, values in stage_values.items()},
+            }
+        return {
+            "duration_seconds": round(duration, 2),
+            "requests": len(self.records),
+            "throughput_rps": round(sum(r["status"] == 200 for r in self.records) / duration, 2),
+            "endpoints": endpoints,
+        }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: Optional[float]) -> List[str]:
+    """Print changes against a baseline run; returns the regressions beyond ``max_regression``."""
+    regressions = []
+    print("\nAgainst baseline:")
+    for endpoint, current in results["report"]["endpoints"].items():
+        previous = baseline.get("report", {}).get("endpoints", {}).get(endpoint)
+        if not previous or not previous["latency_ms"].get("count"):
+            continue
+        for metric, now, before, worse in (
+            ("p95 ms", current["latency_ms"].get("p95", 0), previous["latency_ms"]["p95"], 1),
+            ("rps", current["throughput_rps"], previous["throughput_rps"], -1),
+        ):
+            change = (now - before) / before if before else 0.0
+            print(f"  {endpoint:<8} {metric:<7} {before:>9.1f} -> {now:>9.1f} ({change:+.1%})")
+            if max_regression is not None and change * worse > max_regression:
+                regressions.append(f"{endpoint} {metric} {change:+.1%}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['requests']} requests in {report['duration_seconds']} s, {report['throughput_rps']} ok/s")
+    print(f"  {'endpoint':<9} {'ok/s':>7} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for endpoint, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"  {endpoint:<9} {stats['throughput_rps']:>7.2f} {stats['errors']:>7} "
+            f"{latency.get('p50', 0):>8.1f} {latency.get('p95', 0):>8.1f} "
+            f"{latency.get('p99', 0):>8.1f} {latency.get('max', 0):>8.1f}"
+        )
+    stages = report["endpoints"].get("chat", {}).get("stages_ms", {})
+    if stages:
+        print("\n  /chat stages (Server-Timing), ms:")
+        for stage, stats in stages.items():
+            print(f"    {stage:<10} mean {stats['mean']:>8.1f}  p95 {stats['p95']:>8.1f}")
+
+
+async def run(args: argparse.Namespace, docs_dir: Path) -> Dict[str, Any]:
+    from app.main import app
+
+    await install_llm(args)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            runner = LoadRunner(client, docs_dir, args)
+            if args.warmup:
+                await runner.run(args.warmup, record=False)
+            duration = await runner.run(args.requests)
+            jobs = await runner.wait_for_jobs(args.job_timeout)
+            stats = (await client.get("/api/v1/stats")).json()
+
+    report = runner.report(duration)
+    report["ingest_jobs"] = {
+        "jobs": len(jobs),
+        "statuses": dict(Counter(job.get("status") for job in jobs)),
+        "elapsed_ms": percentiles([job["elapsed_seconds"] * 1000 for job in jobs if job.get("status") == "completed"]),
+    }
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "report": report,
+        "stats": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10, help="requests sent before measuring")
+    parser.add_argument("--sessions", type=int, default=20, help="distinct chat sessions")
+    parser.add_argument("--chat-weight", type=float, default=0.8)
+    parser.add_argument("--session-weight", type=float, default=0.15)
+    parser.add_argument("--upload-weight", type=float, default=0.05)
+    parser.add_argument("--upload-paragraphs", type=int, default=5)
+    parser.add_argument("--job-timeout", type=float, default=120.0, help="seconds to wait for upload jobs")
+    parser.add_argument("--llm", choices=["sim", "mock", "ollama"], default="sim")
+    parser.add_argument("--first-token-ms", type=float, default=150.0)
+    parser.add_argument("--prompt-tps", type=float, default=1000.0, help="prompt tokens processed per second")
+    parser.add_argument("--tps", type=float, default=40.0, help="generated tokens per second")
+    parser.add_argument("--output-tokens", type=int, default=80)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--server-parallel", type=int, default=2, help="simulated server generation slots")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="LLM_MAX_IN_FLIGHT")
+    parser.add_argument("--max-queue", type=int, default=16, help="LLM_MAX_QUEUE")
+    parser.add_argument("--memory-backend", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    parser.add_argument("--max-regression", type=float, help="fail when p95 or throughput is this much worse")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs_dir = configure_environment(Path(tmp), args)
+        results = asyncio.run(run(args, docs_dir))
+
+    print_report(results["report"])
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\nRegressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
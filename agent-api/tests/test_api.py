@@ -1,5 +1,4 @@
 import pytest
-import asyncio
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch, AsyncMock
 import sys
@@ -9,6 +8,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from app.main import app
+from app.chatbot.llm import AdmissionController, LLMOverloaded
 
 
 class TestAPI:
@@ -24,21 +24,24 @@ class TestAPI:
         """Mock LLM for testing."""
         mock = AsyncMock()
         mock.is_available = True
+        mock.admission = AdmissionController()
         mock.generate_response.return_value = "This is a test response about budgeting."
         mock.health_check.return_value = {
             "status": "healthy",
             "model": "llama3.2",
             "response_time_seconds": 0.5,
         }
-        mock.get_model_info.return_value = {
+        mock.get_model_info = Mock(return_value={
             "model_name": "llama3.2",
             "is_available": True,
-        }
+        })
         return mock
     
     @pytest.fixture
     def mock_rag(self):
         """Mock RAG for testing."""
+        from app.chatbot.rag import RetrievalResult
+        
         mock = AsyncMock()
         mock.search.return_value = [
             {
@@ -47,6 +50,10 @@ class TestAPI:
                 "distance": 0.2,
             }
         ]
+        mock.retrieve.return_value = RetrievalResult(
+            "How do I create a budget?", mock.search.return_value
+        )
+        mock.find_cached_response.return_value = None
         mock.get_context_for_query.return_value = "Budgeting helps you track expenses and save money."
         mock.get_collection_stats.return_value = {
             "status": "healthy",
@@ -59,16 +66,22 @@ class TestAPI:
     def mock_memory(self):
         """Mock memory for testing."""
         mock = Mock()
-        mock.get_recent_context.return_value = "User: Hello\nAssistant: Hi there!"
-        mock.add_message = Mock()
-        mock.get_conversation_history.return_value = [
+        mock.aget_recent_context = AsyncMock(return_value="User: Hello\nAssistant: Hi there!")
+        mock.aadd_message = AsyncMock()
+        mock.aget_conversation_history = AsyncMock(return_value=[
             {"role": "user", "content": "Hello", "timestamp": "2025-01-01T00:00:00"},
             {"role": "assistant", "content": "Hi there!", "timestamp": "2025-01-01T00:00:01"},
-        ]
-        mock.delete_session.return_value = True
-        mock.get_session_summary.return_value = {
+        ])
+        mock.aget_summarized_history = AsyncMock(return_value=(None, [
+            {"role": "user", "content": "Hello", "timestamp": "2025-01-01T00:00:00"},
+            {"role": "assistant", "content": "Hi there!", "timestamp": "2025-01-01T00:00:01"},
+        ], 0))
+        mock.adelete_session = AsyncMock(return_value=True)
+        mock.alist_sessions = AsyncMock(return_value=[])
+        mock.get_stats.return_value = {"active_sessions": 2, "max_history": 50}
+        mock.aget_session_summary = AsyncMock(return_value={
             "metadata": {"created_at": "2025-01-01T00:00:00", "updated_at": "2025-01-01T00:00:01"}
-        }
+        })
         return mock
     
     def test_root_endpoint(self, client):
@@ -121,10 +134,89 @@ class TestAPI:
         assert "message" in data
         assert "session_id" in data
         assert len(data["session_id"]) > 0
+        assert data["sources"] == ["budgeting_basics.txt"]
+        stages = [part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")]
+        assert stages == ["history", "retrieval", "prompt", "cache", "llm", "store"]
         
         # Verify mocks were called
         mock_llm.generate_response.assert_called_once()
-        mock_memory.add_message.assert_called()
+        # Earlier turns are sent as chat history, the question last in the prompt
+        call = mock_llm.generate_response.call_args.kwargs
+        assert call["history"] == [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi there!"},
+        ]
+        assert call["prompt"].rstrip().endswith("How do I create a budget?")
+        mock_rag.retrieve.assert_called_once()
+        mock_rag.search.assert_not_called()
+        # The conversation goes along, so follow-ups never share cached answers
+        assert mock_rag.find_cached_response.call_args.args[2] == call["history"]
+        mock_memory.aadd_message.assert_awaited()
+    
+    @patch('app.routes.get_llm')
+    @patch('app.routes.get_rag')
+    @patch('app.routes.get_memory')
+    def test_chat_endpoint_overloaded(self, mock_get_memory, mock_get_rag, mock_get_llm,
+                                      client, mock_llm, mock_rag, mock_memory):
+        """Test that a request the LLM queue cannot admit gets a 503 with Retry-After."""
+        mock_get_llm.return_value = mock_llm
+        mock_get_rag.return_value = mock_rag
+        mock_get_memory.return_value = mock_memory
+        mock_llm.generate_response.side_effect = LLMOverloaded("Generation queue is full", retry_after=7)
+        
+        response = client.post("/api/v1/chat", json={"message": "How do I create a budget?"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "7"
+        assert "error" in response.json()
+        mock_memory.aadd_message.assert_not_awaited()
+    
+    @patch('app.routes.get_llm')
+    @patch('app.routes.get_rag')
+    @patch('app.routes.get_memory')
+    def test_chat_endpoint_response_cache_hit(self, mock_get_memory, mock_get_rag, mock_get_llm,
+                                              client, mock_llm, mock_rag, mock_memory):
+        """Test that a cached answer skips LLM generation."""
+        mock_get_llm.return_value = mock_llm
+        mock_get_rag.return_value = mock_rag
+        mock_get_memory.return_value = mock_memory
+        mock_rag.find_cached_response.return_value = "Cached answer about budgeting."
+        
+        response = client.post("/api/v1/chat", json={"message": "How do I create a budget?"})
+        assert response.status_code == 200
+        assert response.json()["message"] == "Cached answer about budgeting."
+        
+        mock_llm.generate_response.assert_not_called()
+        mock_rag.cache_response.assert_not_called()
+    
+    @patch('app.routes.get_llm')
+    @patch('app.routes.get_rag')
+    @patch('app.routes.get_memory')
+    def test_chat_stream_endpoint(self, mock_get_memory, mock_get_rag, mock_get_llm,
+                                  client, mock_llm, mock_rag, mock_memory):
+        """Test the streaming chat endpoint."""
+        mock_get_llm.return_value = mock_llm
+        mock_get_rag.return_value = mock_rag
+        mock_get_memory.return_value = mock_memory
+        
+        async def fake_stream(prompt, system_prompt=None, history=None):
+            for token in ["Budgeting ", "is ", "planning."]:
+                yield token
+        
+        mock_llm.generate_streaming_response = fake_stream
+        
+        response = client.post("/api/v1/chat/stream", json={"message": "How do I create a budget?"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = [block for block in response.text.split("\n\n") if block]
+        assert events[0].startswith("event: token")
+        assert events[-1].startswith("event: done")
+        
+        import json
+        done = json.loads(events[-1].split("data: ", 1)[1])
+        assert done["message"] == "Budgeting is planning."
+        assert done["sources"] == ["budgeting_basics.txt"]
+        assert mock_memory.aadd_message.await_count == 2
     
     @patch('app.routes.get_memory')
     def test_feedback_endpoint(self, mock_get_memory, client, mock_memory):
@@ -157,6 +249,17 @@ class TestAPI:
         assert "messages" in data
         assert data["session_id"] == "test_session_123"
     
+    @patch('app.routes.get_memory')
+    def test_list_sessions_endpoint(self, mock_get_memory, client, mock_memory):
+        """Test listing sessions for a user."""
+        mock_get_memory.return_value = mock_memory
+        mock_memory.alist_sessions.return_value = [{"session_id": "test_session_123", "user_id": "u1"}]
+        
+        response = client.get("/api/v1/sessions?user_id=u1")
+        assert response.status_code == 200
+        assert response.json()["count"] == 1
+        mock_memory.alist_sessions.assert_awaited_once_with(user_id="u1", limit=100)
+    
     @patch('app.routes.get_memory')
     def test_delete_session_endpoint(self, mock_get_memory, client, mock_memory):
         """Test deleting a conversation session."""
@@ -167,7 +270,32 @@ class TestAPI:
         
         data = response.json()
         assert "message" in data
-        mock_memory.delete_session.assert_called_once_with("test_session_123")
+        mock_memory.adelete_session.assert_awaited_once_with("test_session_123")
+    
+    @patch('app.routes.get_job_queue')
+    @patch('app.routes.get_rag')
+    def test_upload_returns_job_id(self, mock_get_rag, mock_get_queue, client, mock_rag):
+        """Test that uploads are queued as ingestion jobs."""
+        mock_get_rag.return_value = mock_rag
+        mock_get_queue.return_value.submit.return_value = {"job_id": "job-1", "status": "queued"}
+        
+        response = client.post("/api/v1/documents/upload?file_path=data/docs/new.txt")
+        assert response.status_code == 200
+        assert response.json()["job_id"] == "job-1"
+        assert mock_get_queue.return_value.submit.call_args[0][0] == "upload"
+    
+    @patch('app.routes.get_job_queue')
+    def test_get_ingest_job(self, mock_get_queue, client):
+        """Test polling an ingestion job and a missing job."""
+        mock_get_queue.return_value.get.side_effect = lambda job_id: (
+            {"job_id": job_id, "status": "running", "progress": {"chunks_embedded": 64}}
+            if job_id == "job-1" else None
+        )
+        
+        response = client.get("/api/v1/documents/jobs/job-1")
+        assert response.status_code == 200
+        assert response.json()["progress"]["chunks_embedded"] == 64
+        assert client.get("/api/v1/documents/jobs/unknown").status_code == 404
     
     @patch('app.routes.get_llm')
     @patch('app.routes.get_rag')
@@ -179,10 +307,6 @@ class TestAPI:
         mock_get_rag.return_value = mock_rag
         mock_get_memory.return_value = mock_memory
         
-        # Add session cache mock
-        mock_memory._session_cache = {"session1": [], "session2": []}
-        mock_memory.max_history = 50
-        
         response = client.get("/api/v1/stats")
         assert response.status_code == 200
         
@@ -190,6 +314,7 @@ class TestAPI:
         assert "rag" in data
         assert "llm" in data
         assert "memory" in data
+        assert data["memory"]["active_sessions"] == 2
         assert "version" in data
     
     @patch('app.routes.get_llm')
@@ -213,7 +338,7 @@ class TestAPI:
     def test_feedback_endpoint_session_not_found(self, mock_get_memory, client):
         """Test feedback endpoint with non-existent session."""
         mock_memory = Mock()
-        mock_memory.get_conversation_history.return_value = []
+        mock_memory.aget_conversation_history = AsyncMock(return_value=[])
         mock_get_memory.return_value = mock_memory
         
         feedback_request = {
@@ -0,0 +1,130 @@
+import pytest
+import asyncio
+import sys
+import os
+from unittest.mock import patch
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.cache import QueryEmbeddingCache, SemanticResponseCache, normalize_query
+from app.chatbot.rag import RAGPipeline, RetrievalResult
+
+
+class TestQueryEmbeddingCache:
+    """Test the query embedding cache."""
+
+    def test_normalize_query(self):
+        """Whitespace and case differences share a key."""
+        assert normalize_query("  ¿Cómo creo   mi PRIMER presupuesto? ") == "¿cómo creo mi primer presupuesto?"
+
+    def test_hit_and_miss_counters(self):
+        """Repeated queries are served from the cache."""
+        cache = QueryEmbeddingCache(max_size=10)
+        assert cache.get("model", "What is a budget?") is None
+        cache.put("model", "What is a budget?", [0.1, 0.2])
+
+        assert cache.get("model", "what is a  budget?") == [0.1, 0.2]
+        assert cache.get("other-model", "What is a budget?") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = QueryEmbeddingCache(max_size=2)
+        cache.put("model", "a", [1.0])
+        cache.put("model", "b", [2.0])
+        cache.get("model", "a")
+        cache.put("model", "c", [3.0])
+
+        assert cache.get("model", "a") == [1.0]
+        assert cache.get("model", "b") is None
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Entries older than the TTL are treated as misses."""
+        cache = QueryEmbeddingCache(ttl_seconds=10)
+        with patch("app.chatbot.cache.time.monotonic", return_value=100.0):
+            cache.put("model", "a", [1.0])
+        with patch("app.chatbot.cache.time.monotonic", return_value=111.0):
+            assert cache.get("model", "a") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Embeddings written to disk are found by a fresh cache."""
+        QueryEmbeddingCache(cache_dir=str(tmp_path)).put("model", "a", [1.0, 2.0])
+
+        cache = QueryEmbeddingCache(cache_dir=str(tmp_path))
+        assert cache.get("model", "a") == [1.0, 2.0]
+        assert cache.get_stats()["disk_hits"] == 1
+
+
+class TestSemanticResponseCache:
+    """Test the semantic response cache."""
+
+    def test_disabled_by_default(self):
+        """The cache is opt-in."""
+        cache = SemanticResponseCache()
+        cache.store("What is a budget?", [1.0, 0.0], "A plan for your money.")
+        assert cache.lookup([1.0, 0.0]) is None
+
+    def test_near_duplicate_hit(self):
+        """Questions above the similarity threshold share an answer."""
+        cache = SemanticResponseCache(enabled=True, similarity_threshold=0.95)
+        cache.store("What is a budget?", [1.0, 0.0], "A plan for your money.")
+
+        hit = cache.lookup([0.99, 0.05])
+        assert hit["response"] == "A plan for your money."
+        assert cache.lookup([0.0, 1.0]) is None
+
+    def test_answers_are_matched_within_one_embedder(self):
+        """Vectors from a different embedder, even of another size, are never compared."""
+        cache = SemanticResponseCache(enabled=True)
+        cache.store("What is a budget?", [1.0, 0.0], "A plan for your money.", embedder="all-MiniLM-L6-v2:st")
+
+        assert cache.lookup([1.0, 0.0, 0.0], embedder="all-MiniLM-L6-v2:simple") is None
+        assert cache.lookup([1.0, 0.0], embedder="other-model:st") is None
+        assert cache.lookup([1.0, 0.0], embedder="all-MiniLM-L6-v2:st")["response"] == "A plan for your money."
+
+    def test_clear_invalidates(self):
+        """Clearing drops all answers, e.g. after the knowledge base changes."""
+        cache = SemanticResponseCache(enabled=True)
+        cache.store("What is a budget?", [1.0, 0.0], "A plan for your money.")
+        cache.clear()
+
+        assert cache.lookup([1.0, 0.0]) is None
+        assert cache.get_stats()["invalidations"] == 1
+
+
+class TestPipelineResponseCache:
+    """Test when the RAG pipeline shares cached answers."""
+
+    def test_turns_with_history_skip_the_cache(self, tmp_path):
+        """A follow-up inside a conversation never reuses or stores a shared answer."""
+        rag = RAGPipeline(
+            docs_dir=str(tmp_path / "docs"),
+            embeddings_dir=str(tmp_path / "embeddings"),
+            response_cache=SemanticResponseCache(enabled=True),
+        )
+        retrieval = RetrievalResult("¿Y el segundo?", [], query_embedding=[1.0, 0.0])
+        history = [{"role": "user", "content": "¿Qué tarjetas de crédito conviene pagar primero?"}]
+
+        async def scenario():
+            await rag.cache_response(retrieval, "Answer for another conversation.", history=history)
+            stored_with_history = rag.response_cache.get_stats()["size"]
+            await rag.cache_response(retrieval, "Standalone answer.")
+            return (
+                stored_with_history,
+                await rag.find_cached_response(retrieval, history=history),
+                await rag.find_cached_response(retrieval),
+            )
+
+        stored_with_history, with_history, standalone = asyncio.run(scenario())
+        assert stored_with_history == 0
+        assert with_history is None
+        assert standalone == "Standalone answer."
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
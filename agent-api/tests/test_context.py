@@ -0,0 +1,140 @@
+import pytest
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.context import PromptAssembler, TokenCounter
+from app.chatbot.prompts import FinancialPromptTemplates
+
+
+def _chunk(content, source="budgeting_basics.txt"):
+    return {"content": content, "metadata": {"source": f"data/docs/{source}"}}
+
+
+BUDGET_CHUNK = "The 50/30/20 rule splits after-tax income into needs, wants and savings for every month."
+FUND_CHUNK = "An emergency fund should cover three to six months of essential living expenses."
+
+
+class TestTokenCounter:
+    """Test prompt token counting."""
+
+    def test_estimate_counts_word_pieces_and_punctuation(self):
+        """Long words count as several tokens and punctuation counts on its own."""
+        counter = TokenCounter()
+        assert counter.count("") == 0
+        assert counter.count("Ahorra dinero.") == 5  # ahor ra dine ro .
+
+
+class TestPromptAssembler:
+    """Test token-budgeted prompt assembly."""
+
+    def test_rag_content_is_sent_once(self):
+        """Retrieved chunks go in the main prompt only and the system prompt is static."""
+        assembler = PromptAssembler(TokenCounter(), max_prompt_tokens=2048)
+        result = assembler.assemble(
+            "¿Cómo hago un presupuesto?",
+            history=[{"role": "user", "content": "Hola"}, {"role": "assistant", "content": "¡Hola!"}],
+            chunks=[_chunk(BUDGET_CHUNK), _chunk(FUND_CHUNK, "emergency_fund.txt")],
+            user_context="Current balance: 1200",
+        )
+
+        assert result["system_prompt"] == FinancialPromptTemplates.SYSTEM_INSTRUCTIONS
+        assert BUDGET_CHUNK not in result["system_prompt"]
+        assert result["prompt"].count(BUDGET_CHUNK) == 1
+        assert result["prompt"].count("Current balance: 1200") == 1
+        assert "Source: emergency_fund.txt" in result["prompt"]
+        assert result["history"] == [{"role": "user", "content": "Hola"}, {"role": "assistant", "content": "¡Hola!"}]
+        assert "Hola" not in result["prompt"]
+        assert result["prompt"].rstrip().endswith("¿Cómo hago un presupuesto?")
+        assert result["tokens"]["total"] <= 2048
+
+    def test_duplicate_chunks_are_skipped(self):
+        """A chunk repeating content already packed is dropped."""
+        assembler = PromptAssembler(TokenCounter())
+        result = assembler.assemble(
+            "budget",
+            chunks=[_chunk(BUDGET_CHUNK), _chunk(BUDGET_CHUNK, "copy.txt"), _chunk(FUND_CHUNK)],
+        )
+
+        assert result["chunks_used"] == 2
+        assert result["duplicate_chunks"] == 1
+        assert "copy.txt" not in result["prompt"]
+
+    def test_budget_drops_lowest_ranked_chunks_and_oldest_messages(self):
+        """With a small budget, top chunks and the newest messages are kept."""
+        counter = TokenCounter()
+        history = [{"role": "user", "content": f"Pregunta número {i} sobre ahorro"} for i in range(20)]
+        chunks = [_chunk(f"Chunk {i}: " + FUND_CHUNK, f"doc{i}.txt") for i in range(10)]
+        fixed = counter.count(FinancialPromptTemplates.SYSTEM_INSTRUCTIONS) + counter.count(
+            FinancialPromptTemplates.format_chat_prompt("ahorro", " ", "")
+        )
+        assembler = PromptAssembler(counter, max_prompt_tokens=fixed + 150, rag_share=0.6)
+
+        result = assembler.assemble("ahorro", history=history, chunks=chunks)
+
+        assert 0 < result["chunks_used"] < 10
+        assert "doc0.txt" in result["prompt"]
+        kept = [message["content"] for message in result["history"]]
+        assert 0 < result["messages_used"] < 20
+        assert kept[-1] == "Pregunta número 19 sobre ahorro"
+        assert "Pregunta número 0 sobre ahorro" not in kept
+        assert result["tokens"]["rag"] + result["tokens"]["history"] <= 150
+        assert assembler.get_stats()["dropped_messages"] == result["messages_dropped"]
+
+    def test_history_window_start_is_stable(self):
+        """As a long conversation grows, the oldest kept message only moves in steps."""
+        counter = TokenCounter()
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"Mensaje número {i} sobre ahorro"}
+            for i in range(40)
+        ]
+        fixed = counter.count(FinancialPromptTemplates.SYSTEM_INSTRUCTIONS) + counter.count(
+            FinancialPromptTemplates.format_chat_prompt("ahorro", " ", "")
+        )
+        assembler = PromptAssembler(counter, max_prompt_tokens=fixed + 150, history_step=4)
+
+        starts = []
+        for length in range(24, 41, 2):
+            result = assembler.assemble("ahorro", history=history[:length])
+            starts.append(result["history"][0]["content"])
+            assert result["history"][-1] == {"role": history[length - 1]["role"], "content": history[length - 1]["content"]}
+            assert result["tokens"]["history"] <= 150
+
+        # Each start is kept for at least one more turn before moving on
+        assert len(set(starts)) <= len(starts) // 2 + 1
+        assert all(int(start.split()[2]) % 4 == 0 for start in starts)
+
+    def test_summary_leads_the_history(self):
+        """A stored conversation summary is the first history turn and counts against the budget."""
+        assembler = PromptAssembler(TokenCounter())
+        result = assembler.assemble(
+            "¿Y cuánto debería ahorrar?",
+            history=[{"role": "user", "content": "Gano 2000 al mes"}],
+            summary="El usuario quiere armar su primer presupuesto.",
+        )
+
+        assert result["history"][0] == {
+            "role": "system",
+            "content": FinancialPromptTemplates.format_summary_turn("El usuario quiere armar su primer presupuesto."),
+        }
+        assert result["history"][1]["content"] == "Gano 2000 al mes"
+        assert result["messages_used"] == 1
+        assert result["tokens"]["summary"] > 0
+        assert result["tokens"]["total"] > result["tokens"]["summary"] + result["tokens"]["history"]
+
+    def test_system_messages_are_not_history(self):
+        """Feedback notes stored as system messages are left out of the prompt."""
+        assembler = PromptAssembler(TokenCounter())
+        result = assembler.assemble(
+            "hola",
+            history=[{"role": "system", "content": "User provided feedback: helpful"}],
+        )
+
+        assert "feedback" not in result["prompt"]
+        assert result["messages_used"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,50 @@
+import pytest
+import asyncio
+import threading
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.executor import BoundedExecutor
+
+
+class TestBoundedExecutor:
+    """Test the bounded executor used for blocking RAG work."""
+
+    def test_runs_off_the_event_loop(self):
+        """Blocking functions run in a worker thread."""
+        executor = BoundedExecutor(max_workers=1)
+
+        async def main():
+            return await executor.run(threading.current_thread)
+
+        worker = asyncio.run(main())
+        assert worker is not threading.main_thread()
+        assert executor.get_stats()["completed"] == 1
+        executor.shutdown()
+
+    def test_queue_depth_is_bounded(self):
+        """Callers beyond the worker and queue slots wait for capacity."""
+        executor = BoundedExecutor(max_workers=1, max_queue_size=1)
+        release = threading.Event()
+
+        async def main():
+            tasks = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            stats = executor.get_stats()
+            release.set()
+            await asyncio.gather(*tasks)
+            return stats
+
+        stats = asyncio.run(main())
+        assert stats["active"] == 1
+        assert stats["queue_depth"] == 1
+        assert stats["waiting_for_slot"] == 1
+        assert executor.get_stats()["completed"] == 3
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
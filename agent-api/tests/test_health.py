@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, Mock, patch
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.main import app
+from app.chatbot.health import HealthMonitor
+
+
+def _components(llm_status="healthy", rag_status="healthy"):
+    llm = Mock()
+    llm.ping = AsyncMock(return_value={"status": llm_status})
+    rag = Mock()
+    rag.health_check = AsyncMock(return_value={"status": rag_status, "total_documents": 3})
+    return AsyncMock(return_value=llm), AsyncMock(return_value=rag)
+
+
+class TestHealthMonitor:
+    """Test the background health prober."""
+
+    def test_not_ready_before_first_probe(self):
+        """Readiness is false until a probe has run."""
+        readiness = HealthMonitor().readiness()
+        assert not readiness["ready"]
+        assert readiness["stale"]
+
+    def test_refresh_uses_cheap_probes(self):
+        """A refresh pings the LLM and counts documents instead of generating."""
+        get_llm, get_rag = _components()
+        with patch("app.chatbot.health.get_llm", get_llm), patch("app.chatbot.health.get_rag", get_rag):
+            readiness = asyncio.run(HealthMonitor().refresh())
+
+        assert readiness["ready"]
+        assert readiness["rag"]["total_documents"] == 3
+        get_llm.return_value.ping.assert_awaited_once()
+
+    def test_unhealthy_component_is_not_ready(self):
+        """A failing LLM probe makes the service not ready."""
+        get_llm, get_rag = _components(llm_status="error")
+        monitor = HealthMonitor()
+        with patch("app.chatbot.health.get_llm", get_llm), patch("app.chatbot.health.get_rag", get_rag):
+            readiness = asyncio.run(monitor.refresh())
+
+        assert not readiness["ready"]
+        assert monitor.get_stats()["failures"] == 1
+
+    def test_stale_state_is_not_ready(self):
+        """Readiness expires if the prober stops refreshing."""
+        get_llm, get_rag = _components()
+        monitor = HealthMonitor(interval_seconds=10)
+        with patch("app.chatbot.health.get_llm", get_llm), patch("app.chatbot.health.get_rag", get_rag):
+            asyncio.run(monitor.refresh())
+
+        with patch("app.chatbot.health.time.monotonic", return_value=monitor._last_checked + 31):
+            assert not monitor.readiness()["ready"]
+
+
+class TestProbeEndpoints:
+    """Test the liveness and readiness endpoints."""
+
+    @pytest.fixture
+    def client(self):
+        """Create a test client."""
+        return TestClient(app)
+
+    def test_live_endpoint(self, client):
+        """Liveness does not depend on the LLM or RAG."""
+        response = client.get("/api/v1/live")
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+
+    @patch('app.routes.get_health_monitor')
+    def test_ready_endpoint(self, mock_get_monitor, client):
+        """Readiness returns 503 until the cached state is healthy."""
+        monitor = HealthMonitor()
+        mock_get_monitor.return_value = monitor
+        assert client.get("/api/v1/ready").status_code == 503
+
+        get_llm, get_rag = _components()
+        with patch("app.chatbot.health.get_llm", get_llm), patch("app.chatbot.health.get_rag", get_rag):
+            asyncio.run(monitor.refresh())
+
+        response = client.get("/api/v1/ready")
+        assert response.status_code == 200
+        assert response.json()["ready"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+import pytest
+import asyncio
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.jobs import IngestJobQueue, JobQueueFull
+
+
+class TestIngestJobQueue:
+    """Test the ingestion job queue."""
+
+    def test_job_reports_progress_and_completes(self):
+        """A job's progress is visible while it runs and kept after it finishes."""
+        queue = IngestJobQueue()
+        gate = None
+
+        async def job(report):
+            report({"status": "running", "chunks_embedded": 10, "errors": []})
+            await gate.wait()
+            return {"status": "completed", "chunks_embedded": 20, "errors": [{"source": "a.txt", "error": "bad"}]}
+
+        async def main():
+            nonlocal gate
+            gate = asyncio.Event()
+            job_id = queue.submit("upload", job)["job_id"]
+            await asyncio.sleep(0.01)
+            running = queue.get(job_id)
+            gate.set()
+            await asyncio.sleep(0.01)
+            await queue.stop()
+            return running, queue.get(job_id)
+
+        running, finished = asyncio.run(main())
+        assert running["status"] == "running"
+        assert running["progress"]["chunks_embedded"] == 10
+        assert finished["status"] == "completed"
+        assert finished["progress"]["chunks_embedded"] == 20
+        assert finished["errors"][0]["source"] == "a.txt"
+
+    def test_concurrency_is_bounded(self):
+        """With one worker, a second job waits until the first is done."""
+        queue = IngestJobQueue(max_workers=1)
+        active, peak = 0, 0
+
+        async def job(report):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return {"status": "completed"}
+
+        async def main():
+            ids = [queue.submit("sync", job)["job_id"] for _ in range(3)]
+            await asyncio.sleep(0)
+            statuses = [queue.get(job_id)["status"] for job_id in ids]
+            await queue._queue.join()
+            await queue.stop()
+            return statuses
+
+        statuses = asyncio.run(main())
+        assert statuses == ["running", "queued", "queued"]
+        assert peak == 1
+        assert queue.get_stats()["completed"] == 3
+
+    def test_full_queue_and_failures(self):
+        """Submissions beyond the queue limit are rejected and job errors are recorded."""
+        queue = IngestJobQueue(max_workers=1, max_queued=1)
+
+        async def failing(report):
+            raise RuntimeError("disk full")
+
+        async def main():
+            job_id = queue.submit("upload", failing)["job_id"]
+            with pytest.raises(JobQueueFull):
+                queue.submit("upload", failing)
+            await queue._queue.join()
+            await queue.stop()
+            return queue.get(job_id)
+
+        job = asyncio.run(main())
+        assert job["status"] == "failed"
+        assert job["errors"][0]["error"] == "disk full"
+
+
+    def test_partial_and_failed_results(self):
+        """Results reporting some or all items failed keep that status and their errors."""
+        queue = IngestJobQueue(max_workers=1)
+        errors = [{"source": "docs/a.txt", "error": "unreadable"}]
+
+        def job(status):
+            async def run(report):
+                return {"status": status, "files_failed": 1, "errors": errors}
+            return run
+
+        async def main():
+            ids = [queue.submit("sync", job(status))["job_id"] for status in ("partial", "failed")]
+            await queue._queue.join()
+            await queue.stop()
+            return [queue.get(job_id) for job_id in ids]
+
+        partial, failed = asyncio.run(main())
+        assert partial["status"] == "partial"
+        assert failed["status"] == "failed"
+        assert partial["errors"] == errors and failed["errors"] == errors
+        stats = queue.get_stats()
+        assert (stats["completed"], stats["partial"], stats["failed"]) == (0, 1, 1)
+
+
+    def test_stop_cancels_queued_jobs(self):
+        """Jobs still waiting when the queue stops are reported as cancelled."""
+        queue = IngestJobQueue(max_workers=1)
+
+        async def slow(report):
+            await asyncio.sleep(10)
+            return {"status": "completed"}
+
+        async def main():
+            ids = [queue.submit("sync", slow)["job_id"] for _ in range(2)]
+            await asyncio.sleep(0)
+            await queue.stop()
+            return [queue.get(job_id) for job_id in ids]
+
+        running, waiting = asyncio.run(main())
+        assert running["status"] == "cancelled"
+        assert waiting["status"] == "cancelled"
+        assert waiting["finished_at"] is not None
+        assert not queue._funcs
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+class TestTokenize:
+    """Test lexical tokenization."""
+
+    def test_exact_financial_terms_stay_whole(self):
+        """Ratios, account types and decimals are single terms."""
+        assert tokenize("Use the 50/30/20 rule, a 401(k), a CD or an IRA at 3.5%") == [
+            "use", "50/30/20", "rule", "401k", "cd", "ira", "3.5",
+        ]
+
+    def test_accents_and_stopwords(self):
+        """Spanish text is accent-folded and common words are dropped."""
+        assert tokenize("¿Cuál es la mejor inversión para el ahorro?") == ["cual", "mejor", "inversion", "ahorro"]
+
+
+class TestBM25Index:
+    """Test the BM25 inverted index."""
+
+    def _index(self):
+        index = BM25Index()
+        index.add_many(
+            ["ira", "cd", "rule", "save"],
+            [
+                "Open a Roth IRA or a traditional IRA for retirement.",
+                "A CD is a certificate of deposit with a fixed term.",
+                "The 50/30/20 rule splits your income.",
+                "Save part of your income every month.",
+            ],
+        )
+        return index
+
+    def test_rare_terms_rank_first(self):
+        """Exact matches on rare terms are found and ranked by score."""
+        index = self._index()
+
+        assert index.search("what is an IRA?")[0][0] == "ira"
+        assert [doc_id for doc_id, _ in index.search("50/30/20 income")] == ["rule", "save"]
+        assert index.search("mortgage") == []
+
+    def test_replace_and_remove(self):
+        """Re-adding an ID replaces its terms and removed IDs are never returned."""
+        index = self._index()
+        index.add_many(["cd"], ["Certificates of deposit lock your money."])
+        assert index.search("fixed term") == []
+        assert index.remove_many(["ira", "unknown"]) == 1
+        assert index.search("ira") == []
+        assert len(index) == 3
+        assert index.get_stats()["tombstones"] == 2
+
+    def test_compaction_keeps_results(self):
+        """Compacting drops tombstones without changing search results."""
+        index = self._index()
+        index.remove_many(["cd", "save"])
+        before = index.search("ira rule")
+
+        index.compact()
+
+        stats = index.get_stats()
+        assert stats["tombstones"] == 0
+        assert stats["documents"] == 2
+        assert index.search("ira rule") == before
+
+
+class TestReciprocalRankFusion:
+    """Test reciprocal rank fusion."""
+
+    def test_items_in_both_rankings_win(self):
+        """An ID ranked by both lists beats IDs ranked first by only one."""
+        fused = reciprocal_rank_fusion([["a", "b"], ["c", "b"]], k=60)
+
+        assert [doc_id for doc_id, _ in fused] == ["b", "a", "c"]
+        assert fused[0][1] == pytest.approx(2 / 62)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
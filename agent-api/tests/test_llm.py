@@ -0,0 +1,90 @@
+import pytest
+import asyncio
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.llm import AdmissionController, LLMOverloaded
+
+
+class TestAdmissionController:
+    """Test admission control in front of the LLM."""
+
+    def test_limits_concurrent_generations(self):
+        """No more than max_in_flight holders run at once; the rest wait their turn."""
+        admission = AdmissionController(max_in_flight=2, max_queue=8, queue_timeout=5)
+        running, peak = 0, 0
+
+        async def generate():
+            nonlocal running, peak
+            async with admission.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        async def main():
+            await asyncio.gather(*(generate() for _ in range(6)))
+
+        asyncio.run(main())
+        stats = admission.get_stats()
+        assert peak == 2
+        assert stats["admitted"] == 6
+        assert stats["in_flight"] == 0
+        assert stats["max_waiting"] == 4
+        assert stats["queue_wait_ms"]["p95"] > 0
+
+    def test_full_queue_is_rejected_immediately(self):
+        """Requests beyond the queue bound fail fast with a Retry-After hint."""
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+
+        async def hold(release):
+            async with admission.slot():
+                await release.wait()
+
+        async def main():
+            release = asyncio.Event()
+            holders = [asyncio.create_task(hold(release)) for _ in range(2)]
+            await asyncio.sleep(0.01)  # one running, one queued
+            with pytest.raises(LLMOverloaded) as error:
+                await admission.acquire()
+            release.set()
+            await asyncio.gather(*holders)
+            return error.value
+
+        error = asyncio.run(main())
+        assert error.retry_after >= 1
+        assert admission.get_stats()["rejected_queue_full"] == 1
+        assert admission.get_stats()["admitted"] == 2
+
+    def test_queue_wait_times_out(self):
+        """A queued request gives up after queue_timeout and frees its place in the queue."""
+        admission = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+
+        async def main():
+            release = asyncio.Event()
+
+            async def hold():
+                async with admission.slot():
+                    await release.wait()
+
+            holder = asyncio.create_task(hold())
+            await asyncio.sleep(0)
+            with pytest.raises(LLMOverloaded):
+                async with admission.slot():
+                    pass
+            waiting = admission.waiting
+            release.set()
+            await holder
+            return waiting
+
+        assert asyncio.run(main()) == 0
+        stats = admission.get_stats()
+        assert stats["rejected_timeout"] == 1
+        assert stats["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,311 @@
+import pytest
+import asyncio
+import json
+import threading
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.memory import ConversationMemory
+from app.chatbot.storage import JsonlSessionStorage, SessionStorage, SQLiteSessionStorage, import_json_sessions
+
+
+class TestConversationMemory:
+    """Test conversation memory persistence."""
+
+    def test_add_message_appends_one_line(self, tmp_path):
+        """Each message appends a single record to the session log."""
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("s1", "user", "Hello", user_id="u1")
+        memory.add_message("s1", "assistant", "Hi there!")
+
+        lines = (tmp_path / "session_s1.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line)["type"] for line in lines] == ["meta", "message", "message"]
+
+    def test_history_survives_restart(self, tmp_path):
+        """A new memory instance replays the log from disk."""
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("s1", "user", "¿Cómo creo un presupuesto?", user_id="u1")
+        memory.add_message("s1", "assistant", "Empieza por tus ingresos.")
+
+        reloaded = ConversationMemory(str(tmp_path))
+        history = reloaded.get_conversation_history("s1")
+        assert [msg["content"] for msg in history] == ["¿Cómo creo un presupuesto?", "Empieza por tus ingresos."]
+
+        summary = reloaded.get_session_summary("s1")
+        assert summary["metadata"]["user_id"] == "u1"
+        assert summary["metadata"]["message_count"] == 2
+
+    def test_append_after_truncated_last_line(self, tmp_path):
+        """A record appended after a crash mid-write starts on its own line and is not lost."""
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("s1", "user", "Hola")
+        memory.add_message("s1", "assistant", "¡Hola! ¿En qué te ayudo?")
+        memory.close()
+        session_file = tmp_path / "session_s1.jsonl"
+        session_file.write_bytes(session_file.read_bytes()[:-15])
+
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("s1", "user", "¿Cómo ahorro?")
+        memory.close()
+
+        history = ConversationMemory(str(tmp_path)).get_conversation_history("s1")
+        assert [msg["content"] for msg in history] == ["Hola", "¿Cómo ahorro?"]
+
+    def test_derived_state_follows_adds_and_trims(self, tmp_path):
+        """Summaries and recent context are kept up to date as messages are added and trimmed."""
+        memory = ConversationMemory(str(tmp_path), max_history=4, context_window=3)
+        texts = [
+            ("user", "¿Cómo hago un presupuesto?"),
+            ("assistant", "Anota tus ingresos."),
+            ("user", "¿Y para ahorrar?"),
+            ("assistant", "Guarda el 10% de tus ingresos."),
+            ("user", "¿Debo invertir en acciones?"),
+            ("assistant", "Primero arma un fondo de emergencia."),
+        ]
+        for role, content in texts:
+            memory.add_message("s1", role, content)
+
+        summary = memory.get_session_summary("s1")
+        assert summary["message_count"] == 4
+        assert summary["user_message_count"] == 2
+        assert summary["assistant_message_count"] == 2
+        # The first exchange was trimmed, so budget is left with one mention
+        assert summary["topics"] == ["saving", "investing", "budget"]
+        assert summary["metadata"]["message_count"] == 6
+
+        history = memory.get_conversation_history("s1")
+        expected = "\n".join(f"{m['role'].title()}: {m['content']}" for m in history[-2:])
+        assert memory.get_recent_context("s1", max_messages=2) == expected
+        # Wider than the pre-rendered window, or limited by characters
+        expected = "\n".join(f"{m['role'].title()}: {m['content']}" for m in history)
+        assert memory.get_recent_context("s1", max_messages=10) == expected
+        assert memory.get_recent_context("s1", max_messages=3, max_chars=60) == "Assistant: Primero arma un fondo de emergencia."
+
+        # Reloading rebuilds the same state from storage
+        reloaded = ConversationMemory(str(tmp_path), max_history=4, context_window=3)
+        assert reloaded.get_session_summary("s1")["topics"] == summary["topics"]
+        assert reloaded.get_recent_context("s1", max_messages=2) == memory.get_recent_context("s1", max_messages=2)
+
+    def test_log_is_compacted(self, tmp_path):
+        """The log is rewritten with only the retained history once it grows too long."""
+        memory = ConversationMemory(str(tmp_path), max_history=4)
+        for i in range(10):
+            memory.add_message("s1", "user", f"message {i}")
+
+        lines = (tmp_path / "session_s1.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) <= memory.compact_threshold
+        assert not list(tmp_path.glob("*.tmp"))
+
+        reloaded = ConversationMemory(str(tmp_path), max_history=4)
+        history = reloaded.get_conversation_history("s1")
+        assert [msg["content"] for msg in history] == [f"message {i}" for i in range(6, 10)]
+        assert reloaded.get_session_summary("s1")["metadata"]["message_count"] == 10
+
+    def test_legacy_session_is_migrated(self, tmp_path):
+        """Sessions in the old single-JSON layout are read once and converted."""
+        legacy = {
+            "session_id": "old",
+            "metadata": {"created_at": "2025-01-01T00:00:00", "user_id": "u1", "message_count": 1},
+            "messages": [{"role": "user", "content": "Hola", "timestamp": "2025-01-01T00:00:00", "metadata": {}}],
+        }
+        (tmp_path / "session_old.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("old", "assistant", "¡Hola!")
+
+        assert not (tmp_path / "session_old.json").exists()
+        reloaded = ConversationMemory(str(tmp_path))
+        assert [msg["content"] for msg in reloaded.get_conversation_history("old")] == ["Hola", "¡Hola!"]
+
+    def test_lru_eviction_by_session_count(self, tmp_path):
+        """Idle sessions are evicted once the cache is full and reload from disk."""
+        memory = ConversationMemory(str(tmp_path), max_cached_sessions=2)
+        for session_id in ["s1", "s2", "s3"]:
+            memory.add_message(session_id, "user", f"Hello from {session_id}")
+
+        stats = memory.get_stats()
+        assert stats["active_sessions"] == 2
+        assert stats["evictions"] == 1
+
+        history = memory.get_conversation_history("s1")
+        assert history[0]["content"] == "Hello from s1"
+        assert memory.get_stats()["cache_misses"] >= 1
+
+    def test_eviction_by_bytes(self, tmp_path):
+        """The cache stays under its byte budget."""
+        memory = ConversationMemory(str(tmp_path), max_cache_bytes=5000)
+        for i in range(10):
+            memory.add_message(f"s{i}", "user", "x" * 1000)
+
+        stats = memory.get_stats()
+        assert stats["resident_bytes"] <= 5000
+        assert stats["evictions"] > 0
+
+    def test_write_behind_coalesces_and_flushes(self, tmp_path):
+        """Buffered records reach disk on flush."""
+        memory = ConversationMemory(str(tmp_path), write_behind_seconds=60)
+        memory.add_message("s1", "user", "Hello")
+        memory.add_message("s1", "assistant", "Hi there!")
+
+        assert not (tmp_path / "session_s1.jsonl").exists()
+        assert memory.get_stats()["pending_writes"] == 3
+
+        memory.close()
+        reloaded = ConversationMemory(str(tmp_path))
+        assert len(reloaded.get_conversation_history("s1")) == 2
+
+
+class TestSessionStorage:
+    """Test the storage backend interface."""
+
+    def test_backends_must_implement_every_method(self):
+        """An incomplete backend fails when it is created, not on first use."""
+        class LoadOnly(SessionStorage):
+            def load(self, session_id, max_history):
+                return None
+
+        with pytest.raises(TypeError):
+            SessionStorage()
+        with pytest.raises(TypeError):
+            LoadOnly()
+
+
+class TestSQLiteSessionStorage:
+    """Test the SQLite storage backend."""
+
+    def _memory(self, tmp_path, **kwargs):
+        storage = SQLiteSessionStorage(str(tmp_path / "memory.db"))
+        return ConversationMemory(str(tmp_path), storage=storage, **kwargs)
+
+    def test_history_survives_restart(self, tmp_path):
+        """Messages and metadata are read back by a new instance."""
+        memory = self._memory(tmp_path)
+        memory.add_message("s1", "user", "Hola", user_id="u1")
+        memory.add_message("s1", "assistant", "¡Hola! ¿En qué te ayudo?")
+        memory.close()
+
+        reloaded = self._memory(tmp_path)
+        assert [msg["role"] for msg in reloaded.get_conversation_history("s1")] == ["user", "assistant"]
+        summary = reloaded.get_session_summary("s1")
+        assert summary["metadata"]["user_id"] == "u1"
+        assert summary["metadata"]["message_count"] == 2
+
+    def test_compaction_keeps_recent_history(self, tmp_path):
+        """Old rows are deleted once a session grows past the threshold."""
+        memory = self._memory(tmp_path, max_history=4)
+        for i in range(10):
+            memory.add_message("s1", "user", f"message {i}")
+        memory.close()
+
+        reloaded = self._memory(tmp_path, max_history=4)
+        history = reloaded.get_conversation_history("s1")
+        assert [msg["content"] for msg in history] == [f"message {i}" for i in range(6, 10)]
+        assert reloaded.get_session_summary("s1")["metadata"]["message_count"] == 10
+
+    def test_list_and_cleanup(self, tmp_path):
+        """Sessions can be listed per user and expired with one query."""
+        memory = self._memory(tmp_path)
+        memory.add_message("s1", "user", "a", user_id="u1")
+        memory.add_message("s2", "user", "b", user_id="u2")
+
+        assert [s["session_id"] for s in memory.list_sessions(user_id="u1")] == ["s1"]
+        assert memory.cleanup_old_sessions(days=30) == 0
+        assert memory.cleanup_old_sessions(days=-1) == 2
+        assert memory.list_sessions() == []
+        assert memory.get_conversation_history("s1") == []
+
+    def test_import_json_sessions(self, tmp_path):
+        """Existing JSON Lines and legacy JSON sessions are imported."""
+        json_memory = ConversationMemory(str(tmp_path))
+        json_memory.add_message("s1", "user", "Hola", user_id="u1")
+        legacy = {
+            "session_id": "old",
+            "metadata": {"created_at": "2025-01-01T00:00:00", "user_id": "u2", "message_count": 1},
+            "messages": [{"role": "user", "content": "Hi", "timestamp": "2025-01-01T00:00:00", "metadata": {}}],
+        }
+        (tmp_path / "session_old.json").write_text(json.dumps(legacy), encoding="utf-8")
+
+        storage = SQLiteSessionStorage(str(tmp_path / "memory.db"))
+        assert import_json_sessions(str(tmp_path), storage) == 2
+        assert (tmp_path / "session_old.json").exists()
+
+        memory = ConversationMemory(str(tmp_path), storage=storage)
+        assert memory.get_conversation_history("old")[0]["content"] == "Hi"
+        assert memory.get_session_summary("s1")["metadata"]["user_id"] == "u1"
+
+
+class TestAsyncMemoryAPI:
+    """Test the non-blocking memory API."""
+
+    def test_async_writer_persists_and_drains(self, tmp_path):
+        """Messages added through the async API are written by the background writer."""
+        async def scenario():
+            memory = ConversationMemory(str(tmp_path), write_queue_size=2)
+            for i in range(5):
+                await memory.aadd_message("s1", "user", f"message {i}", user_id="u1")
+            history = await memory.aget_conversation_history("s1")
+            assert len(history) == 5
+            await memory.aclose()
+            return memory
+
+        memory = asyncio.run(scenario())
+        assert memory.get_stats()["write_queue_depth"] == 0
+
+        reloaded = ConversationMemory(str(tmp_path))
+        assert [msg["content"] for msg in reloaded.get_conversation_history("s1")] == [
+            f"message {i}" for i in range(5)
+        ]
+
+    def test_async_eviction_never_writes_on_the_event_loop(self, tmp_path):
+        """Sessions evicted while the cache is over budget are written by the writer thread."""
+        storage = JsonlSessionStorage(str(tmp_path))
+        append = storage.append
+        writer_threads = []
+
+        def recording_append(session_id, records):
+            writer_threads.append(threading.current_thread())
+            return append(session_id, records)
+
+        storage.append = recording_append
+
+        async def scenario():
+            memory = ConversationMemory(str(tmp_path), storage=storage, max_cache_bytes=3000)
+            for i in range(12):
+                await memory.aadd_message(f"s{i % 3}", "user", "x" * 200)
+            await memory.adrain()
+            stats = memory.get_stats()
+            await memory.aclose()
+            return stats
+
+        stats = asyncio.run(scenario())
+        assert writer_threads and threading.main_thread() not in writer_threads
+        assert stats["evictions"] > 0
+        assert stats["resident_bytes"] <= 3000
+
+        reloaded = ConversationMemory(str(tmp_path))
+        assert len(reloaded.get_conversation_history("s0")) == 4
+
+    def test_async_reads_and_delete(self, tmp_path):
+        """Async reads match the sync API and deletes reach storage."""
+        ConversationMemory(str(tmp_path)).add_message("s1", "user", "Hola", user_id="u1")
+
+        async def scenario():
+            memory = ConversationMemory(str(tmp_path))
+            context = await memory.aget_recent_context("s1")
+            summary = await memory.aget_session_summary("s1")
+            deleted = await memory.adelete_session("s1")
+            await memory.aclose()
+            return context, summary, deleted
+
+        context, summary, deleted = asyncio.run(scenario())
+        assert context == "User: Hola"
+        assert summary["metadata"]["user_id"] == "u1"
+        assert deleted
+        assert not (tmp_path / "session_s1.jsonl").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
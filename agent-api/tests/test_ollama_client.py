@@ -0,0 +1,167 @@
+import pytest
+import asyncio
+import http.server
+import json
+import sys
+import os
+import threading
+import time
+
+import httpx
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.llm import LocalLLM
+from app.chatbot.ollama_client import OllamaClient, OllamaError
+
+
+def ollama_transport(requests, words=("Build ", "a ", "budget."), status_code=200, delay=0.0):
+    """An httpx transport answering /api/generate and /api/chat the way Ollama streams them."""
+    async def handler(request):
+        body = json.loads(request.content) if request.content else {}
+        requests.append((request.url.path, body))
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "llama3.2:latest"}]})
+        if status_code != 200:
+            return httpx.Response(status_code, json={"error": "model not found"})
+        if "prompt" not in body and "messages" not in body:
+            return httpx.Response(200, json={"done": True})
+        await asyncio.sleep(delay)
+        if request.url.path == "/api/chat":
+            lines = [{"message": {"role": "assistant", "content": word}, "done": False} for word in words]
+        else:
+            lines = [{"response": word, "done": False} for word in words]
+        lines.append({
+            "response": "", "done": True, "prompt_eval_count": 12, "eval_count": len(words),
+            "eval_duration": 500_000_000, "load_duration": 2_000_000_000,
+        })
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines) + "\n")
+
+    return httpx.MockTransport(handler)
+
+
+class TestOllamaClient:
+    """Test the native pooled Ollama client."""
+
+    def test_streams_generation_with_keep_alive(self):
+        """Text arrives chunk by chunk; every request streams and keeps the model loaded."""
+        requests = []
+        client = OllamaClient(keep_alive="1h", transport=ollama_transport(requests))
+
+        async def main():
+            chunks = [chunk async for chunk in client.astream("How do I budget?")]
+            full = await client.ainvoke("How do I budget?")
+            await client.aclose()
+            return chunks, full
+
+        chunks, full = asyncio.run(main())
+        assert chunks == ["Build ", "a ", "budget."]
+        assert full == "Build a budget."
+
+        path, body = requests[0]
+        assert path == "/api/generate"
+        assert body["stream"] is True
+        assert body["keep_alive"] == "1h"
+        assert body["options"]["num_predict"] == 1024
+
+        stats = client.get_stats()
+        assert stats["requests"] == 2
+        assert stats["prompt_tokens"] == 24
+        assert stats["completion_tokens"] == 6
+        assert stats["tokens_per_second"] == 6.0
+        assert stats["cold_loads"] == 2
+
+    def test_errors_and_total_timeout(self):
+        """HTTP errors and generations past the total timeout raise OllamaError."""
+        failing = OllamaClient(transport=ollama_transport([], status_code=404))
+        slow = OllamaClient(total_timeout=0.05, transport=ollama_transport([], delay=1.0))
+
+        with pytest.raises(OllamaError, match="404"):
+            asyncio.run(failing.ainvoke("hi"))
+        with pytest.raises(OllamaError, match="timed out"):
+            asyncio.run(slow.ainvoke("hi"))
+        assert slow.get_stats()["timeouts"] == 1
+
+    def test_new_event_loop_closes_the_old_client(self):
+        """A client left on another thread's running loop is closed there when a new loop takes over."""
+        closed = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = json.dumps({"models": [{"name": "llama3.2:latest"}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def finish(self):
+                super().finish()
+                closed.append(self.client_address)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        other_loop = asyncio.new_event_loop()
+        threading.Thread(target=other_loop.run_forever, daemon=True).start()
+        client = OllamaClient(base_url=f"http://127.0.0.1:{server.server_port}")
+        try:
+            models = asyncio.run_coroutine_threadsafe(client.list_models(), other_loop).result(timeout=5)
+            assert models == ["llama3.2:latest"]
+            first = client._client
+            assert asyncio.run(client.list_models()) == ["llama3.2:latest"]
+            assert client._client is not first
+            deadline = time.monotonic() + 2
+            while not (closed and first.is_closed) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert first.is_closed
+            assert len(closed) == 1
+        finally:
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            server.shutdown()
+            server.server_close()
+
+    def test_local_llm_uses_the_native_backend(self):
+        """LocalLLM warms the model on startup and sends chat messages through the native client."""
+        requests = []
+        client = OllamaClient(transport=ollama_transport(requests))
+        llm = LocalLLM(backend="ollama", ollama_client=client, use_mock_fallback=False)
+
+        async def main():
+            await llm.initialize()
+            response = await llm.generate_response(
+                "How do I budget?",
+                system_prompt="Be brief.",
+                history=[{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello!"}],
+            )
+            ping = await llm.ping()
+            await llm.aclose()
+            return response, ping
+
+        response, ping = asyncio.run(main())
+        assert llm.is_available and not llm.using_mock
+        assert response == "Build a budget."
+        assert ping["status"] == "healthy"
+        assert requests[0] == ("/api/generate", {"model": "llama3.2", "keep_alive": "30m"})
+        assert requests[1][0] == "/api/chat"
+        assert requests[1][1]["messages"] == [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello!"},
+            {"role": "user", "content": "How do I budget?"},
+        ]
+        assert llm.get_model_info()["client"]["requests"] == 1
+
+    def test_mock_backend_skips_ollama(self):
+        """The mock backend never contacts Ollama."""
+        llm = LocalLLM(backend="mock", use_mock_fallback=False)
+        assert asyncio.run(llm.initialize())
+        assert llm.using_mock
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,418 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+import uuid
+
+import numpy as np
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import chromadb
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.chatbot.executor import BoundedExecutor
+from app.chatbot.ingest import BulkIngestor
+from app.chatbot.manifest import IngestManifest
+from app.chatbot.rag import EmbeddingBatcher, RAGPipeline, SimpleTextEmbedder
+from app.chatbot.rerank import CrossEncoderReranker
+from tests.test_rerank import FakeCrossEncoder
+
+
+class TestSimpleTextEmbedder:
+    """Test the fallback text-feature embedder."""
+
+    def test_encode_returns_float32_array(self):
+        """Embeddings are an (n, 32) array, so .tolist() works for Chroma."""
+        embeddings = SimpleTextEmbedder().encode(["Save money.", "", "Pay off debt"])
+
+        assert isinstance(embeddings, np.ndarray)
+        assert embeddings.shape == (3, 32)
+        assert embeddings.dtype == np.float32
+        assert not embeddings[1].any()
+        assert len(embeddings.tolist()[0]) == 32
+
+    def test_empty_batch(self):
+        """An empty batch gives an empty (0, 32) array."""
+        assert SimpleTextEmbedder().encode([]).shape == (0, 32)
+
+    def test_features(self):
+        """Text features match the per-text counts they are defined by."""
+        texts = ["Budget 20% of $3000 for saved, 10 for debt.", "12 34\n5x"]
+        embeddings = SimpleTextEmbedder().encode(texts)
+
+        first = embeddings[0]
+        assert first[0] == pytest.approx(len(texts[0]) / 1000)
+        assert first[1] == pytest.approx(9 / 200)  # words
+        assert first[2] == pytest.approx(1 / 20)  # '.'
+        assert first[3] == pytest.approx(1 / 10)  # '$'
+        assert first[4] == pytest.approx(1 / 10)  # '%'
+        assert first[5] == pytest.approx(3 / 50)  # numbers
+        assert first[7] == pytest.approx(1 / 20)  # budget
+        assert first[8] == pytest.approx(1 / 20)  # save, within "saved"
+        assert first[10] == pytest.approx(1 / 20)  # debt
+        assert embeddings[1][5] == pytest.approx(3 / 50)  # numbers
+        assert not embeddings[:, 16:].any()
+
+
+class TestEmbeddingBatcher:
+    """Test the query embedding micro-batcher."""
+
+    def test_concurrent_queries_share_one_encode_call(self):
+        """Concurrent callers are encoded together and get their own vectors."""
+        calls = []
+
+        def encode(texts):
+            calls.append(list(texts))
+            return np.array([[float(len(text))] for text in texts])
+
+        executor = BoundedExecutor(max_workers=1)
+        batcher = EmbeddingBatcher(encode, executor, max_batch_size=8, max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "ccc", "bb"]))
+
+        vectors = asyncio.run(main())
+        executor.shutdown()
+
+        assert vectors == [[1.0], [2.0], [3.0], [2.0]]
+        assert calls == [["a", "bb", "ccc"]]
+        assert batcher.get_stats()["items"] == 4
+
+    def test_encode_errors_reach_every_caller(self):
+        """A failed batch raises in each waiting coroutine."""
+        def encode(texts):
+            raise RuntimeError("model unavailable")
+
+        executor = BoundedExecutor(max_workers=1)
+        batcher = EmbeddingBatcher(encode, executor, max_batch_size=2, max_wait_ms=20)
+
+        async def main():
+            return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+        results = asyncio.run(main())
+        executor.shutdown()
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+
+class FakeEmbedder:
+    """Deterministic embedder that records what it was asked to encode."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[float(len(text)), 1.0, 0.0] for text in texts])
+
+
+def _pipeline(tmp_path):
+    """A pipeline with a fake embedder and small chunks, without loading any model."""
+    rag = RAGPipeline(
+        docs_dir=str(tmp_path / "docs"),
+        embeddings_dir=str(tmp_path / "embeddings"),
+        executor=BoundedExecutor(max_workers=1),
+    )
+    rag.embedding_model = FakeEmbedder()
+    rag.chroma_client = chromadb.PersistentClient(path=str(tmp_path / "embeddings"))
+    rag.collection = rag.chroma_client.get_or_create_collection(rag.collection_name)
+    rag.chunk_size, rag.chunk_overlap = 60, 0
+    rag.text_splitter = RecursiveCharacterTextSplitter(chunk_size=60, chunk_overlap=0)
+    return rag
+
+
+PARAGRAPHS = [
+    "Track every expense for a month.",
+    "Save three to six months of expenses.",
+    "Pay off high interest debt first.",
+]
+
+
+class TestIncrementalIngestion:
+    """Test content-hash based document ingestion."""
+
+    def test_reingesting_is_idempotent(self, tmp_path):
+        """Adding the same file twice does not duplicate or re-embed chunks."""
+        rag = _pipeline(tmp_path)
+        doc = rag.docs_dir / "tips.txt"
+        doc.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+
+        async def main():
+            await rag.add_document(str(doc))
+            os.utime(doc)  # touched, not modified
+            return await rag.ingest_document(str(doc))
+
+        result = asyncio.run(main())
+        assert result == {"added": 0, "deleted": 0, "kept": 3}
+        assert rag.collection.count() == 3
+        assert len(rag.embedding_model.encoded) == 3
+
+    def test_only_changed_chunks_are_embedded(self, tmp_path):
+        """Editing one paragraph embeds one chunk and deletes the old one."""
+        rag = _pipeline(tmp_path)
+        doc = rag.docs_dir / "tips.txt"
+        doc.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+
+        async def main():
+            await rag.add_document(str(doc))
+            doc.write_text("\n\n".join(PARAGRAPHS[:2] + ["Invest in low cost index funds."]), encoding="utf-8")
+            return await rag.ingest_document(str(doc))
+
+        result = asyncio.run(main())
+        assert result == {"added": 1, "deleted": 1, "kept": 2}
+        assert rag.embedding_model.encoded[-1] == "Invest in low cost index funds."
+        assert rag.collection.count() == 3
+
+    def test_sync_removes_deleted_files(self, tmp_path, monkeypatch):
+        """Files removed from the docs directory leave the index on the next sync."""
+        monkeypatch.setenv("INGEST_WORKERS", "0")
+        rag = _pipeline(tmp_path)
+        for i, paragraph in enumerate(PARAGRAPHS):
+            (rag.docs_dir / f"doc{i}.txt").write_text(paragraph, encoding="utf-8")
+
+        async def main():
+            first = await rag.sync_documents()
+            (rag.docs_dir / "doc0.txt").unlink()
+            return first, await rag.sync_documents()
+
+        first, second = asyncio.run(main())
+        assert first["chunks_embedded"] == 3
+        assert second["files_unchanged"] == 2
+        assert second["files_removed"] == 1
+        assert rag.collection.count() == 2
+        assert len(rag.manifest.sources()) == 2
+
+    def test_path_spellings_share_one_index_entry(self, tmp_path, monkeypatch):
+        """Relative, absolute and ``..`` paths to one file index it once."""
+        monkeypatch.chdir(tmp_path)
+        rag = _pipeline(tmp_path)
+        doc = rag.docs_dir / "tips.txt"
+        doc.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+
+        async def main():
+            await rag.add_document(str(doc))
+            relative = await rag.ingest_document("docs/../docs/tips.txt")
+            progress = await BulkIngestor(rag, workers=0).run(["docs/tips.txt"])
+            return relative, progress
+
+        relative, progress = asyncio.run(main())
+        assert relative == {"added": 0, "deleted": 0, "kept": 3}
+        assert progress["files_unchanged"] == 1
+        assert rag.manifest.sources() == [str(doc.resolve())]
+        assert rag.collection.count() == 3
+
+    def test_chunks_from_older_versions_are_replaced(self, tmp_path, monkeypatch):
+        """Chunks with random IDs and relative sources are replaced, not duplicated, by a sync."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("INGEST_WORKERS", "0")
+        rag = _pipeline(tmp_path)
+        (rag.docs_dir / "tips.txt").write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+        rag.collection.add(
+            ids=[str(uuid.uuid4()) for _ in PARAGRAPHS],
+            documents=PARAGRAPHS,
+            embeddings=FakeEmbedder().encode(PARAGRAPHS).tolist(),
+            metadatas=[{"source": "docs/tips.txt", "chunk_index": i} for i in range(len(PARAGRAPHS))],
+        )
+
+        async def main():
+            await rag.ingest_executor.run(rag._normalize_chunk_sources)
+            return await rag.sync_documents()
+
+        asyncio.run(main())
+        stored = rag.collection.get(include=["metadatas"])
+        assert rag.collection.count() == 3
+        assert {metadata["source"] for metadata in stored["metadatas"]} == {str(tmp_path.resolve() / "docs" / "tips.txt")}
+        assert rag.manifest.version == IngestManifest.VERSION
+
+    def test_manifest_entries_under_unresolved_paths_are_rekeyed(self, tmp_path, monkeypatch):
+        """Older manifests are re-keyed by resolved path and their files re-planned."""
+        monkeypatch.chdir(tmp_path)
+        path = tmp_path / "manifest.json"
+        entry = {"sha256": "abc", "mtime": 1.0, "size": 10, "chunk_ids": ["a", "b"]}
+        path.write_text(json.dumps({"version": 1, "sources": {
+            "docs/tips.txt": entry,
+            "docs/../docs/tips.txt": {**entry, "chunk_ids": ["b", "c"]},
+        }}), encoding="utf-8")
+
+        manifest = IngestManifest(str(path))
+
+        key = str(tmp_path.resolve() / "docs" / "tips.txt")
+        assert manifest.sources() == [key]
+        assert manifest.get(key)["chunk_ids"] == ["a", "b", "c"]
+        assert manifest.get(key)["sha256"] is None
+
+
+class TestHybridSearch:
+    """Test BM25 + vector retrieval with reciprocal rank fusion."""
+
+    def _ingest(self, rag):
+        tips, ira = rag.docs_dir / "tips.txt", rag.docs_dir / "ira.txt"
+        tips.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+        ira.write_text("Open a Roth IRA early.", encoding="utf-8")
+
+        async def main():
+            await rag.add_document(str(tips))
+            await rag.add_document(str(ira))
+
+        asyncio.run(main())
+        return ira
+
+    def test_exact_terms_are_found(self, tmp_path):
+        """A chunk matching a rare query term is retrieved even when its vector is not closest."""
+        rag = _pipeline(tmp_path)
+        self._ingest(rag)
+        # The fake embedder embeds by length, so this query's nearest vector is PARAGRAPHS[0]
+        query = "IRA".ljust(len(PARAGRAPHS[0]), "?")
+
+        results = asyncio.run(rag.search(query, n_results=1))
+        assert results[0]["content"] == "Open a Roth IRA early."
+        assert results[0]["lexical_score"] > 0
+
+        # Chunks found only by BM25 are fetched, with the same distance Chroma would report
+        rag.hybrid_candidates = 1
+        results = asyncio.run(rag.search(query, n_results=2))
+        assert [result["content"] for result in results] == [PARAGRAPHS[0], "Open a Roth IRA early."]
+        assert results[1]["distance"] == pytest.approx((len(PARAGRAPHS[0]) - 22) ** 2)
+
+        rag.hybrid_search = False
+        results = asyncio.run(rag.search(query, n_results=1))
+        assert results[0]["content"] == PARAGRAPHS[0]
+
+    def test_lexical_index_follows_the_collection(self, tmp_path):
+        """Edits and removals update the lexical index, and it can be rebuilt from Chroma."""
+        rag = _pipeline(tmp_path)
+        doc = self._ingest(rag)
+        assert len(rag.lexical_index) == 4
+
+        doc.write_text("Open a CD instead.", encoding="utf-8")
+        asyncio.run(rag.ingest_document(str(doc)))
+        assert rag.lexical_index.search("ira") == []
+        assert len(rag.lexical_index.search("cd")) == 1
+
+        rag.lexical_index.clear()
+        rag._rebuild_lexical_index()
+        assert len(rag.lexical_index) == 4
+
+        asyncio.run(rag.remove_document(str(doc)))
+        assert len(rag.lexical_index) == 3
+
+
+class TestReranking:
+    """Test the optional rerank stage in retrieval."""
+
+    def test_retrieve_reranks_a_wider_candidate_set(self, tmp_path):
+        """Retrieval fetches extra candidates, reranks them and reports the time spent."""
+        rag = _pipeline(tmp_path)
+        doc = rag.docs_dir / "tips.txt"
+        doc.write_text("\n\n".join(PARAGRAPHS), encoding="utf-8")
+        asyncio.run(rag.add_document(str(doc)))
+        rag.reranker = CrossEncoderReranker(model=FakeCrossEncoder())
+        rag.hybrid_search = False
+        # The fake embedder embeds by length, so vector search alone ranks PARAGRAPHS[0] first
+        query = "debt".ljust(len(PARAGRAPHS[0]))
+
+        retrieval = asyncio.run(rag.retrieve(query, n_results=1))
+
+        assert [result["content"] for result in retrieval.results] == [PARAGRAPHS[2]]
+        assert retrieval.rerank_ms is not None
+        assert rag.reranker.get_stats()["candidates_scored"] == 3
+
+
+class TestBulkIngestor:
+    """Test the bulk ingestion pipeline."""
+
+    def _write_docs(self, rag, count):
+        for i in range(count):
+            (rag.docs_dir / f"doc{i}.txt").write_text(
+                "\n\n".join(f"{paragraph} ({i})" for paragraph in PARAGRAPHS), encoding="utf-8"
+            )
+
+    def test_chunks_are_embedded_across_files(self, tmp_path):
+        """Chunks from many files share large encode calls and progress is reported."""
+        rag = _pipeline(tmp_path)
+        self._write_docs(rag, 5)
+        calls = []
+        rag.embedding_model.encode = lambda texts: calls.append(len(texts)) or FakeEmbedder().encode(texts)
+
+        progress = asyncio.run(BulkIngestor(rag, workers=0, embed_batch_size=8, embed_sub_batch_size=8).run())
+
+        assert progress["status"] == "completed"
+        assert progress["files_indexed"] == 5
+        assert progress["chunks_embedded"] == 15
+        assert calls == [8, 1, 6]
+        assert rag.collection.count() == 15
+
+    def test_process_pool_and_failures(self, tmp_path):
+        """Files are parsed in worker processes and unreadable files are reported, not fatal."""
+        rag = _pipeline(tmp_path)
+        self._write_docs(rag, 2)
+        missing = str(rag.docs_dir / "missing.txt")
+        paths = [str(path) for path in rag.document_files()] + [missing]
+
+        ingestor = BulkIngestor(rag, workers=2, min_files_for_pool=1)
+        progress = asyncio.run(ingestor.run(paths))
+
+        assert progress["status"] == "partial"
+        assert progress["files_indexed"] == 2
+        assert progress["files_failed"] == 1
+        assert progress["errors"][0]["source"] == missing
+        assert rag.collection.count() == 6
+
+    def test_run_fails_when_every_file_fails(self, tmp_path):
+        """A run that could not ingest any file is reported as failed."""
+        rag = _pipeline(tmp_path)
+        rag.docs_dir.mkdir(parents=True, exist_ok=True)
+        missing = [str(rag.docs_dir / "missing.txt"), str(rag.docs_dir / "gone.txt")]
+
+        progress = asyncio.run(BulkIngestor(rag, workers=0).run(missing))
+
+        assert progress["status"] == "failed"
+        assert progress["files_failed"] == 2
+        assert [error["source"] for error in progress["errors"]] == missing
+
+
+    def test_waits_for_the_source_lock(self, tmp_path):
+        """A file being indexed elsewhere is planned and stored only after that finishes."""
+        rag = _pipeline(tmp_path)
+        self._write_docs(rag, 1)
+        source = str(rag.document_files()[0])
+
+        async def main():
+            lock = rag.source_lock(source)
+            await lock.acquire()
+            run = asyncio.ensure_future(BulkIngestor(rag, workers=0).run([source]))
+            await asyncio.sleep(0.2)
+            waited = not run.done() and rag.collection.count() == 0
+            lock.release()
+            progress = await run
+            return waited, progress, lock.locked()
+
+        waited, progress, locked = asyncio.run(main())
+        assert waited
+        assert progress["files_indexed"] == 1
+        assert not locked
+
+
+    def test_overlapping_runs_do_not_deadlock(self, tmp_path):
+        """Two runs over the same files in opposite order both finish."""
+        rag = _pipeline(tmp_path)
+        self._write_docs(rag, 6)
+        paths = [str(path) for path in rag.document_files()]
+
+        async def main():
+            runs = [
+                BulkIngestor(rag, workers=0, embed_batch_size=1000).run(paths, force=True),
+                BulkIngestor(rag, workers=0, embed_batch_size=1000).run(paths[::-1], force=True),
+            ]
+            return await asyncio.wait_for(asyncio.gather(*runs), timeout=30)
+
+        first, second = asyncio.run(main())
+        assert first["status"] == second["status"] == "completed"
+        assert rag.collection.count() == 18
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+import sys
+import os
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.executor import BoundedExecutor
+from app.chatbot.rerank import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how many query words the text contains, optionally slowly."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [
+            sum(word in text.lower() for word in query.lower().split())
+            for query, text in pairs
+        ]
+
+
+def _candidates(texts):
+    return [{"content": text, "metadata": {"source": f"doc{i}.txt"}} for i, text in enumerate(texts)]
+
+
+def _rerank(reranker, query, candidates, top_n):
+    executor = BoundedExecutor(max_workers=1)
+    try:
+        return asyncio.run(reranker.rerank(query, candidates, executor, top_n=top_n))
+    finally:
+        executor.shutdown()
+
+
+class TestCrossEncoderReranker:
+    """Test cross-encoder reranking."""
+
+    def test_best_scored_candidates_come_first(self):
+        """Candidates are scored in batches and the top scores are returned."""
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(batch_size=2, model=model)
+        candidates = _candidates([
+            "Stocks and bonds.",
+            "An emergency fund covers surprise expenses.",
+            "Budget apps.",
+            "How big should an emergency fund be?",
+        ])
+
+        results, info = _rerank(reranker, "emergency fund size", candidates, top_n=2)
+
+        assert [result["content"] for result in results] == [
+            "An emergency fund covers surprise expenses.",
+            "How big should an emergency fund be?",
+        ]
+        assert results[0]["rerank_score"] == 2
+        assert model.batches == [2, 2]
+        assert info["scored"] == 4 and not info["budget_exhausted"]
+        assert info["rerank_ms"] > 0
+
+    def test_budget_stops_scoring(self):
+        """Once the budget is spent, unscored candidates keep their retrieval order."""
+        model = FakeCrossEncoder(delay=0.05)
+        reranker = CrossEncoderReranker(batch_size=2, budget_ms=60, model=model)
+        candidates = _candidates(["a", "fund", "b", "c", "fund fund", "d"])
+
+        results, info = _rerank(reranker, "fund", candidates, top_n=4)
+
+        assert info["budget_exhausted"]
+        assert info["scored"] == 2
+        assert [result["content"] for result in results] == ["fund", "a", "b", "c"]
+        assert reranker.get_stats()["budget_exhausted"] == 1
+
+    def test_model_errors_keep_retrieval_order(self):
+        """A failing model falls back to the original ranking."""
+        model = FakeCrossEncoder()
+        model.predict = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("boom"))
+        reranker = CrossEncoderReranker(model=model)
+        candidates = _candidates(["a", "b", "c"])
+
+        results, info = _rerank(reranker, "b", candidates, top_n=2)
+
+        assert results == candidates[:2]
+        assert info["scored"] == 0
+        assert reranker.get_stats()["failures"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,180 @@
+import pytest
+import asyncio
+import json
+import sys
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.llm import AdmissionController, LocalLLM
+from app.chatbot.memory import ConversationMemory
+from app.chatbot.ollama_client import OllamaClient
+from app.chatbot.storage import SQLiteSessionStorage
+from app.chatbot.summarizer import ConversationSummarizer
+
+
+def _fake_llm(response="El usuario está armando un presupuesto."):
+    return SimpleNamespace(
+        is_available=True,
+        using_mock=False,
+        admission=AdmissionController(max_in_flight=1),
+        generate_response=AsyncMock(return_value=response),
+    )
+
+
+def _fill(memory, session_id, count):
+    for i in range(count):
+        memory.add_message(session_id, "user" if i % 2 == 0 else "assistant", f"Mensaje {i}")
+
+
+def _summarizer(memory, llm, **kwargs):
+    async def llm_factory():
+        return llm
+    return ConversationSummarizer(memory, llm_factory, trigger_messages=10, keep_recent=4, **kwargs)
+
+
+class TestConversationSummarizer:
+    """Test background conversation summarization."""
+
+    def test_older_messages_are_folded_into_the_summary(self, tmp_path):
+        """Past the trigger, all but the newest messages are summarized and left out of history."""
+        memory = ConversationMemory(str(tmp_path))
+        _fill(memory, "s1", 12)
+        llm = _fake_llm()
+        summarizer = _summarizer(memory, llm)
+
+        assert asyncio.run(summarizer.summarize("s1"))
+
+        prompt = llm.generate_response.call_args.args[0]
+        assert "Mensaje 0" in prompt and "Mensaje 7" in prompt and "Mensaje 8" not in prompt
+        summary, messages, start = memory.get_summarized_history("s1")
+        assert summary == "El usuario está armando un presupuesto."
+        assert [m["content"] for m in messages] == ["Mensaje 8", "Mensaje 9", "Mensaje 10", "Mensaje 11"]
+        assert start == 8
+        assert summarizer.get_stats()["summarized_messages"] == 8
+
+    def test_summary_extends_previous_summary(self, tmp_path):
+        """A later run summarizes only newer messages, building on the stored summary."""
+        memory = ConversationMemory(str(tmp_path))
+        _fill(memory, "s1", 12)
+        llm = _fake_llm()
+        summarizer = _summarizer(memory, llm)
+        asyncio.run(summarizer.summarize("s1"))
+        assert not asyncio.run(summarizer.summarize("s1"))  # only 4 messages since
+
+        for i in range(12, 18):
+            memory.add_message("s1", "user", f"Mensaje {i}")
+        llm.generate_response.return_value = "Resumen actualizado."
+        assert asyncio.run(summarizer.summarize("s1"))
+
+        prompt = llm.generate_response.call_args.args[0]
+        assert "El usuario está armando un presupuesto." in prompt
+        assert "Mensaje 7" not in prompt and "Mensaje 8" in prompt and "Mensaje 13" in prompt
+        summary, messages, start = memory.get_summarized_history("s1")
+        assert summary == "Resumen actualizado."
+        assert start == 14
+
+    @pytest.mark.parametrize("backend", ["jsonl", "sqlite"])
+    def test_summary_survives_restart(self, tmp_path, backend):
+        """The summary is stored with the session and messages added later still count."""
+        def make_memory():
+            if backend == "sqlite":
+                return ConversationMemory(str(tmp_path), storage=SQLiteSessionStorage(str(tmp_path / "sessions.db")))
+            return ConversationMemory(str(tmp_path))
+
+        memory = make_memory()
+        _fill(memory, "s1", 12)
+        asyncio.run(_summarizer(memory, _fake_llm()).summarize("s1"))
+        memory.add_message("s1", "user", "Mensaje 12")
+        memory.close()
+
+        summary, messages, start = make_memory().get_summarized_history("s1")
+        assert summary == "El usuario está armando un presupuesto."
+        assert [m["content"] for m in messages][0] == "Mensaje 8"
+        assert messages[-1]["content"] == "Mensaje 12"
+        assert start == 8
+
+    @pytest.mark.parametrize("backend", ["jsonl", "sqlite"])
+    def test_summary_written_with_buffered_messages(self, tmp_path, backend):
+        """A summary buffered together with unflushed messages does not count them twice."""
+        def make_memory(**kwargs):
+            if backend == "sqlite":
+                storage = SQLiteSessionStorage(str(tmp_path / "sessions.db"))
+                return ConversationMemory(str(tmp_path), storage=storage, **kwargs)
+            return ConversationMemory(str(tmp_path), **kwargs)
+
+        memory = make_memory(write_behind_seconds=3600)
+        _fill(memory, "s1", 4)
+        assert memory.set_summary("s1", "Resumen.", 2)
+        memory.close()
+
+        reloaded = make_memory()
+        summary, messages, start = reloaded.get_summarized_history("s1")
+        assert reloaded.get_session_summary("s1")["metadata"]["message_count"] == 4
+        assert summary == "Resumen."
+        assert [m["content"] for m in messages] == ["Mensaje 2", "Mensaje 3"]
+        assert start == 2
+
+    def test_failed_summary_keeps_the_real_backend(self, tmp_path):
+        """A failing summary generation is counted as an error and never falls back to the mock LLM."""
+        async def handler(request):
+            body = json.loads(request.content)
+            if "messages" not in body:
+                return httpx.Response(200, json={"done": True})  # model load
+            return httpx.Response(500, json={"error": "out of memory"})
+
+        client = OllamaClient(transport=httpx.MockTransport(handler))
+        llm = LocalLLM(backend="ollama", ollama_client=client, admission=AdmissionController(max_in_flight=1))
+        memory = ConversationMemory(str(tmp_path))
+        _fill(memory, "s1", 12)
+        summarizer = _summarizer(memory, llm)
+
+        async def main():
+            await llm.initialize()
+            return await summarizer.summarize("s1")
+
+        assert not asyncio.run(main())
+        assert llm.backend == "ollama"
+        assert llm.is_available and not llm.using_mock
+        assert summarizer.get_stats()["errors"] == 1
+        assert memory.get_summarized_history("s1")[0] is None
+
+    def test_waits_for_idle_llm(self, tmp_path):
+        """Summaries do not start while user generations are running."""
+        memory = ConversationMemory(str(tmp_path))
+        _fill(memory, "s1", 12)
+        llm = _fake_llm()
+        llm.admission.in_flight = 1
+        summarizer = _summarizer(memory, llm, idle_poll_seconds=0.01, max_idle_wait_seconds=0.05)
+
+        assert not asyncio.run(summarizer.summarize("s1"))
+        llm.generate_response.assert_not_called()
+        assert summarizer.get_stats()["deferred"] == 1
+        assert memory.get_summarized_history("s1")[0] is None
+
+    def test_schedule_does_not_wait(self, tmp_path):
+        """Scheduling returns at once, de-duplicates sessions and drops work past the queue bound."""
+        memory = ConversationMemory(str(tmp_path))
+        _fill(memory, "s1", 12)
+        llm = _fake_llm()
+        summarizer = _summarizer(memory, llm, max_pending=1)
+
+        async def main():
+            queued = [summarizer.schedule("s1"), summarizer.schedule("s1"), summarizer.schedule("s2")]
+            await asyncio.sleep(0.05)
+            await summarizer.stop()
+            return queued
+
+        assert asyncio.run(main()) == [True, False, False]
+        stats = summarizer.get_stats()
+        assert stats["dropped"] == 1
+        assert stats["summaries"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
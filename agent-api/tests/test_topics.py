@@ -0,0 +1,67 @@
+import pytest
+import sys
+import os
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.chatbot.memory import ConversationMemory
+from app.chatbot.prompts import FinancialPromptTemplates
+from app.chatbot.topics import TopicMatcher, topic_matcher
+
+
+class TestTopicMatcher:
+    """Test the shared bilingual topic matcher."""
+
+    def test_english_and_spanish_without_accents(self):
+        """Keywords match in both languages, with or without accents."""
+        assert topic_matcher.rank("¿Cómo empiezo mi presupuesto?") == ["budget"]
+        assert topic_matcher.rank("Quiero saber sobre inversion y acciones") == ["investing"]
+        assert topic_matcher.rank("Quiero saber sobre inversión") == ["investing"]
+        assert topic_matcher.rank("How do I start budgeting?") == ["budget"]
+
+    def test_keywords_match_at_word_starts(self):
+        """Stems match word prefixes; other keywords must match whole words."""
+        assert topic_matcher.rank("Mira, la primavera llegó") == []
+        assert topic_matcher.rank("A syntax error") == []
+        assert topic_matcher.rank("Quiero ahorrar para jubilarme") == ["saving", "retirement"]
+
+    def test_longest_keyword_wins(self):
+        """A phrase keyword takes precedence over a shorter keyword it starts with."""
+        assert topic_matcher.count("Mi puntaje de crédito bajó") == {"credit_score": 1}
+        assert topic_matcher.main_topic("pay my credit card and my credit card loan") == "credit_score"
+
+    def test_rank_and_restriction(self):
+        """Topics rank by matches, and main_topic can be limited to some topics."""
+        text = "Mis impuestos y mi presupuesto: gastos, ingresos"
+        assert topic_matcher.rank(text) == ["budget", "taxes"]
+        assert topic_matcher.main_topic(text, among=["taxes", "debt"]) == "taxes"
+        assert topic_matcher.main_topic(text, among=["debt"]) is None
+
+    def test_keyword_in_two_topics_is_rejected(self):
+        """A keyword cannot belong to two topics."""
+        with pytest.raises(ValueError):
+            TopicMatcher({"a": ["loan"], "b": ["loan*"]})
+
+
+class TestTopicUsers:
+    """Test the suggestion and session topic paths that share the matcher."""
+
+    def test_suggestions_follow_the_main_topic(self):
+        """English and Spanish questions get suggestions for their topic."""
+        prompts = FinancialPromptTemplates
+        assert prompts.get_suggestions_for_topic("¿Cómo mejoro mi puntaje de crédito?") == prompts.SUGGESTION_PROMPTS["credit_score"]
+        assert prompts.get_suggestions_for_topic("How much should I save each month?") == prompts.SUGGESTION_PROMPTS["saving"]
+        assert prompts.get_suggestions_for_topic("hola") == prompts.get_suggestions_for_topic("buenos días")
+
+    def test_session_topics(self, tmp_path):
+        """Session summaries list topics from every message, most discussed first."""
+        memory = ConversationMemory(str(tmp_path))
+        memory.add_message("s1", "user", "¿Cómo hago un presupuesto?")
+        memory.add_message("s1", "assistant", "Anota tus ingresos y gastos, y define cuánto ahorrar.")
+
+        assert memory.get_session_summary("s1")["topics"] == ["budget", "saving"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])